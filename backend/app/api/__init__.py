@@ -1,10 +1,11 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from app.api.dependencies import set_request_priority
 from app.api.database import router as database_router
 from app.api.ai import router as ai_router
 from app.api.history import router as history_router
 
-# 创建主路由
-router = APIRouter()
+# 创建主路由，所有接口都按 X-Priority 请求头设置准入优先级
+router = APIRouter(dependencies=[Depends(set_request_priority)])
 
 # 包含所有子路由
 router.include_router(database_router)
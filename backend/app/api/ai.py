@@ -1,11 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Dict, Any, Optional
-from pydantic import BaseModel
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+from pydantic import BaseModel, Field
 
 from app.models.database import DatabaseSchemaModel, AIQueryModel, AIConnectionModel
 from app.services.ai_service import AIService
+from app.config import settings
 from app.services.ai.ai_messages import ChatMessage
+from app.services.ai.streaming_json import IncrementalJSONFieldParser
+from app.services.db_services.query_result import json_dumps
+from app.services.db_services.sql_text import is_read_only
 from app.services.db_services.db_manager import DatabaseManagerService
+from app.api.dependencies import get_db_manager, get_ai_service
+from app.api.disconnect import ClientDisconnected, cancel_on_disconnect
+from app.services.admission import admission, AdmissionRejected, TARGET_AI
+from app.services.ai.ai_rate_limit import ai_rate_limiters, AIRateLimitExceeded
 
 router = APIRouter(prefix="/api/ai", tags=["ai"])
 
@@ -13,19 +23,29 @@ class AIPromptRequest(BaseModel):
     prompt: str
     ai_model: str
     ai_service: str
+    timeout: Optional[float] = Field(None, gt=0, description="AI请求的截止时间（秒），不超过 AI_HTTP_TIMEOUT")
+
+class AIExecuteRequest(AIPromptRequest):
+    query_timeout: Optional[float] = Field(None, gt=0, description="语句超时（秒），不超过 DB_STATEMENT_TIMEOUT")
 
 class ChatMessageRequest(BaseModel):
     messages: List[ChatMessage]
     ai_model: str
     ai_service: str
+    timeout: Optional[float] = Field(None, gt=0, description="AI请求的截止时间（秒），不超过 AI_HTTP_TIMEOUT")
 
 @router.post("/query")
 async def generate_sql_query(
     request: AIPromptRequest, 
-    ai_service: AIService = Depends(),
-    db_manager: DatabaseManagerService = Depends()
+    http_request: Request,
+    ai_service: AIService = Depends(get_ai_service),
+    db_manager: DatabaseManagerService = Depends(get_db_manager)
 ):
-    """生成SQL查询"""
+    """
+    生成SQL查询
+    
+    AI请求超过timeout时返回504；客户端断开连接时取消AI请求（与其他相同请求共享时，所有请求都断开才取消）
+    """
     # 检查数据库连接
     db_service = db_manager.get_current_service()
     if not db_service:
@@ -36,24 +56,32 @@ async def generate_sql_query(
     
     try:
         # 获取数据库架构
-        db_schema = await db_service.get_database_schema()
+        db_schema = await db_manager.get_database_schema()
         db_type = await db_service.get_database_type()
         
         # 生成SQL查询
-        result = await ai_service.get_ai_sql_query(
+        result = await cancel_on_disconnect(http_request, ai_service.get_ai_sql_query(
             ai_model=request.ai_model,
             ai_service=request.ai_service,
             user_prompt=request.prompt,
             db_schema=db_schema,
-            database_type=db_type
-        )
+            database_type=db_type,
+            timeout=request.timeout
+        ))
         
         return result
+    except (ClientDisconnected, AdmissionRejected, AIRateLimitExceeded):
+        raise
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="生成SQL查询超时"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -61,27 +89,258 @@ async def generate_sql_query(
         )
 
 @router.post("/chat")
-async def chat_with_ai(request: ChatMessageRequest, ai_service: AIService = Depends()):
-    """与AI进行通用对话"""
+async def chat_with_ai(
+    request: ChatMessageRequest,
+    http_request: Request,
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """与AI进行通用对话，客户端断开连接时取消AI请求"""
     try:
-        response = await ai_service.chat_prompt(
+        response = await cancel_on_disconnect(http_request, ai_service.chat_prompt(
             prompt_messages=request.messages,
             ai_model=request.ai_model,
-            ai_service=request.ai_service
-        )
+            ai_service=request.ai_service,
+            timeout=request.timeout
+        ))
         
         return {"response": response}
+    except (ClientDisconnected, AdmissionRejected, AIRateLimitExceeded):
+        raise
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="AI对话超时"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"AI对话错误: {str(e)}"
         )
 
+def _sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """编码一个Server-Sent Events事件"""
+    message = f"data: {json_dumps(data).decode('utf-8')}\n\n"
+    if event:
+        message = f"event: {event}\n" + message
+    return message
+
+def _sse_error_detail(e: Exception) -> str:
+    return e.detail if isinstance(e, HTTPException) else str(e)
+
+# 禁止代理缓冲，使事件能立即到达客户端
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@router.post("/query/stream")
+async def generate_sql_query_stream(
+    request: AIPromptRequest, 
+    ai_service: AIService = Depends(get_ai_service),
+    db_manager: DatabaseManagerService = Depends(get_db_manager)
+):
+    """
+    以Server-Sent Events流式生成SQL查询
+    
+    生成过程中发送token事件（默认事件类型）转发AI输出，
+    完成后发送result事件携带解析后的summary和query，出错时发送error事件。
+    """
+    db_service = db_manager.get_current_service()
+    if not db_service:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="未连接到数据库"
+        )
+    
+    try:
+        db_schema = await db_manager.get_database_schema()
+        db_type = await db_service.get_database_type()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"获取数据库架构错误: {str(e)}"
+        )
+    
+    async def event_stream() -> AsyncIterator[str]:
+        chunks = []
+        try:
+            async for token in ai_service.stream_ai_sql_query(
+                ai_model=request.ai_model,
+                ai_service=request.ai_service,
+                user_prompt=request.prompt,
+                db_schema=db_schema,
+                database_type=db_type
+            ):
+                chunks.append(token)
+                yield _sse_event({"token": token})
+            
+            result = AIService.parse_sql_response("".join(chunks))
+            yield _sse_event(result.dict(), event="result")
+        except Exception as e:
+            yield _sse_event({"detail": _sse_error_detail(e)}, event="error")
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+@router.post("/query/execute/stream")
+async def generate_and_execute_sql_query_stream(
+    request: AIExecuteRequest, 
+    ai_service: AIService = Depends(get_ai_service),
+    db_manager: DatabaseManagerService = Depends(get_db_manager)
+):
+    """
+    以Server-Sent Events流式生成并执行SQL查询
+    
+    AI输出中的query字段一旦完整，只读查询就开始执行，同时summary继续流式返回；其他语句不会自动执行，
+    需要用户确认后通过 /api/database/execute 执行。事件依次包括:
+    token（默认事件类型，AI输出）、query（解析出的查询）、confirm_required（查询不是只读的，未执行）、
+    rows（查询结果，可能早于summary结束到达）、execute_error（执行失败）、
+    result（解析后的summary和query），以及出错时的error。
+    """
+    db_service = db_manager.get_current_service()
+    if not db_service:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="未连接到数据库"
+        )
+    
+    try:
+        db_schema = await db_manager.get_database_schema()
+        db_type = await db_service.get_database_type()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"获取数据库架构错误: {str(e)}"
+        )
+    
+    def start_query(query: str) -> Tuple[Optional[asyncio.Task], List[str]]:
+        """返回query事件，只读查询同时开始执行；模型生成的写入语句必须经用户确认"""
+        events = [_sse_event({"query": query}, event="query")]
+        if not is_read_only(query):
+            events.append(_sse_event(
+                {"query": query, "detail": "查询不是只读的，需要确认后执行"}, event="confirm_required"
+            ))
+            return None, events
+        
+        task = asyncio.create_task(
+            db_manager.execute_query_rows(query, max_rows=settings.MAX_ROWS, timeout=request.query_timeout)
+        )
+        return task, events
+    
+    def rows_event(task: asyncio.Task) -> str:
+        try:
+            result = task.result()
+        except Exception as e:
+            return _sse_event({"detail": f"执行查询错误: {str(e)}"}, event="execute_error")
+        return _sse_event(result.to_rows(), event="rows")
+    
+    async def event_stream() -> AsyncIterator[str]:
+        parser = IncrementalJSONFieldParser()
+        chunks = []
+        query_started = False
+        execute_task: Optional[asyncio.Task] = None
+        rows_sent = False
+        
+        try:
+            async for token in ai_service.stream_ai_sql_query(
+                ai_model=request.ai_model,
+                ai_service=request.ai_service,
+                user_prompt=request.prompt,
+                db_schema=db_schema,
+                database_type=db_type
+            ):
+                chunks.append(token)
+                yield _sse_event({"token": token})
+                
+                # query字段闭合后立即开始执行，与summary的生成并行
+                for key, value in parser.feed(token):
+                    if key == "query" and not query_started:
+                        query_started = True
+                        execute_task, events = start_query(value)
+                        for event in events:
+                            yield event
+                
+                if execute_task is not None and not rows_sent and execute_task.done():
+                    rows_sent = True
+                    yield rows_event(execute_task)
+            
+            result = AIService.parse_sql_response("".join(chunks))
+            
+            # 未能从流中提前解析出query时，使用完整响应中的query
+            if not query_started:
+                query_started = True
+                execute_task, events = start_query(result.query)
+                for event in events:
+                    yield event
+            
+            if execute_task is not None and not rows_sent:
+                await asyncio.wait([execute_task])
+                rows_sent = True
+                yield rows_event(execute_task)
+            
+            yield _sse_event(result.dict(), event="result")
+        except Exception as e:
+            yield _sse_event({"detail": _sse_error_detail(e)}, event="error")
+        finally:
+            # 客户端断开或出错时取消仍在执行的查询
+            if execute_task is not None and not execute_task.done():
+                execute_task.cancel()
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+@router.post("/chat/stream")
+async def chat_with_ai_stream(request: ChatMessageRequest, ai_service: AIService = Depends(get_ai_service)):
+    """
+    以Server-Sent Events流式与AI对话
+    
+    生成过程中发送token事件（默认事件类型），完成后发送done事件，出错时发送error事件。
+    """
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            async for token in ai_service.stream_chat_prompt(
+                prompt_messages=request.messages,
+                ai_model=request.ai_model,
+                ai_service=request.ai_service
+            ):
+                yield _sse_event({"token": token})
+            
+            yield _sse_event({}, event="done")
+        except Exception as e:
+            yield _sse_event({"detail": _sse_error_detail(e)}, event="error")
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+@router.get("/admission")
+async def get_ai_admission_stats():
+    """获取各AI服务端点的并发调用和排队统计"""
+    return {"enabled": settings.ADMISSION_ENABLED, "targets": admission.stats(TARGET_AI)}
+
+@router.get("/rate-limits")
+async def get_ai_rate_limit_stats():
+    """获取各模型或部署的请求数和token数预算，以及限流等待和429重试次数"""
+    return {"enabled": settings.AI_RATE_LIMIT_ENABLED, "targets": ai_rate_limiters.stats()}
+
+@router.get("/cache")
+async def get_ai_query_cache_stats(http_request: Request):
+    """获取自然语言查询缓存统计"""
+    query_cache = getattr(http_request.app.state, "ai_query_cache", None)
+    
+    if query_cache is None:
+        return {"enabled": False}
+    
+    return {"enabled": True, **await query_cache.stats()}
+
+@router.delete("/cache")
+async def clear_ai_query_cache(http_request: Request):
+    """清空自然语言查询缓存"""
+    query_cache = getattr(http_request.app.state, "ai_query_cache", None)
+    
+    if query_cache is not None:
+        await query_cache.clear()
+    
+    return {"message": "已清空AI查询缓存"}
+
 @router.get("/connections", response_model=List[AIConnectionModel])
 async def get_ai_connections():
     """获取保存的AI连接配置"""
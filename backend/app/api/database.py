@@ -1,12 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, AsyncIterator, Optional
+from app.config import settings
 from app.models.database import DatabaseSchemaModel
 from app.services.db_services.db_manager import DatabaseManagerService
+from app.services.db_services.cost_guard import QueryCostExceededError
+from app.services.admission import admission, AdmissionRejected, TARGET_DATABASE
+from app.services.db_services.query_result import RESULT_FORMAT_RECORDS, json_dumps
+from app.api.dependencies import get_db_manager
+from app.api.disconnect import ClientDisconnected, cancel_on_disconnect
 
 router = APIRouter(prefix="/api/database", tags=["database"])
 
 @router.post("/connect")
-async def connect_to_database(connection_string: str, db_manager: DatabaseManagerService = Depends()):
+async def connect_to_database(connection_string: str, db_manager: DatabaseManagerService = Depends(get_db_manager)):
     """连接到数据库"""
     success = await db_manager.connect_to_database(connection_string)
     
@@ -16,17 +23,24 @@ async def connect_to_database(connection_string: str, db_manager: DatabaseManage
             detail="无法连接到数据库，请检查连接字符串"
         )
     
-    return {"message": "成功连接到数据库"}
+    return {"message": "成功连接到数据库", "connection_id": db_manager.connection_id}
+
+@router.post("/disconnect")
+async def disconnect_from_database(db_manager: DatabaseManagerService = Depends(get_db_manager)):
+    """断开数据库连接并释放连接池"""
+    removed = await db_manager.disconnect()
+    
+    return {"success": removed}
 
 @router.post("/test")
-async def test_database_connection(connection_string: str, db_manager: DatabaseManagerService = Depends()):
+async def test_database_connection(connection_string: str, db_manager: DatabaseManagerService = Depends(get_db_manager)):
     """测试数据库连接"""
     success = await db_manager.test_connection(connection_string)
     
     return {"success": success}
 
 @router.get("/schema")
-async def get_database_schema(db_manager: DatabaseManagerService = Depends()):
+async def get_database_schema(db_manager: DatabaseManagerService = Depends(get_db_manager)):
     """获取数据库架构"""
     service = db_manager.get_current_service()
     
@@ -37,7 +51,7 @@ async def get_database_schema(db_manager: DatabaseManagerService = Depends()):
         )
     
     try:
-        schema = await service.get_database_schema()
+        schema = await db_manager.get_database_schema()
         return schema
     except Exception as e:
         raise HTTPException(
@@ -45,9 +59,160 @@ async def get_database_schema(db_manager: DatabaseManagerService = Depends()):
             detail=f"获取数据库架构错误: {str(e)}"
         )
 
+@router.post("/schema/invalidate")
+async def invalidate_schema_cache(db_manager: DatabaseManagerService = Depends(get_db_manager)):
+    """使当前连接的数据库架构缓存失效"""
+    invalidated = db_manager.invalidate_schema_cache()
+    
+    return {"invalidated": invalidated}
+
+@router.get("/schema/cache")
+async def get_schema_cache_stats(request: Request):
+    """获取数据库架构缓存统计"""
+    schema_cache = getattr(request.app.state, "schema_cache", None)
+    
+    if schema_cache is None:
+        return {"enabled": False}
+    
+    return {"enabled": True, **schema_cache.stats()}
+
+@router.get("/pools")
+async def get_connection_pool_stats(request: Request):
+    """获取已注册连接池的大小、空闲连接数和健康状态"""
+    registry = getattr(request.app.state, "connection_registry", None)
+    
+    if registry is None:
+        return {"enabled": False}
+    
+    return {"enabled": True, **registry.stats()}
+
+@router.get("/cost-guard")
+async def get_cost_guard_stats(request: Request):
+    """获取执行前代价检查的阈值、执行计划缓存和拒绝统计"""
+    cost_guard = getattr(request.app.state, "cost_guard", None)
+    
+    if cost_guard is None:
+        return {"enabled": False}
+    
+    return {"enabled": True, **cost_guard.stats()}
+
+@router.get("/result-cache")
+async def get_result_cache_stats(request: Request):
+    """获取查询结果缓存的命中率和内存占用"""
+    result_cache = getattr(request.app.state, "result_cache", None)
+    
+    if result_cache is None:
+        return {"enabled": False}
+    
+    return {"enabled": True, **result_cache.stats()}
+
+@router.delete("/result-cache")
+async def clear_result_cache(request: Request):
+    """清空查询结果缓存"""
+    result_cache = getattr(request.app.state, "result_cache", None)
+    
+    if result_cache is not None:
+        result_cache.clear()
+    
+    return {"message": "已清空查询结果缓存"}
+
+@router.get("/admission")
+async def get_database_admission_stats():
+    """获取各数据库的并发查询和排队统计"""
+    return {"enabled": settings.ADMISSION_ENABLED, "targets": admission.stats(TARGET_DATABASE)}
+
 @router.post("/execute")
-async def execute_query(query: str, db_manager: DatabaseManagerService = Depends()):
-    """执行SQL查询"""
+async def execute_query(
+    request: Request,
+    query: str,
+    format: str = Query(RESULT_FORMAT_RECORDS, regex="^(records|rows|columns)$"),
+    max_rows: Optional[int] = Query(None, ge=1),
+    timeout: Optional[float] = Query(None, gt=0, description="语句超时（秒），不超过 DB_STATEMENT_TIMEOUT"),
+    db_manager: DatabaseManagerService = Depends(get_db_manager)
+):
+    """
+    执行SQL查询
+    
+    format可选records（每行一个对象，默认）、rows（列名只出现一次，行为数组）
+    或columns（按列存储的数组，适合以数值为主的结果）。
+    
+    结果最多返回max_rows行（不超过MAX_ROWS），超出部分在驱动层停止读取。
+    是否截断和返回行数通过 X-Result-Truncated、X-Result-Row-Count 响应头返回，
+    rows和columns格式的响应体中也包含这两项。
+    
+    语句超时由数据库服务端执行；客户端断开连接时取消查询并中止服务端的语句。
+    启用代价检查时，执行计划估计代价超过阈值的查询返回422（或在queue模式下排队执行）。
+    """
+    service = db_manager.get_current_service()
+    
+    if not service:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="未连接到数据库"
+        )
+    
+    try:
+        row_limit = min(max_rows, settings.MAX_ROWS) if max_rows else settings.MAX_ROWS
+        result = await cancel_on_disconnect(
+            request, db_manager.execute_query_rows(query, max_rows=row_limit, timeout=timeout)
+        )
+        return Response(
+            content=json_dumps(result.to_format(format)),
+            media_type="application/json",
+            headers={
+                "X-Result-Truncated": "true" if result.truncated else "false",
+                "X-Result-Row-Count": str(result.row_count)
+            }
+        )
+    except ClientDisconnected:
+        raise
+    except AdmissionRejected:
+        raise
+    except QueryCostExceededError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"执行查询错误: {str(e)}"
+        )
+
+async def _ndjson_stream(first_batch: List[Dict[str, Any]], batches: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    """每行一个JSON对象"""
+    if first_batch:
+        yield b"".join(json_dumps(row) + b"\n" for row in first_batch)
+    async for batch in batches:
+        yield b"".join(json_dumps(row) + b"\n" for row in batch)
+
+async def _json_array_stream(first_batch: List[Dict[str, Any]], batches: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    """分块输出的JSON数组"""
+    yield b"["
+    first = not first_batch
+    if first_batch:
+        yield b",".join(json_dumps(row) for row in first_batch)
+    async for batch in batches:
+        if not batch:
+            continue
+        yield (b"" if first else b",") + b",".join(json_dumps(row) for row in batch)
+        first = False
+    yield b"]"
+
+@router.post("/execute/stream")
+async def execute_query_stream(
+    query: str,
+    format: str = Query("ndjson", regex="^(ndjson|json)$"),
+    timeout: Optional[float] = Query(None, gt=0, description="语句超时（秒），不超过 DB_STATEMENT_TIMEOUT"),
+    db_manager: DatabaseManagerService = Depends(get_db_manager)
+):
+    """
+    流式执行SQL查询
+    
+    使用服务端游标分批读取结果并逐块发送，format为ndjson时每行一个JSON对象，
+    为json时输出分块的JSON数组。语句超时与 /execute 相同由数据库服务端执行；
+    启用代价检查时，执行计划估计代价超过阈值的查询同样返回422（或在queue模式下排队执行）。
+    """
     service = db_manager.get_current_service()
     
     if not service:
@@ -56,11 +221,30 @@ async def execute_query(query: str, db_manager: DatabaseManagerService = Depends
             detail="未连接到数据库"
         )
     
+    batches = db_manager.stream_query(query, batch_size=settings.STREAM_BATCH_SIZE, timeout=timeout)
+    
+    # 在开始响应之前读取第一批数据，使查询错误仍能以HTTP错误返回
     try:
-        results = await service.execute_query(query)
-        return results
+        first_batch = await batches.__anext__()
+    except StopAsyncIteration:
+        first_batch = []
+    except AdmissionRejected:
+        raise
+    except QueryCostExceededError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
     except Exception as e:
+        await batches.aclose()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"执行查询错误: {str(e)}"
-        )
\ No newline at end of file
+        )
+    finally:
+        # 读取第一批数据时语句已经执行，写入语句使其涉及的表的结果缓存失效
+        db_manager.invalidate_result_cache_for(query)
+    
+    if format == "json":
+        return StreamingResponse(_json_array_stream(first_batch, batches), media_type="application/json")
+    return StreamingResponse(_ndjson_stream(first_batch, batches), media_type="application/x-ndjson")
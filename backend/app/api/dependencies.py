@@ -0,0 +1,50 @@
+from typing import Optional
+from fastapi import Header, HTTPException, Request, status
+
+from app.services.db_services.connection_registry import DEFAULT_CONNECTION_ID
+from app.services.db_services.db_manager import DatabaseManagerService
+from app.services.ai_service import AIService
+from app.services.history_store import HistoryStore
+from app.services.admission import request_priority, PRIORITIES, PRIORITY_INTERACTIVE
+
+# 依赖注入
+def get_db_manager(request: Request, x_connection_id: Optional[str] = Header(None)) -> DatabaseManagerService:
+    """
+    创建绑定到进程级连接注册表的数据库管理服务
+    
+    客户端可通过 X-Connection-Id 请求头区分不同会话的连接，未提供时使用默认连接
+    """
+    registry = getattr(request.app.state, "connection_registry", None)
+    schema_cache = getattr(request.app.state, "schema_cache", None)
+    cost_guard = getattr(request.app.state, "cost_guard", None)
+    result_cache = getattr(request.app.state, "result_cache", None)
+    return DatabaseManagerService(
+        registry=registry,
+        connection_id=x_connection_id or DEFAULT_CONNECTION_ID,
+        schema_cache=schema_cache,
+        cost_guard=cost_guard,
+        result_cache=result_cache
+    )
+
+def get_ai_service(request: Request) -> AIService:
+    """创建使用进程级自然语言查询缓存的AI服务"""
+    return AIService(query_cache=getattr(request.app.state, "ai_query_cache", None))
+
+def get_history_store(request: Request) -> HistoryStore:
+    """获取进程级查询历史存储"""
+    return request.app.state.history_store
+
+async def set_request_priority(x_priority: Optional[str] = Header(None)) -> str:
+    """
+    根据 X-Priority 请求头（interactive 或 batch）设置当前请求的准入优先级，未提供时为interactive
+
+    必须是异步依赖，使设置的上下文变量在端点和其创建的任务中可见
+    """
+    priority = x_priority or PRIORITY_INTERACTIVE
+    if priority not in PRIORITIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"不支持的优先级: {priority}"
+        )
+    request_priority.set(priority)
+    return priority
@@ -0,0 +1,40 @@
+import asyncio
+from typing import Awaitable, TypeVar
+from fastapi import HTTPException, Request
+
+from app.config import settings
+
+T = TypeVar("T")
+
+# 客户端在响应返回前关闭连接（沿用nginx的约定），响应实际上不会被客户端收到
+HTTP_CLIENT_CLOSED_REQUEST = 499
+
+class ClientDisconnected(HTTPException):
+    """客户端在请求完成前断开了连接"""
+
+    def __init__(self):
+        super().__init__(status_code=HTTP_CLIENT_CLOSED_REQUEST, detail="客户端已断开连接，请求已取消")
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T]) -> T:
+    """
+    执行awaitable，客户端断开连接时取消它
+
+    非流式的接口在客户端断开后仍会执行到结束，期间占用数据库连接和AI服务配额。
+    这里每隔 DISCONNECT_POLL_INTERVAL 秒检查一次连接状态，断开时取消执行，
+    并等待取消完成，使数据库连接在返回前已归还连接池
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=settings.DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.wait({task})
+            # 读取取消前已产生的异常，避免"异常未被获取"的警告
+            if not task.cancelled():
+                task.exception()
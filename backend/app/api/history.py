@@ -1,56 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from typing import List, Optional
 
+from app.config import settings
 from app.models.database import HistoryItemModel
+from app.services.history_store import HistoryStore
+from app.api.dependencies import get_history_store
 
 router = APIRouter(prefix="/api/history", tags=["history"])
 
-# 模拟内存存储，在实际应用中应该使用数据库
-history_items: List[HistoryItemModel] = []
-next_id = 1
-
 @router.get("/", response_model=List[HistoryItemModel])
-async def get_history_items():
-    """获取查询历史记录"""
-    return history_items
+async def get_history_items(
+    response: Response,
+    limit: int = Query(settings.HISTORY_PAGE_SIZE, ge=1, le=settings.HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="上一页响应头 X-Next-Cursor 中的游标"),
+    q: Optional[str] = Query(None, description="在提示、查询和摘要中搜索"),
+    history_store: HistoryStore = Depends(get_history_store)
+):
+    """
+    按时间倒序分页获取查询历史记录
+
+    还有更多记录时，下一页的游标通过 X-Next-Cursor 响应头返回
+    """
+    try:
+        items, next_cursor = await history_store.list_items(limit, cursor=cursor, search=q)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    return items
 
 @router.post("/", response_model=HistoryItemModel)
-async def add_history_item(item: HistoryItemModel):
-    """添加历史记录项"""
-    global next_id
-    
-    # 如果没有ID，则分配一个
-    if not item.id:
-        item.id = next_id
-        next_id += 1
-    
-    # 确保时间戳存在
-    if not item.timestamp:
-        item.timestamp = datetime.now()
-    
-    history_items.append(item)
-    return item
+async def add_history_item(item: HistoryItemModel, history_store: HistoryStore = Depends(get_history_store)):
+    """添加历史记录项，ID由服务端分配"""
+    return await history_store.add(item)
+
+@router.post("/batch", response_model=List[HistoryItemModel])
+async def add_history_items(items: List[HistoryItemModel], history_store: HistoryStore = Depends(get_history_store)):
+    """在一个事务中批量添加历史记录项"""
+    return await history_store.add_many(items)
 
 @router.delete("/{item_id}")
-async def delete_history_item(item_id: int):
+async def delete_history_item(item_id: int, history_store: HistoryStore = Depends(get_history_store)):
     """删除历史记录项"""
-    global history_items
-    
-    original_length = len(history_items)
-    history_items = [item for item in history_items if item.id != item_id]
-    
-    if len(history_items) == original_length:
+    if not await history_store.delete(item_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"找不到ID为{item_id}的历史记录"
         )
-    
+
     return {"message": f"已删除ID为{item_id}的历史记录"}
 
 @router.delete("/")
-async def clear_history():
+async def clear_history(history_store: HistoryStore = Depends(get_history_store)):
     """清空所有历史记录"""
-    global history_items
-    history_items = []
-    return {"message": "已清空所有历史记录"}
\ No newline at end of file
+    await history_store.clear()
+    return {"message": "已清空所有历史记录"}
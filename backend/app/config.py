@@ -6,10 +6,55 @@ class Settings(BaseSettings):
     # 应用程序设置
     APP_NAME: str = "PY-DBChatPro"
     ENVIRONMENT_MODE: str = "local"  # local 或 hosted
-    MAX_ROWS: int = 100  # 查询结果最大行数
+    MAX_ROWS: int = 100  # 查询结果最大行数（提示词和驱动层均按此限制）
+    STREAM_BATCH_SIZE: int = 500  # 流式查询每批读取的行数
+    DISCONNECT_POLL_INTERVAL: float = 0.5  # 执行查询和AI请求期间检查客户端是否断开的间隔（秒）
     
     # 数据库设置
     DATABASE_URL: Optional[str] = None
+    DB_REGISTRY_MAX_CONNECTIONS: int = 32  # 进程内保留的最大连接池数量
+    DB_REGISTRY_IDLE_TTL: int = 1800  # 连接池空闲回收时间（秒）
+    DB_REGISTRY_SWEEP_INTERVAL: int = 60  # 空闲连接检查间隔（秒）
+    DB_POOL_MIN_SIZE: int = 1  # 每个连接池的最小连接数
+    DB_POOL_MAX_SIZE: int = 10  # 每个连接池的最大连接数
+    DB_POOL_RECYCLE: int = 300  # 连接空闲超过该时间后重建（秒）
+    DB_POOL_MAX_LIFETIME: int = 0  # 连接池的最大生命周期，超过后整体重建（秒），0表示不限制；单个连接的回收由 DB_POOL_RECYCLE 控制
+    DB_POOL_ACQUIRE_TIMEOUT: float = 10  # 从连接池获取连接的超时（秒）
+    DB_POOL_CONNECT_TIMEOUT: int = 10  # 连接池建立新连接的超时（秒）
+    DB_HEALTH_CHECK_INTERVAL: int = 30  # 连接池健康检查间隔（秒），0表示不检查
+    DB_HEALTH_CHECK_TIMEOUT: float = 5  # 单次健康检查的超时（秒）
+    DB_RECONNECT_BACKOFF_BASE: float = 1  # 重建连接池失败后的初始重试间隔（秒）
+    DB_RECONNECT_BACKOFF_MAX: float = 60  # 重建连接池的最大重试间隔（秒）
+    DB_STATEMENT_TIMEOUT: float = 60  # 单条SQL语句的最长执行时间（秒），请求指定的超时不能超过该值，0表示不限制
+    DB_TEST_CONNECT_TIMEOUT: int = 5  # 连接测试的连接超时（秒）
+    DB_TEST_CACHE_TTL: float = 5  # 连接测试结果的缓存时间（秒）
+    SCHEMA_BULK_INTROSPECTION: bool = True  # 使用批量目录查询获取数据库架构
+    SCHEMA_CACHE_ENABLED: bool = True  # 是否缓存数据库架构
+    SCHEMA_CACHE_CHECK_INTERVAL: int = 30  # 架构变更检测间隔（秒）
+    COST_GUARD_ENABLED: bool = True  # 执行查询前是否通过EXPLAIN检查估计代价
+    COST_GUARD_MAX_ROWS: float = 5000000  # 执行计划中任一节点估计处理的最大行数（LIMIT之下按流水线执行的节点按限制的行数计算），0表示不限制
+    COST_GUARD_MAX_COST: float = 0  # 优化器估计代价的上限（单位因数据库而异），0表示不限制
+    COST_GUARD_ACTION: str = "reject"  # 超过阈值时的处理方式: reject（拒绝）或 queue（排队）
+    COST_GUARD_QUEUE_CONCURRENCY: int = 1  # queue模式下同时执行的高代价查询数量
+    COST_GUARD_QUEUE_TIMEOUT: float = 30  # queue模式下的最长排队时间（秒），超过后拒绝
+    COST_GUARD_PLAN_CACHE_SIZE: int = 512  # 按规范化SQL缓存的执行计划数量
+    COST_GUARD_PLAN_CACHE_TTL: int = 300  # 执行计划缓存时间（秒）
+    RESULT_CACHE_ENABLED: bool = True  # 是否缓存只读查询的结果
+    RESULT_CACHE_TTL: int = 60  # 查询结果缓存时间（秒）
+    RESULT_CACHE_MAX_BYTES: int = 67108864  # 结果缓存的总大小上限（字节，按JSON序列化后的大小计算）
+    RESULT_CACHE_MAX_ENTRY_BYTES: int = 4194304  # 单个结果超过该大小时不缓存（字节）
+    RESULT_CACHE_CHECK_INTERVAL: float = 5  # 检查表变更计数的间隔（秒）
+    ADMISSION_ENABLED: bool = True  # 是否限制每个数据库和AI服务端点的并发调用
+    ADMISSION_DB_MAX_CONCURRENCY: int = 10  # 每个数据库的最大并发查询数，不应超过 DB_POOL_MAX_SIZE
+    ADMISSION_AI_MAX_CONCURRENCY: int = 8  # 每个AI服务端点的最大并发调用数
+    ADMISSION_MAX_QUEUE: int = 50  # 每个目标的最大排队数量，超过后返回503
+    ADMISSION_QUEUE_TIMEOUT: float = 10  # 最长排队时间（秒），预计或实际超过后返回503
+    ADMISSION_BATCH_SHARE: float = 0.5  # 批量请求（X-Priority: batch 和流式导出）最多占用的名额比例
+    HISTORY_DB_PATH: str = "history.db"  # 查询历史的SQLite数据库文件
+    HISTORY_PAGE_SIZE: int = 50  # 历史记录默认每页数量
+    HISTORY_MAX_PAGE_SIZE: int = 500  # 历史记录每页最大数量
+    HISTORY_BATCH_SIZE: int = 100  # 合并写入的最大历史记录数量
+    HISTORY_BATCH_DELAY: float = 0.05  # 合并写入前等待的时间（秒）
     
     # AI服务设置
     AZURE_OPENAI_ENDPOINT: Optional[str] = None
@@ -17,6 +62,30 @@ class Settings(BaseSettings):
     AZURE_OPENAI_VERSION: str = "2023-12-01-preview"
     OPENAI_KEY: Optional[str] = None
     OLLAMA_ENDPOINT: Optional[str] = None
+    AI_HTTP_TIMEOUT: float = 120  # 单次AI请求总超时（秒）
+    AI_HTTP_CONNECT_TIMEOUT: float = 10  # 建立连接超时（秒）
+    AI_HTTP_POOL_LIMIT: int = 100  # 每个AI端点会话的最大连接数
+    AI_HTTP_POOL_LIMIT_PER_HOST: int = 20  # 每个主机的最大连接数
+    AI_HTTP_KEEPALIVE_TIMEOUT: float = 60  # 空闲keep-alive连接保留时间（秒）
+    AI_HTTP_DNS_CACHE_TTL: int = 300  # DNS缓存时间（秒）
+    AI_RATE_LIMIT_ENABLED: bool = True  # 是否按OpenAI/Azure OpenAI的配额限流并在429后重试
+    AI_RATE_LIMIT_RPM: int = 0  # 每个模型或部署每分钟的请求数，0表示从 x-ratelimit-limit-requests 响应头获取
+    AI_RATE_LIMIT_TPM: int = 0  # 每个模型或部署每分钟的token数，0表示从 x-ratelimit-limit-tokens 响应头获取
+    AI_RATE_LIMIT_COMPLETION_TOKENS: int = 512  # 估算token配额时为每次回复预留的token数
+    AI_RATE_LIMIT_MAX_RETRIES: int = 3  # 收到429后的最大重试次数
+    AI_RATE_LIMIT_MAX_WAIT: float = 60  # 等待配额或重试的最长时间（秒），超过后返回429
+    AI_RATE_LIMIT_BACKOFF_BASE: float = 1  # 没有 Retry-After 时指数退避的初始时间（秒）
+    AI_RATE_LIMIT_JITTER: float = 0.2  # 在 Retry-After 基础上增加的最大随机抖动比例
+    AI_QUERY_CACHE_BACKEND: str = "memory"  # 自然语言查询缓存后端: memory, sqlite 或 none
+    AI_QUERY_CACHE_TTL: int = 86400  # 缓存有效期（秒），0表示不过期
+    AI_QUERY_CACHE_MAX_ENTRIES: int = 1000  # 最大缓存项数量
+    AI_QUERY_CACHE_PATH: str = "ai_query_cache.db"  # sqlite后端的数据库文件
+    SCHEMA_PRUNING_ENABLED: bool = True  # 是否按相关度裁剪提示中的表
+    SCHEMA_PRUNING_MIN_TABLES: int = 30  # 表数量超过该值时才裁剪
+    SCHEMA_PRUNING_TOP_K: int = 15  # 提示中最多包含的表数量
+    SCHEMA_PRUNING_TOKEN_BUDGET: int = 6000  # 表定义部分的token预算
+    PROMPT_SCHEMA_FORMAT: str = "compact"  # 增强提示中的架构格式 ("compact", "ddl")
+    PROMPT_CACHE_MAX_ENTRIES: int = 64  # 按架构指纹缓存的系统提示数量
     
     # Azure服务设置（用于hosted模式）
     AZURE_STORAGE_ENDPOINT: Optional[str] = None
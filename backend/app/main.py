@@ -6,17 +6,92 @@ import uvicorn
 
 from app.config import settings
 from app.api import router as api_router
-from app.services.db_services.db_manager import DatabaseManagerService
-from app.services.ai_service import AIService
+from app.services.db_services.connection_registry import ConnectionRegistry
+from app.services.db_services.schema_cache import SchemaCache
+from app.services.db_services.cost_guard import QueryCostGuard
+from app.services.db_services.result_cache import QueryResultCache
+from app.services.ai.ai_http import ai_http_sessions
+from app.services.ai.ai_query_cache import create_ai_query_cache
+from app.services.history_store import HistoryStore
+from app.services.admission import AdmissionRejected
+from app.services.ai.ai_rate_limit import AIRateLimitExceeded
 
 # 应用启动和关闭事件
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 应用启动时执行的代码
     print(f"启动 {settings.APP_NAME} 应用...")
+    
+    # 进程级数据库连接注册表，使连接池在请求之间复用
+    app.state.connection_registry = ConnectionRegistry(
+        max_connections=settings.DB_REGISTRY_MAX_CONNECTIONS,
+        idle_ttl=settings.DB_REGISTRY_IDLE_TTL,
+        sweep_interval=settings.DB_REGISTRY_SWEEP_INTERVAL,
+        health_check_interval=settings.DB_HEALTH_CHECK_INTERVAL,
+        health_check_timeout=settings.DB_HEALTH_CHECK_TIMEOUT,
+        max_pool_lifetime=settings.DB_POOL_MAX_LIFETIME,
+        backoff_base=settings.DB_RECONNECT_BACKOFF_BASE,
+        backoff_max=settings.DB_RECONNECT_BACKOFF_MAX
+    )
+    await app.state.connection_registry.start()
+    
+    # 按连接缓存数据库架构，通过变更检测增量刷新
+    app.state.schema_cache = SchemaCache(
+        check_interval=settings.SCHEMA_CACHE_CHECK_INTERVAL
+    ) if settings.SCHEMA_CACHE_ENABLED else None
+    
+    # 执行前的代价检查，拒绝或排队估计代价过高的查询
+    app.state.cost_guard = QueryCostGuard(
+        max_rows=settings.COST_GUARD_MAX_ROWS,
+        max_cost=settings.COST_GUARD_MAX_COST,
+        action=settings.COST_GUARD_ACTION,
+        queue_concurrency=settings.COST_GUARD_QUEUE_CONCURRENCY,
+        queue_timeout=settings.COST_GUARD_QUEUE_TIMEOUT,
+        cache_size=settings.COST_GUARD_PLAN_CACHE_SIZE,
+        cache_ttl=settings.COST_GUARD_PLAN_CACHE_TTL
+    ) if settings.COST_GUARD_ENABLED else None
+    
+    # 只读查询的结果缓存，按表失效
+    app.state.result_cache = QueryResultCache(
+        ttl=settings.RESULT_CACHE_TTL,
+        max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+        max_entry_bytes=settings.RESULT_CACHE_MAX_ENTRY_BYTES,
+        check_interval=settings.RESULT_CACHE_CHECK_INTERVAL
+    ) if settings.RESULT_CACHE_ENABLED else None
+    
+    # 自然语言到SQL的结果缓存
+    app.state.ai_query_cache = create_ai_query_cache(
+        backend=settings.AI_QUERY_CACHE_BACKEND,
+        max_entries=settings.AI_QUERY_CACHE_MAX_ENTRIES,
+        ttl=settings.AI_QUERY_CACHE_TTL,
+        path=settings.AI_QUERY_CACHE_PATH
+    )
+    
+    # 持久化的查询历史
+    app.state.history_store = HistoryStore(
+        path=settings.HISTORY_DB_PATH,
+        batch_size=settings.HISTORY_BATCH_SIZE,
+        batch_delay=settings.HISTORY_BATCH_DELAY
+    )
+    
+    # 为已配置的AI服务预先建立共享HTTP会话
+    for endpoint in (
+        "https://api.openai.com" if settings.OPENAI_KEY else None,
+        settings.AZURE_OPENAI_ENDPOINT if settings.AZURE_OPENAI_KEY else None,
+        settings.OLLAMA_ENDPOINT,
+    ):
+        if endpoint:
+            await ai_http_sessions.get_session(endpoint)
+    
     yield
+    
     # 应用关闭时执行的代码
     print(f"关闭 {settings.APP_NAME} 应用...")
+    await app.state.connection_registry.close()
+    await ai_http_sessions.close()
+    if app.state.ai_query_cache is not None:
+        app.state.ai_query_cache.close()
+    await app.state.history_store.close()
 
 # 创建FastAPI应用实例
 app = FastAPI(
@@ -33,15 +108,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Result-Truncated", "X-Result-Row-Count", "Retry-After"],
 )
 
-# 依赖注入
-def get_db_manager():
-    return DatabaseManagerService()
-
-def get_ai_service():
-    return AIService()
-
 # 注册路由
 app.include_router(api_router)
 
@@ -56,6 +125,24 @@ async def health_check():
     return {"status": "healthy"}
 
 # 异常处理
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request, exc: AdmissionRejected):
+    # 数据库或AI服务繁忙时尽早返回503，由客户端按Retry-After重试
+    return JSONResponse(
+        status_code=503,
+        content={"message": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(AIRateLimitExceeded)
+async def ai_rate_limit_exceeded_handler(request, exc: AIRateLimitExceeded):
+    # AI服务配额用完且重试后仍无法完成时返回429
+    return JSONResponse(
+        status_code=429,
+        content={"message": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     return JSONResponse(
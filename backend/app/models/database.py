@@ -3,14 +3,24 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from typing import List, Dict, Any, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 Base = declarative_base()
 
 # Pydantic模型 - 用于API请求和响应
+class ForeignKeyModel(BaseModel):
+    name: Optional[str] = None
+    columns: List[str]
+    referenced_table: str
+    referenced_columns: List[str]
+    
+    class Config:
+        orm_mode = True
+
 class TableSchemaModel(BaseModel):
     name: str
     columns: List[Dict[str, str]]
+    foreign_keys: List[ForeignKeyModel] = []  # 数据库中声明的外键约束
     
     class Config:
         orm_mode = True
@@ -19,6 +29,7 @@ class DatabaseSchemaModel(BaseModel):
     name: str
     tables: List[TableSchemaModel]
     schema_raw: List[str]
+    fingerprint: Optional[str] = None  # 架构内容指纹，由架构缓存计算
     
     class Config:
         orm_mode = True
@@ -43,7 +54,7 @@ class AIConnectionModel(BaseModel):
 
 class HistoryItemModel(BaseModel):
     id: Optional[int] = None
-    timestamp: datetime = datetime.now()
+    timestamp: datetime = Field(default_factory=datetime.now)
     prompt: str
     query: str
     summary: str
@@ -66,7 +77,7 @@ class HistoryItem(Base):
     __tablename__ = "history_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(DateTime, default=datetime.now)
+    timestamp = Column(DateTime, default=datetime.now, index=True)
     prompt = Column(Text, nullable=False)
     query = Column(Text, nullable=False)
     summary = Column(Text, nullable=False)
\ No newline at end of file
@@ -0,0 +1,217 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+
+from app.config import settings
+
+# 请求的优先级：交互式请求优先获得执行名额，导出和批量请求最多占用一部分名额
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BATCH)
+
+# 当前请求的优先级，由API层根据 X-Priority 请求头设置，并随任务传递到数据库和AI调用
+request_priority: ContextVar[str] = ContextVar("request_priority", default=PRIORITY_INTERACTIVE)
+
+# 准入控制的目标类型
+TARGET_DATABASE = "database"
+TARGET_AI = "ai"
+
+class AdmissionRejected(Exception):
+    """目标繁忙，请求在进入数据库驱动或AI服务之前被拒绝"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class AdmissionGate:
+    """
+    单个目标（一个数据库或一个AI服务端点）的并发限制
+
+    同时最多执行 max_concurrency 个调用，批量请求最多占用其中 batch_limit 个。
+    其余调用在有界队列中等待，交互式请求先于批量请求获得名额。队列已满、
+    预计等待时间超过 queue_timeout，或实际等待超时的请求被拒绝，并给出建议的重试时间
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float, batch_limit: int):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.batch_limit = max(1, min(batch_limit, max_concurrency))
+        self._active: Dict[str, int] = {priority: 0 for priority in PRIORITIES}
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {priority: deque() for priority in PRIORITIES}
+        # 单次调用占用名额时间的指数移动平均，用于估计排队时间
+        self._hold_time: float = 0.0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+
+    @property
+    def active(self) -> int:
+        return sum(self._active.values())
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    @asynccontextmanager
+    async def slot(self, priority: str = PRIORITY_INTERACTIVE) -> AsyncIterator[None]:
+        """占用一个执行名额，退出时释放"""
+        if priority not in self._active:
+            priority = PRIORITY_INTERACTIVE
+        await self._acquire(priority)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self._hold_time = elapsed if not self._hold_time else 0.8 * self._hold_time + 0.2 * elapsed
+            self._active[priority] -= 1
+            self._wake()
+
+    def retry_after(self) -> int:
+        """按当前排队长度和平均占用时间估计的重试等待时间（秒）"""
+        return max(1, math.ceil(self._estimated_wait(self.waiting)))
+
+    def _estimated_wait(self, ahead: int) -> float:
+        return self._hold_time * (ahead + 1) / self.max_concurrency
+
+    def _has_capacity(self, priority: str) -> bool:
+        if self.active >= self.max_concurrency:
+            return False
+        return priority != PRIORITY_BATCH or self._active[PRIORITY_BATCH] < self.batch_limit
+
+    async def _acquire(self, priority: str) -> None:
+        # 交互式请求只需排在其他交互式请求之后，批量请求排在所有请求之后
+        ahead = len(self._waiters[PRIORITY_INTERACTIVE])
+        if priority == PRIORITY_BATCH:
+            ahead += len(self._waiters[PRIORITY_BATCH])
+        if not ahead and self._has_capacity(priority):
+            self._active[priority] += 1
+            self.admitted += 1
+            return
+
+        # 提前拒绝，而不是排队到超时或在驱动内部超时
+        if self.waiting >= self.max_queue or self._estimated_wait(ahead) > self.queue_timeout:
+            self.rejected += 1
+            raise AdmissionRejected("服务繁忙，请稍后重试", self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(future)
+        self.queued += 1
+        try:
+            done, _ = await asyncio.wait({future}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(priority, future)
+            raise
+
+        if not done:
+            self._abandon(priority, future)
+            self.rejected += 1
+            raise AdmissionRejected("服务繁忙，排队等待超时", self.retry_after())
+        self.admitted += 1
+
+    def _abandon(self, priority: str, future: asyncio.Future) -> None:
+        """等待者离开队列；名额已经交给它时归还名额"""
+        if future.done() and not future.cancelled():
+            self._active[priority] -= 1
+            self._wake()
+            return
+        future.cancel()
+        try:
+            self._waiters[priority].remove(future)
+        except ValueError:
+            pass
+
+    def _wake(self) -> None:
+        """把空出的名额按优先级交给等待者"""
+        for priority in PRIORITIES:
+            waiters = self._waiters[priority]
+            while waiters and self._has_capacity(priority):
+                future = waiters.popleft()
+                if future.done():
+                    continue
+                self._active[priority] += 1
+                future.set_result(None)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": dict(self._active),
+            "waiting": {priority: len(waiters) for priority, waiters in self._waiters.items()},
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "avg_hold_seconds": round(self._hold_time, 3),
+        }
+
+class AdmissionController:
+    """
+    按目标管理准入控制
+
+    每个数据库（按连接字符串）和每个AI服务端点各有一个AdmissionGate，首次使用时按配置创建
+    """
+
+    # 目标数量超过该值时清理空闲的目标
+    _MAX_IDLE_GATES = 256
+
+    def __init__(self):
+        self._gates: Dict[Tuple[str, str], AdmissionGate] = {}
+
+    def gate(self, kind: str, target: str) -> AdmissionGate:
+        """获取目标的并发限制，不存在时创建"""
+        key = (kind, target)
+        gate = self._gates.get(key)
+        if gate is None:
+            if len(self._gates) >= self._MAX_IDLE_GATES:
+                self._prune()
+            max_concurrency = (
+                settings.ADMISSION_AI_MAX_CONCURRENCY if kind == TARGET_AI
+                else settings.ADMISSION_DB_MAX_CONCURRENCY
+            )
+            gate = AdmissionGate(
+                max_concurrency=max_concurrency,
+                max_queue=settings.ADMISSION_MAX_QUEUE,
+                queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+                batch_limit=math.ceil(max_concurrency * settings.ADMISSION_BATCH_SHARE)
+            )
+            self._gates[key] = gate
+        return gate
+
+    @asynccontextmanager
+    async def slot(self, kind: str, target: str, priority: Optional[str] = None) -> AsyncIterator[None]:
+        """
+        在目标上占用一个执行名额
+
+        priority为空时使用当前请求的优先级；未启用准入控制时直接执行
+        """
+        if not settings.ADMISSION_ENABLED:
+            yield
+            return
+        async with self.gate(kind, target).slot(priority or request_priority.get()):
+            yield
+
+    def stats(self, kind: Optional[str] = None) -> Dict[str, object]:
+        """各目标的并发和排队统计，数据库目标只显示连接字符串的主机部分"""
+        return {
+            _display_target(target): gate.stats()
+            for (gate_kind, target), gate in self._gates.items()
+            if kind is None or gate_kind == kind
+        }
+
+    def _prune(self) -> None:
+        for key in [key for key, gate in self._gates.items() if not gate.active and not gate.waiting]:
+            del self._gates[key]
+
+def _display_target(target: str) -> str:
+    """去掉连接字符串中的用户名和密码"""
+    scheme, sep, rest = target.partition("://")
+    if not sep:
+        return target
+    return f"{scheme}://{rest.rpartition('@')[2]}"
+
+# 进程级准入控制
+admission = AdmissionController()
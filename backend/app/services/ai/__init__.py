@@ -3,6 +3,7 @@ AI服务模块，提供与各种AI服务交互的功能
 """
 
 from app.services.ai.ai_messages import ChatMessage
+from app.services.ai.ai_http import AIHttpSessionPool, ai_http_sessions
 from app.services.ai.ai_clients import (
     BaseAIClient, 
     OpenAIClient, 
@@ -11,4 +12,7 @@ from app.services.ai.ai_clients import (
     create_ai_client
 )
 from app.services.ai.db_schema_enhancer import DatabaseSchemaEnhancer
-from app.services.ai.ai_prompt_builder import AIPromptBuilder
\ No newline at end of file
+from app.services.ai.ai_prompt_builder import AIPromptBuilder
+from app.services.ai.schema_serializer import SchemaSerializer
+from app.services.ai.schema_retriever import SchemaRetriever, schema_retriever
+from app.services.ai.streaming_json import IncrementalJSONFieldParser
\ No newline at end of file
@@ -1,18 +1,125 @@
+import asyncio
+import json
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import List, AsyncIterator, Dict, Any, Optional
 import aiohttp
-from typing import List
 from fastapi import HTTPException
 
 from app.config import settings
-from app.services.ai.ai_messages import ChatMessage
+from app.services.ai.ai_messages import ChatMessage, estimate_tokens
+from app.services.ai.ai_http import ai_http_sessions, request_timeout, stream_timeout
+from app.services.ai.ai_rate_limit import (
+    ai_rate_limiters, estimate_prompt_tokens, retry_after_seconds, retry_delay, AIRateLimitExceeded
+)
 
 # 抽象AI客户端接口
 class BaseAIClient:
     """
     AI客户端的抽象基类，定义与各种AI服务交互的接口
     """
-    async def complete_chat(self, messages: List[ChatMessage]) -> str:
-        """发送消息到AI并获取响应"""
+    async def complete_chat(self, messages: List[ChatMessage], timeout: Optional[float] = None) -> str:
+        """
+        发送消息到AI并获取响应
+        
+        timeout为本次请求的截止时间（秒），超时抛出asyncio.TimeoutError；调用被取消时HTTP请求随之中止
+        """
         raise NotImplementedError("子类必须实现此方法")
+    
+    async def stream_chat(self, messages: List[ChatMessage]) -> AsyncIterator[str]:
+        """
+        发送消息到AI并在生成过程中逐段返回响应文本
+        
+        默认实现等待完整响应后一次性返回，支持流式输出的客户端应覆盖此方法
+        """
+        yield await self.complete_chat(messages)
+
+async def _iter_sse_data(response) -> AsyncIterator[Dict[str, Any]]:
+    """解析OpenAI风格的Server-Sent Events响应，逐个返回data字段中的JSON对象"""
+    async for raw_line in response.content:
+        line = raw_line.decode("utf-8").strip()
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        yield json.loads(data)
+
+def _openai_delta_content(chunk: Dict[str, Any]) -> str:
+    """提取OpenAI流式响应块中的增量文本"""
+    choices = chunk.get("choices") or []
+    if not choices:
+        return ""
+    return (choices[0].get("delta") or {}).get("content") or ""
+
+def _estimate_request_tokens(messages: List[ChatMessage]) -> int:
+    """估算一次请求计入token配额的数量：提示加上预留的回复长度"""
+    return estimate_prompt_tokens(messages) + settings.AI_RATE_LIMIT_COMPLETION_TOKENS
+
+@asynccontextmanager
+async def _rate_limited_post(
+    api_url: str,
+    rate_limit_target: str,
+    headers: Dict[str, str],
+    payload: Dict[str, Any],
+    estimated_tokens: int,
+    provider_name: str,
+    timeout: Optional[float] = None,
+    stream: bool = False
+) -> AsyncIterator[aiohttp.ClientResponse]:
+    """
+    在端点的请求数和token数预算内发送请求，返回状态为200的响应
+
+    收到429时按 Retry-After 等响应头暂停该端点的请求，加抖动后重试，最多重试 AI_RATE_LIMIT_MAX_RETRIES 次，
+    仍然失败时抛出AIRateLimitExceeded；其他错误状态抛出HTTPException。
+    非流式请求的timeout（默认 AI_HTTP_TIMEOUT）是包括等待配额和重试在内的整个调用的截止时间，
+    每次尝试只使用剩余的时间，下一次重试的等待会超过截止时间时不再重试
+    """
+    deadline = None
+    if not stream:
+        deadline = time.monotonic() + (min(timeout, settings.AI_HTTP_TIMEOUT) if timeout else settings.AI_HTTP_TIMEOUT)
+    limiter = ai_rate_limiters.get(rate_limit_target) if settings.AI_RATE_LIMIT_ENABLED else None
+    attempt = 0
+    while True:
+        if limiter is not None:
+            await limiter.acquire(estimated_tokens, deadline)
+        if deadline is None:
+            client_timeout = stream_timeout()
+        else:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            client_timeout = request_timeout(remaining)
+        session = await ai_http_sessions.get_session(api_url)
+        async with session.post(api_url, headers=headers, json=payload, timeout=client_timeout) as response:
+            if limiter is not None:
+                limiter.update_from_headers(response.headers)
+                if response.status == 429 and attempt < settings.AI_RATE_LIMIT_MAX_RETRIES:
+                    delay = retry_delay(response.headers, attempt)
+                    within_deadline = deadline is None or time.monotonic() + delay < deadline
+                    if delay <= settings.AI_RATE_LIMIT_MAX_WAIT and within_deadline:
+                        # 被拒绝的请求没有消耗服务端的token配额
+                        limiter.record_usage(estimated_tokens, 0)
+                        limiter.backoff(delay)
+                        attempt += 1
+                        continue
+            if response.status == 429:
+                retry_after = retry_after_seconds(response.headers) or settings.AI_RATE_LIMIT_BACKOFF_BASE
+                raise AIRateLimitExceeded(
+                    f"{provider_name} API请求频率超过配额，请稍后重试", max(1, math.ceil(retry_after))
+                )
+            if response.status != 200:
+                error_text = await response.text()
+                raise HTTPException(status_code=response.status,
+                                   detail=f"{provider_name} API错误: {error_text}")
+            yield response
+            return
+
+def _record_usage(rate_limit_target: str, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+    """用服务端返回或估算的实际token数校正限流预算"""
+    if settings.AI_RATE_LIMIT_ENABLED and actual_tokens is not None:
+        ai_rate_limiters.get(rate_limit_target).record_usage(estimated_tokens, actual_tokens)
 
 # OpenAI客户端实现
 class OpenAIClient(BaseAIClient):
@@ -23,8 +130,10 @@ class OpenAIClient(BaseAIClient):
         self.api_key = api_key
         self.model = model
         self.api_url = "https://api.openai.com/v1/chat/completions"
+        # OpenAI的配额按模型计算
+        self.rate_limit_target = f"{self.api_url}#{model}"
         
-    async def complete_chat(self, messages: List[ChatMessage]) -> str:
+    async def complete_chat(self, messages: List[ChatMessage], timeout: Optional[float] = None) -> str:
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
@@ -35,15 +144,44 @@ class OpenAIClient(BaseAIClient):
             "messages": [{"role": msg.role, "content": msg.content} for msg in messages]
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(self.api_url, headers=headers, json=payload) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise HTTPException(status_code=response.status, 
-                                       detail=f"OpenAI API错误: {error_text}")
-                
-                data = await response.json()
-                return data["choices"][0]["message"]["content"]
+        estimated_tokens = _estimate_request_tokens(messages)
+        async with _rate_limited_post(
+            self.api_url, self.rate_limit_target, headers, payload, estimated_tokens, "OpenAI", timeout=timeout
+        ) as response:
+            data = await response.json()
+            _record_usage(self.rate_limit_target, estimated_tokens, (data.get("usage") or {}).get("total_tokens"))
+            return data["choices"][0]["message"]["content"]
+    
+    async def stream_chat(self, messages: List[ChatMessage]) -> AsyncIterator[str]:
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        payload = {
+            "model": self.model,
+            "messages": [{"role": msg.role, "content": msg.content} for msg in messages],
+            "stream": True
+        }
+        
+        estimated_tokens = _estimate_request_tokens(messages)
+        async with _rate_limited_post(
+            self.api_url, self.rate_limit_target, headers, payload, estimated_tokens, "OpenAI", stream=True
+        ) as response:
+            # 流式响应不返回usage，按生成的文本估算实际消耗
+            completion_tokens = 0
+            try:
+                async for chunk in _iter_sse_data(response):
+                    content = _openai_delta_content(chunk)
+                    if content:
+                        completion_tokens += estimate_tokens(content)
+                        yield content
+            finally:
+                _record_usage(
+                    self.rate_limit_target,
+                    estimated_tokens,
+                    estimate_prompt_tokens(messages) + completion_tokens
+                )
 
 # Azure OpenAI客户端实现
 class AzureOpenAIClient(BaseAIClient):
@@ -56,8 +194,10 @@ class AzureOpenAIClient(BaseAIClient):
         self.model = model
         self.api_version = api_version
         self.api_url = f"{endpoint}/openai/deployments/{model}/chat/completions?api-version={api_version}"
+        # Azure OpenAI的配额按部署计算，部署名称已包含在路径中
+        self.rate_limit_target = self.api_url.split("?", 1)[0]
         
-    async def complete_chat(self, messages: List[ChatMessage]) -> str:
+    async def complete_chat(self, messages: List[ChatMessage], timeout: Optional[float] = None) -> str:
         headers = {
             "api-key": self.api_key,
             "Content-Type": "application/json"
@@ -67,15 +207,43 @@ class AzureOpenAIClient(BaseAIClient):
             "messages": [{"role": msg.role, "content": msg.content} for msg in messages]
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(self.api_url, headers=headers, json=payload) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise HTTPException(status_code=response.status, 
-                                       detail=f"Azure OpenAI API错误: {error_text}")
-                
-                data = await response.json()
-                return data["choices"][0]["message"]["content"]
+        estimated_tokens = _estimate_request_tokens(messages)
+        async with _rate_limited_post(
+            self.api_url, self.rate_limit_target, headers, payload, estimated_tokens, "Azure OpenAI", timeout=timeout
+        ) as response:
+            data = await response.json()
+            _record_usage(self.rate_limit_target, estimated_tokens, (data.get("usage") or {}).get("total_tokens"))
+            return data["choices"][0]["message"]["content"]
+    
+    async def stream_chat(self, messages: List[ChatMessage]) -> AsyncIterator[str]:
+        headers = {
+            "api-key": self.api_key,
+            "Content-Type": "application/json"
+        }
+        
+        payload = {
+            "messages": [{"role": msg.role, "content": msg.content} for msg in messages],
+            "stream": True
+        }
+        
+        estimated_tokens = _estimate_request_tokens(messages)
+        async with _rate_limited_post(
+            self.api_url, self.rate_limit_target, headers, payload, estimated_tokens, "Azure OpenAI", stream=True
+        ) as response:
+            # 流式响应不返回usage，按生成的文本估算实际消耗
+            completion_tokens = 0
+            try:
+                async for chunk in _iter_sse_data(response):
+                    content = _openai_delta_content(chunk)
+                    if content:
+                        completion_tokens += estimate_tokens(content)
+                        yield content
+            finally:
+                _record_usage(
+                    self.rate_limit_target,
+                    estimated_tokens,
+                    estimate_prompt_tokens(messages) + completion_tokens
+                )
 
 # Ollama客户端实现
 class OllamaClient(BaseAIClient):
@@ -87,21 +255,47 @@ class OllamaClient(BaseAIClient):
         self.model = model
         self.api_url = f"{endpoint}/api/chat"
         
-    async def complete_chat(self, messages: List[ChatMessage]) -> str:
+    async def complete_chat(self, messages: List[ChatMessage], timeout: Optional[float] = None) -> str:
         payload = {
             "model": self.model,
             "messages": [{"role": msg.role, "content": msg.content} for msg in messages]
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(self.api_url, json=payload) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise HTTPException(status_code=response.status, 
-                                       detail=f"Ollama API错误: {error_text}")
+        session = await ai_http_sessions.get_session(self.api_url)
+        async with session.post(self.api_url, json=payload, timeout=request_timeout(timeout)) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise HTTPException(status_code=response.status, 
+                                   detail=f"Ollama API错误: {error_text}")
                 
-                data = await response.json()
-                return data["message"]["content"]
+            data = await response.json()
+            return data["message"]["content"]
+    
+    async def stream_chat(self, messages: List[ChatMessage]) -> AsyncIterator[str]:
+        payload = {
+            "model": self.model,
+            "messages": [{"role": msg.role, "content": msg.content} for msg in messages],
+            "stream": True
+        }
+        
+        session = await ai_http_sessions.get_session(self.api_url)
+        async with session.post(self.api_url, json=payload, timeout=stream_timeout()) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise HTTPException(status_code=response.status, 
+                                   detail=f"Ollama API错误: {error_text}")
+            
+            # Ollama以NDJSON格式逐行返回响应块
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                content = (chunk.get("message") or {}).get("content") or ""
+                if content:
+                    yield content
+                if chunk.get("done"):
+                    break
 
 # 客户端工厂函数
 def create_ai_client(ai_service: str, ai_model: str) -> BaseAIClient:
@@ -0,0 +1,77 @@
+import asyncio
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from app.config import settings
+
+class AIHttpSessionPool:
+    """
+    AI服务的共享HTTP会话池
+
+    每个服务端点（协议+主机+端口）保持一个长期存在的aiohttp会话，
+    使对同一AI服务的请求复用keep-alive连接，避免每次请求都重新进行TCP和TLS握手。
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._lock: Optional[asyncio.Lock] = None
+
+    @staticmethod
+    def _endpoint_key(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=settings.AI_HTTP_POOL_LIMIT,
+            limit_per_host=settings.AI_HTTP_POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=settings.AI_HTTP_DNS_CACHE_TTL,
+            keepalive_timeout=settings.AI_HTTP_KEEPALIVE_TIMEOUT,
+            enable_cleanup_closed=True
+        )
+        return aiohttp.ClientSession(connector=connector, timeout=request_timeout())
+
+    async def get_session(self, url: str) -> aiohttp.ClientSession:
+        """获取URL所在端点的共享会话，不存在时创建"""
+        key = self._endpoint_key(url)
+        session = self._sessions.get(key)
+        if session is not None and not session.closed:
+            return session
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            session = self._sessions.get(key)
+            if session is None or session.closed:
+                session = self._create_session()
+                self._sessions[key] = session
+            return session
+
+    async def close(self) -> None:
+        """关闭所有会话"""
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for session in sessions:
+            if not session.closed:
+                await session.close()
+
+def request_timeout(total: Optional[float] = None) -> aiohttp.ClientTimeout:
+    """单次AI请求的超时设置，total为本次请求的截止时间（秒），不能超过 AI_HTTP_TIMEOUT"""
+    return aiohttp.ClientTimeout(
+        total=min(total, settings.AI_HTTP_TIMEOUT) if total else settings.AI_HTTP_TIMEOUT,
+        connect=settings.AI_HTTP_CONNECT_TIMEOUT
+    )
+
+def stream_timeout() -> aiohttp.ClientTimeout:
+    """流式AI请求的超时设置：不限制总时长，只限制两次读取之间的间隔"""
+    return aiohttp.ClientTimeout(
+        total=None,
+        connect=settings.AI_HTTP_CONNECT_TIMEOUT,
+        sock_read=settings.AI_HTTP_TIMEOUT
+    )
+
+# 进程级共享会话池，由应用lifespan负责关闭
+ai_http_sessions = AIHttpSessionPool()
@@ -1,3 +1,4 @@
+import math
 from pydantic import BaseModel
 from typing import List
 
@@ -11,4 +12,9 @@ class ChatMessage(BaseModel):
         content: 消息内容
     """
     role: str  # system, user, assistant
-    content: str
\ No newline at end of file
+    content: str
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的token数：ASCII字符约4个一个token，其他字符（如中文）约每字一个token"""
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
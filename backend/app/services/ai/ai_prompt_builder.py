@@ -1,50 +1,29 @@
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Tuple
+
 from app.config import settings
 from app.models.database import DatabaseSchemaModel
 from app.services.ai.db_schema_enhancer import DatabaseSchemaEnhancer
+from app.services.ai.schema_serializer import SchemaSerializer
 
-class AIPromptBuilder:
-    """
-    负责构建和优化提示词的类
-    """
-    
-    @staticmethod
-    def build_sql_generation_prompt(db_schema: DatabaseSchemaModel, database_type: str) -> str:
-        """
-        构建用于SQL生成的增强提示
-        
-        参数:
-            db_schema: 数据库模式
-            database_type: 数据库类型
-            
-        返回:
-            str: 优化的提示词
-        """
-        # 获取原始模式信息
-        schema_raw = chr(10).join(db_schema.schema_raw)
-        
-        # 获取增强的数据库理解信息
-        enhanced_understanding = DatabaseSchemaEnhancer.enhance_schema(db_schema, database_type)
-        
-        # 构建完整的增强提示
-        prompt = f"""
-你是一个专业的{database_type}数据库专家和SQL大师。请根据用户的自然语言描述，生成精确、高效的SQL查询。
-
-## 数据库模式定义:
-```sql
-{schema_raw}
-```
+# 提示模式
+PROMPT_MODE_ENHANCED = "enhanced"
+PROMPT_MODE_BASIC = "basic"
 
-## 增强的数据库理解:
-{enhanced_understanding}
+# 提示模板：与架构无关的静态部分放在最前面，架构部分放在最后，
+# 使不同架构（或裁剪后的不同表子集）的提示共享尽可能长的相同前缀，便于AI服务端的提示缓存生效
+_ENHANCED_PREFIX_TEMPLATE = """
+你是一个专业的{database_type}数据库专家和SQL大师。请根据用户的自然语言描述，生成精确、高效的SQL查询。
 
 ## 查询生成指南:
 1. 仔细分析用户的需求，确保理解他们真正想要的数据
-2. 选择适当的表和字段，考虑上面描述的表关系
+2. 选择适当的表和字段，考虑下面描述的表关系
 3. 使用正确的JOIN类型（INNER, LEFT, RIGHT）连接相关表
 4. 添加WHERE子句筛选出精确匹配用户需求的数据
 5. 正确处理NULL值和边缘情况
 6. 使用适当的ORDER BY子句排序结果
-7. 使用LIMIT {settings.MAX_ROWS} 限制结果数量
+7. 使用LIMIT {max_rows} 限制结果数量
 8. 确保使用{database_type}特有的SQL语法
 
 在查询结果中包含列名标题。
@@ -55,9 +34,120 @@ class AIPromptBuilder:
 在上述JSON响应中，将"your-query"替换为用于检索请求数据的数据库查询。
 在上述JSON响应中，将"your-summary"替换为详细段落中创建此查询所采取的每个步骤的解释。
 """
+
+_ENHANCED_SCHEMA_TEMPLATE = """
+## 数据库模式定义:
+{schema_definition}
+
+## 增强的数据库理解:
+{enhanced_understanding}
+"""
+
+_BASIC_PREFIX_TEMPLATE = """
+你是一个有帮助的、友好的数据库助手。请不要回复与数据库或查询无关的任何信息。
+
+在查询结果中包含列名标题。
+始终以以下JSON格式提供你的答案：
+{{ "summary": "your-summary", "query": "your-query" }}
+
+仅输出单行上的JSON格式。不要使用换行符。
+在上述JSON响应中，将"your-query"替换为用于检索请求数据的数据库查询。
+在上述JSON响应中，将"your-summary"替换为详细段落中创建此查询所采取的每个步骤的解释。
+仅使用{database_type}语法进行数据库查询。
+始终将SQL查询限制为{max_rows}行。
+始终包括所有表列和详细信息。
+"""
+
+_BASIC_SCHEMA_TEMPLATE = """
+使用以下数据库模式创建你的答案：
+
+{schema_raw}
+"""
+
+@lru_cache(maxsize=32)
+def _static_prefix(mode: str, database_type: str, max_rows: int) -> str:
+    """渲染与架构无关的提示前缀"""
+    template = _ENHANCED_PREFIX_TEMPLATE if mode == PROMPT_MODE_ENHANCED else _BASIC_PREFIX_TEMPLATE
+    return template.format(database_type=database_type, max_rows=max_rows)
+
+class AIPromptBuilder:
+    """
+    负责构建和优化提示词的类
+    
+    渲染后的系统提示按 (架构指纹, 数据库类型, 提示模式, MAX_ROWS, 架构格式) 缓存，
+    同一架构的后续请求不再重新生成。
+    """
+    
+    # 缓存键 -> 渲染后的系统提示
+    _prompt_cache: "OrderedDict[Tuple, str]" = OrderedDict()
+    
+    @staticmethod
+    def get_sql_system_prompt(db_schema: DatabaseSchemaModel, database_type: str, enhanced: bool = True) -> str:
+        """
+        获取SQL生成的系统提示，优先使用缓存
         
+        参数:
+            db_schema: 数据库模式
+            database_type: 数据库类型
+            enhanced: True使用增强提示，False使用基本提示
+        
+        返回:
+            str: 系统提示
+        """
+        mode = PROMPT_MODE_ENHANCED if enhanced else PROMPT_MODE_BASIC
+        build = AIPromptBuilder.build_sql_generation_prompt if enhanced else AIPromptBuilder.build_basic_sql_prompt
+        
+        # 没有指纹的架构无法判断内容是否相同，不缓存
+        if db_schema.fingerprint is None:
+            return build(db_schema, database_type)
+        
+        key = (db_schema.fingerprint, database_type, mode, settings.MAX_ROWS, settings.PROMPT_SCHEMA_FORMAT)
+        cache = AIPromptBuilder._prompt_cache
+        prompt = cache.get(key)
+        if prompt is None:
+            prompt = build(db_schema, database_type)
+            cache[key] = prompt
+            while len(cache) > settings.PROMPT_CACHE_MAX_ENTRIES:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
         return prompt
     
+    @staticmethod
+    def build_sql_generation_prompt(db_schema: DatabaseSchemaModel, database_type: str) -> str:
+        """
+        构建用于SQL生成的增强提示
+        
+        参数:
+            db_schema: 数据库模式
+            database_type: 数据库类型
+        
+        返回:
+            str: 优化的提示词
+        """
+        if settings.PROMPT_SCHEMA_FORMAT == "compact":
+            # 紧凑格式已包含列、类型、主键和表关系，增强信息中不再重复这些内容
+            schema_definition = SchemaSerializer.serialize_compact(db_schema)
+            enhanced_understanding = DatabaseSchemaEnhancer.enhance_schema(
+                db_schema,
+                database_type,
+                include_table_details=False,
+                include_relationships=False
+            )
+        else:
+            # 获取原始模式信息
+            schema_raw = chr(10).join(db_schema.schema_raw)
+            schema_definition = f"```sql\n{schema_raw}\n```"
+            
+            # 获取增强的数据库理解信息
+            enhanced_understanding = DatabaseSchemaEnhancer.enhance_schema(db_schema, database_type)
+        
+        # 静态前缀在前，架构相关部分在后
+        return _static_prefix(PROMPT_MODE_ENHANCED, database_type, settings.MAX_ROWS) + _ENHANCED_SCHEMA_TEMPLATE.format(
+            schema_definition=schema_definition,
+            enhanced_understanding=enhanced_understanding
+        )
+    
     @staticmethod
     def build_basic_sql_prompt(db_schema: DatabaseSchemaModel, database_type: str) -> str:
         """
@@ -66,29 +156,13 @@ class AIPromptBuilder:
         参数:
             db_schema: 数据库模式
             database_type: 数据库类型
-            
+        
         返回:
             str: 基本提示词
         """
         # 使用原始模式
         schema_raw = chr(10).join(db_schema.schema_raw)
         
-        # 构建基本提示
-        prompt = f"""
-你是一个有帮助的、友好的数据库助手。请不要回复与数据库或查询无关的任何信息。使用以下数据库模式创建你的答案：
-
-{schema_raw}
-
-在查询结果中包含列名标题。
-始终以以下JSON格式提供你的答案：
-{{ "summary": "your-summary", "query": "your-query" }}
-
-仅输出单行上的JSON格式。不要使用换行符。
-在上述JSON响应中，将"your-query"替换为用于检索请求数据的数据库查询。
-在上述JSON响应中，将"your-summary"替换为详细段落中创建此查询所采取的每个步骤的解释。
-仅使用{database_type}语法进行数据库查询。
-始终将SQL查询限制为{settings.MAX_ROWS}行。
-始终包括所有表列和详细信息。
-"""
-        
-        return prompt
\ No newline at end of file
+        return _static_prefix(PROMPT_MODE_BASIC, database_type, settings.MAX_ROWS) + _BASIC_SCHEMA_TEMPLATE.format(
+            schema_raw=schema_raw
+        )
@@ -0,0 +1,214 @@
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.models.database import AIQueryModel
+
+def normalize_prompt(prompt: str) -> str:
+    """规范化用户提示：去除首尾空白并合并连续空白；不统一大小写，提示中的字面值区分大小写"""
+    return re.sub(r"\s+", " ", prompt.strip())
+
+def build_cache_key(
+    prompt: str,
+    ai_service: str,
+    ai_model: str,
+    use_enhanced_prompts: bool,
+    schema_fingerprint: str
+) -> str:
+    """根据规范化提示、AI服务、模型、提示模式和架构指纹生成缓存键"""
+    payload = json.dumps(
+        [normalize_prompt(prompt), ai_service, ai_model, use_enhanced_prompts, schema_fingerprint],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class MemoryAIQueryCacheBackend:
+    """进程内LRU缓存后端"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # 缓存键 -> (写入时间, 架构指纹, 结果)
+        self._entries: "OrderedDict[str, Tuple[float, str, AIQueryModel]]" = OrderedDict()
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[AIQueryModel]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        created_at, _, value = entry
+        if self.ttl and time.time() - created_at > self.ttl:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, fingerprint: str, value: AIQueryModel) -> None:
+        self._entries[key] = (time.time(), fingerprint, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+    async def size(self) -> int:
+        return len(self._entries)
+
+class SQLiteAIQueryCacheBackend:
+    """基于SQLite文件的持久化缓存后端，进程重启后缓存仍然有效"""
+
+    def __init__(self, path: str, max_entries: int, ttl: float):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._lock = asyncio.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ai_query_cache (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                query TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_ai_query_cache_fingerprint ON ai_query_cache (fingerprint)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_ai_query_cache_last_access ON ai_query_cache (last_access)")
+        self._conn.commit()
+
+    async def _run(self, func, *args):
+        # SQLite调用在线程池中执行，避免阻塞事件循环；连接不支持并发使用，因此串行化
+        async with self._lock:
+            return await asyncio.to_thread(func, *args)
+
+    def _get(self, key: str) -> Optional[AIQueryModel]:
+        row = self._conn.execute(
+            "SELECT summary, query, created_at FROM ai_query_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        summary, query, created_at = row
+        now = time.time()
+        if self.ttl and now - created_at > self.ttl:
+            self._conn.execute("DELETE FROM ai_query_cache WHERE key = ?", (key,))
+            self._conn.commit()
+            return None
+
+        self._conn.execute("UPDATE ai_query_cache SET last_access = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        return AIQueryModel(summary=summary, query=query)
+
+    def _set(self, key: str, fingerprint: str, value: AIQueryModel) -> None:
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO ai_query_cache (key, fingerprint, summary, query, created_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, fingerprint, value.summary, value.query, now, now)
+        )
+        count = self._conn.execute("SELECT COUNT(*) FROM ai_query_cache").fetchone()[0]
+        if count > self.max_entries:
+            overflow = count - self.max_entries
+            self._conn.execute(
+                "DELETE FROM ai_query_cache WHERE key IN "
+                "(SELECT key FROM ai_query_cache ORDER BY last_access LIMIT ?)",
+                (overflow,)
+            )
+            self.evictions += overflow
+        self._conn.commit()
+
+    def _clear(self) -> None:
+        self._conn.execute("DELETE FROM ai_query_cache")
+        self._conn.commit()
+
+    def _size(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM ai_query_cache").fetchone()[0]
+
+    async def get(self, key: str) -> Optional[AIQueryModel]:
+        return await self._run(self._get, key)
+
+    async def set(self, key: str, fingerprint: str, value: AIQueryModel) -> None:
+        await self._run(self._set, key, fingerprint, value)
+
+    async def clear(self) -> None:
+        await self._run(self._clear)
+
+    async def size(self) -> int:
+        return await self._run(self._size)
+
+    def close(self) -> None:
+        self._conn.close()
+
+class AIQueryCache:
+    """
+    自然语言到SQL的结果缓存
+
+    缓存键由规范化的用户提示、AI服务、模型、提示模式和架构指纹组成，架构相同的连接共享缓存项。
+    架构变化后新的请求使用新的键，旧指纹下的缓存项不会再被命中，由TTL和LRU淘汰；
+    不按指纹主动删除，以免清除其他架构未变化的连接的缓存项。
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[AIQueryModel]:
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, fingerprint: str, value: AIQueryModel) -> None:
+        await self.backend.set(key, fingerprint, value)
+
+    async def clear(self) -> None:
+        await self.backend.clear()
+
+    async def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": await self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.backend.evictions,
+        }
+
+    def close(self) -> None:
+        close = getattr(self.backend, "close", None)
+        if close is not None:
+            close()
+
+def create_ai_query_cache(backend: str, max_entries: int, ttl: float, path: str) -> Optional[AIQueryCache]:
+    """
+    根据配置创建缓存
+
+    参数:
+        backend: 缓存后端 ("memory", "sqlite", "none")
+        max_entries: 最大缓存项数量
+        ttl: 缓存有效期（秒），0表示不过期
+        path: SQLite后端的数据库文件路径
+    """
+    if backend == "memory":
+        return AIQueryCache(MemoryAIQueryCacheBackend(max_entries=max_entries, ttl=ttl))
+    if backend == "sqlite":
+        return AIQueryCache(SQLiteAIQueryCacheBackend(path=path, max_entries=max_entries, ttl=ttl))
+    if backend == "none":
+        return None
+    raise ValueError(f"不支持的AI查询缓存后端: {backend}")
@@ -0,0 +1,247 @@
+import asyncio
+import math
+import random
+import re
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Mapping, Optional
+
+from app.config import settings
+from app.services.ai.ai_messages import ChatMessage, estimate_tokens
+
+# 每条消息在提示中额外占用的token（角色和分隔符）
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+# x-ratelimit-reset-* 的时长格式，例如 "6m0s"、"1s"、"20ms"
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_SECONDS = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+
+class AIRateLimitExceeded(Exception):
+    """AI服务的配额已用完，在等待上限内无法发送请求"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def estimate_prompt_tokens(messages: List[ChatMessage]) -> int:
+    """估算消息列表作为提示的token数"""
+    return sum(estimate_tokens(message.content) + _MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """解析 x-ratelimit-reset-* 响应头的时长（秒），无法解析时返回None"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_SECONDS[unit] for number, unit in parts)
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    从429响应头中读取服务端要求的等待时间（秒）
+
+    依次使用 retry-after-ms、retry-after（秒数或HTTP日期），以及 x-ratelimit-reset-requests/tokens 中较长的一个
+    """
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+
+    resets = [
+        seconds for seconds in (
+            parse_reset_duration(headers.get("x-ratelimit-reset-requests")),
+            parse_reset_duration(headers.get("x-ratelimit-reset-tokens")),
+        )
+        if seconds is not None
+    ]
+    return max(resets) if resets else None
+
+def _header_number(headers: Mapping[str, str], name: str) -> Optional[float]:
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """按分钟配额连续补充的令牌桶，per_minute为0时不限制"""
+
+    def __init__(self, per_minute: float = 0):
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if self.capacity:
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.capacity / 60)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """获得amount个令牌需要等待的时间（秒），超过容量的请求按容量计算"""
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) * 60 / self.capacity
+
+    def consume(self, amount: float, now: float) -> None:
+        """扣除令牌，amount为负数时退还；余额可以为负，表示之后需要更长的补充时间"""
+        if not self.capacity:
+            return
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+    def set_capacity(self, per_minute: float, now: float) -> None:
+        """按服务端返回的配额调整容量"""
+        if per_minute == self.capacity:
+            return
+        self._refill(now)
+        if not self.capacity:
+            self.tokens = per_minute
+        self.capacity = per_minute
+        self.tokens = min(self.tokens, per_minute)
+
+    def limit_remaining(self, remaining: float, now: float) -> None:
+        """服务端报告的剩余额度更少时（例如配额被其他进程共享）以服务端为准"""
+        if not self.capacity:
+            return
+        self._refill(now)
+        self.tokens = min(self.tokens, remaining)
+
+class ProviderRateLimiter:
+    """
+    单个限流目标（OpenAI的一个模型或Azure OpenAI的一个部署）的请求数和token数预算
+
+    请求前按估算的token数从两个令牌桶中扣除，等待的请求按到达顺序依次放行。
+    本地预算为0时从 x-ratelimit-limit-* 响应头学习服务端配额，并用 x-ratelimit-remaining-*
+    校正余额；收到429时在服务端要求的时间内暂停所有请求，使吞吐量稳定在配额上限附近
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0, max_wait: float = 60):
+        self.configured_rpm = requests_per_minute
+        self.configured_tpm = tokens_per_minute
+        self.max_wait = max_wait
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._blocked_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self.throttled = 0
+        self.retries = 0
+
+    async def acquire(self, tokens: int, deadline: Optional[float] = None) -> None:
+        """
+        等待请求数和token数预算
+
+        预计等待超过 max_wait 秒时抛出AIRateLimitExceeded；
+        deadline为调用方的截止时间（time.monotonic()），等待会超过截止时间时抛出asyncio.TimeoutError
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                wait = max(
+                    self._blocked_until - now,
+                    self.requests.wait_time(1, now),
+                    self.tokens.wait_time(tokens, now)
+                )
+                if wait <= 0:
+                    self.requests.consume(1, now)
+                    self.tokens.consume(tokens, now)
+                    return
+                if wait > self.max_wait:
+                    raise AIRateLimitExceeded("AI服务请求频率超过配额，请稍后重试", math.ceil(wait))
+                if deadline is not None and now + wait >= deadline:
+                    raise asyncio.TimeoutError()
+                self.throttled += 1
+                await asyncio.sleep(wait)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """用实际消耗的token数校正请求前的估算"""
+        self.tokens.consume(actual_tokens - estimated_tokens, time.monotonic())
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """根据 x-ratelimit-* 响应头同步服务端的配额和剩余额度"""
+        now = time.monotonic()
+        for bucket, configured, kind in (
+            (self.requests, self.configured_rpm, "requests"),
+            (self.tokens, self.configured_tpm, "tokens"),
+        ):
+            limit = _header_number(headers, f"x-ratelimit-limit-{kind}")
+            if not configured and limit:
+                bucket.set_capacity(limit, now)
+            remaining = _header_number(headers, f"x-ratelimit-remaining-{kind}")
+            if remaining is not None:
+                bucket.limit_remaining(remaining, now)
+
+    def backoff(self, seconds: float) -> None:
+        """服务端返回429后，在seconds秒内暂停该端点的所有请求"""
+        self.retries += 1
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def stats(self) -> Dict[str, object]:
+        now = time.monotonic()
+        self.requests._refill(now)
+        self.tokens._refill(now)
+        return {
+            "requests_per_minute": self.requests.capacity,
+            "tokens_per_minute": self.tokens.capacity,
+            "available_requests": round(self.requests.tokens, 1),
+            "available_tokens": round(self.tokens.tokens, 1),
+            "blocked_seconds": round(max(0.0, self._blocked_until - now), 1),
+            "throttled": self.throttled,
+            "retries": self.retries,
+        }
+
+def retry_delay(headers: Mapping[str, str], attempt: int) -> float:
+    """
+    429后的重试等待时间（秒）
+
+    优先使用服务端要求的时间并加上最多 AI_RATE_LIMIT_JITTER 比例的随机抖动，避免所有请求同时重试；
+    没有相关响应头时使用带完全抖动的指数退避
+    """
+    seconds = retry_after_seconds(headers)
+    if seconds is not None:
+        return seconds * (1 + random.uniform(0, settings.AI_RATE_LIMIT_JITTER))
+    return random.uniform(0, settings.AI_RATE_LIMIT_BACKOFF_BASE * 2 ** attempt)
+
+class RateLimiterRegistry:
+    """按限流目标（OpenAI按模型，Azure OpenAI按部署）保存限流器"""
+
+    def __init__(self):
+        self._limiters: Dict[str, ProviderRateLimiter] = {}
+
+    def get(self, target: str) -> ProviderRateLimiter:
+        limiter = self._limiters.get(target)
+        if limiter is None:
+            limiter = ProviderRateLimiter(
+                requests_per_minute=settings.AI_RATE_LIMIT_RPM,
+                tokens_per_minute=settings.AI_RATE_LIMIT_TPM,
+                max_wait=settings.AI_RATE_LIMIT_MAX_WAIT
+            )
+            self._limiters[target] = limiter
+        return limiter
+
+    def stats(self) -> Dict[str, object]:
+        return {key: limiter.stats() for key, limiter in self._limiters.items()}
+
+# 进程级限流器
+ai_rate_limiters = RateLimiterRegistry()
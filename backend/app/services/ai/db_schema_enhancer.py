@@ -1,19 +1,39 @@
-from typing import List, Dict, Any
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 from app.models.database import DatabaseSchemaModel, TableSchemaModel
 
+# 表关系类型
+RELATION_FOREIGN_KEY = "foreign_key"  # 数据库中声明的外键
+RELATION_TABLE_ID = "table_id"  # 列名为 表名_id
+RELATION_PRIMARY_KEY = "primary_key"  # 列名与其他表的主键同名
+RELATION_NAME = "name"  # 列名包含其他表名
+
+# 按架构指纹缓存的关系检测结果数量
+_EDGE_CACHE_SIZE = 16
+
 class DatabaseSchemaEnhancer:
     """
     增强数据库模式信息，以帮助AI更好地理解数据库结构
     """
     
+    # 架构指纹 -> 表关系列表
+    _edge_cache: "OrderedDict[str, List[Tuple[str, str, str, str, Optional[str]]]]" = OrderedDict()
+    
     @staticmethod
-    def enhance_schema(db_schema: DatabaseSchemaModel, database_type: str) -> str:
+    def enhance_schema(
+        db_schema: DatabaseSchemaModel,
+        database_type: str,
+        include_table_details: bool = True,
+        include_relationships: bool = True
+    ) -> str:
         """
         分析数据库模式并生成增强的描述信息
         
         参数:
             db_schema: 包含表和列信息的数据库模式
             database_type: 数据库类型 (MySQL, PostgreSQL, SQL Server)
+            include_table_details: 是否包含逐表的列描述
+            include_relationships: 是否包含检测到的表关系
             
         返回:
             str: 增强的数据库描述
@@ -26,35 +46,22 @@ class DatabaseSchemaEnhancer:
         enhanced_info.append(db_overview)
         
         # 2. 表和列的详细描述
-        enhanced_info.append("\n## 详细的表结构:")
+        if include_table_details:
+            enhanced_info.extend(DatabaseSchemaEnhancer._describe_tables(db_schema))
         
-        for table in db_schema.tables:
-            table_desc = f"\n### 表: {table.name}"
-            enhanced_info.append(table_desc)
-            
-            # 列出主键
-            primary_keys = [col for col in table.columns if col.get("key") == "PRI"]
-            if primary_keys:
-                pk_names = [pk["name"] for pk in primary_keys]
-                enhanced_info.append(f"主键: {', '.join(pk_names)}")
+        # 3. 表关系：优先使用声明的外键，否则根据命名推测
+        if include_relationships:
+            if DatabaseSchemaEnhancer.has_declared_foreign_keys(db_schema):
+                enhanced_info.append("\n## 表关系（外键）:")
+            else:
+                enhanced_info.append("\n## 可能的表关系:")
+            relationships = DatabaseSchemaEnhancer._detect_relationships(db_schema)
             
-            # 列出所有列及其属性
-            enhanced_info.append("列:")
-            for column in table.columns:
-                nullable = "可为空" if column.get("nullable", True) else "非空"
-                key_info = "主键" if column.get("key") == "PRI" else ""
-                col_desc = f"- {column['name']}: {column['type']}, {nullable} {key_info}"
-                enhanced_info.append(col_desc)
-        
-        # 3. 检测潜在表关系
-        enhanced_info.append("\n## 可能的表关系:")
-        relationships = DatabaseSchemaEnhancer._detect_relationships(db_schema.tables)
-        
-        if relationships:
-            for rel in relationships:
-                enhanced_info.append(f"- {rel}")
-        else:
-            enhanced_info.append("- 未检测到明显的表关系")
+            if relationships:
+                for rel in relationships:
+                    enhanced_info.append(f"- {rel}")
+            else:
+                enhanced_info.append("- 未检测到明显的表关系")
         
         # 4. 根据数据库类型添加特定建议
         enhanced_info.append(f"\n## {database_type}特定建议:")
@@ -84,36 +91,176 @@ class DatabaseSchemaEnhancer:
         return "\n".join(enhanced_info)
     
     @staticmethod
-    def _detect_relationships(tables: List[TableSchemaModel]) -> List[str]:
+    def _describe_tables(db_schema: DatabaseSchemaModel) -> List[str]:
+        """生成逐表的列描述"""
+        enhanced_info = ["\n## 详细的表结构:"]
+        
+        for table in db_schema.tables:
+            table_desc = f"\n### 表: {table.name}"
+            enhanced_info.append(table_desc)
+            
+            # 列出主键
+            primary_keys = [col for col in table.columns if col.get("key") == "PRI"]
+            if primary_keys:
+                pk_names = [pk["name"] for pk in primary_keys]
+                enhanced_info.append(f"主键: {', '.join(pk_names)}")
+            
+            # 列出所有列及其属性
+            enhanced_info.append("列:")
+            for column in table.columns:
+                nullable = "可为空" if column.get("nullable", True) else "非空"
+                key_info = "主键" if column.get("key") == "PRI" else ""
+                col_desc = f"- {column['name']}: {column['type']}, {nullable} {key_info}"
+                enhanced_info.append(col_desc)
+        
+        return enhanced_info
+    
+    @staticmethod
+    def _detect_relationships(db_schema: DatabaseSchemaModel) -> List[str]:
         """
         检测表之间可能存在的关系
         
         参数:
-            tables: 表模型列表
+            db_schema: 数据库模式
             
         返回:
             List[str]: 检测到的表关系描述列表
         """
-        relationships = []
+        relationships = [
+            DatabaseSchemaEnhancer._format_relationship(edge)
+            for edge in DatabaseSchemaEnhancer.relationship_edges(db_schema)
+        ]
+        
+        return list(dict.fromkeys(relationships))  # 去重
+    
+    @staticmethod
+    def detect_relationship_edges(tables: List[TableSchemaModel]) -> List[Tuple[str, str, str, str, Optional[str]]]:
+        """
+        以结构化形式检测表之间可能存在的关系
+        
+        参数:
+            tables: 表模型列表
+            
+        返回:
+            List[Tuple]: (关系类型, 源表, 源列, 目标表, 目标列) 列表，关系类型为
+                RELATION_TABLE_ID（列名为 表名_id）、RELATION_PRIMARY_KEY（列名与其他表主键相同）
+                或 RELATION_NAME（列名包含其他表名）
+        """
+        # 小写表名 -> 表名列表
+        tables_by_name: Dict[str, List[str]] = {}
+        # 小写主键列名 -> (表名, 主键列名) 列表
+        primary_keys: Dict[str, List[Tuple[str, str]]] = {}
+        for table in tables:
+            tables_by_name.setdefault(table.name.lower(), []).append(table.name)
+            for column in table.columns:
+                if column.get("key") == "PRI":
+                    primary_keys.setdefault(column["name"].lower(), []).append((table.name, column["name"]))
+        
+        # 小写表名的字符前缀树，用于查找列名中包含的表名
+        trie: Dict[Optional[str], Any] = {}
+        for name in tables_by_name:
+            node = trie
+            for char in name:
+                node = node.setdefault(char, {})
+            node[None] = name
         
+        edges = []
         for table1 in tables:
-            for table2 in tables:
-                if table1.name != table2.name:
-                    # 检查外键关系（基于命名约定）
-                    for col1 in table1.columns:
-                        col1_name = col1["name"].lower()
-                        
-                        # 检查是否有表名_id模式的列
-                        if col1_name == f"{table2.name.lower()}_id":
-                            relationships.append(f"{table1.name}.{col1['name']} 可能引用 {table2.name} 表的主键")
-                        
-                        # 检查列名与其他表主键匹配的情况
-                        for col2 in table2.columns:
-                            if col2.get("key") == "PRI" and col1_name == col2["name"].lower():
-                                relationships.append(f"{table1.name}.{col1['name']} 可能引用 {table2.name}.{col2['name']}")
-                                
-                        # 检查是否包含表名（如customer_name可能关联到customers表）
-                        if table2.name.lower() in col1_name and not col1_name.endswith('_id'):
-                            relationships.append(f"{table1.name}.{col1['name']} 可能与 {table2.name} 表有关联")
-        
-        return list(set(relationships))  # 去重
\ No newline at end of file
+            for col1 in table1.columns:
+                col1_name = col1["name"].lower()
+                
+                if col1_name.endswith("_id"):
+                    # 检查是否有表名_id模式的列
+                    for table2 in tables_by_name.get(col1_name[:-3], ()):
+                        if table2 != table1.name:
+                            edges.append((RELATION_TABLE_ID, table1.name, col1["name"], table2, None))
+                
+                # 检查列名与其他表主键匹配的情况
+                for table2, col2 in primary_keys.get(col1_name, ()):
+                    if table2 != table1.name:
+                        edges.append((RELATION_PRIMARY_KEY, table1.name, col1["name"], table2, col2))
+                
+                # 检查是否包含表名（如customer_name可能关联到customers表）
+                if not col1_name.endswith("_id"):
+                    for name in DatabaseSchemaEnhancer._find_table_names(trie, col1_name):
+                        for table2 in tables_by_name[name]:
+                            if table2 != table1.name:
+                                edges.append((RELATION_NAME, table1.name, col1["name"], table2, None))
+        
+        # 同名的表可能产生重复的关系，去重并保持顺序
+        return list(dict.fromkeys(edges))
+    
+    @staticmethod
+    def has_declared_foreign_keys(db_schema: DatabaseSchemaModel) -> bool:
+        """数据库模式中是否有表声明了外键"""
+        return any(table.foreign_keys for table in db_schema.tables)
+    
+    @staticmethod
+    def foreign_key_edges(tables: List[TableSchemaModel]) -> List[Tuple[str, str, str, str, Optional[str]]]:
+        """将声明的外键转换为 RELATION_FOREIGN_KEY 关系，复合外键的每一列各产生一条"""
+        edges = []
+        for table in tables:
+            for foreign_key in table.foreign_keys:
+                for column, referenced_column in zip(foreign_key.columns, foreign_key.referenced_columns):
+                    edges.append((RELATION_FOREIGN_KEY, table.name, column, foreign_key.referenced_table, referenced_column))
+        return edges
+    
+    @staticmethod
+    def relationship_edges(db_schema: DatabaseSchemaModel) -> List[Tuple[str, str, str, str, Optional[str]]]:
+        """
+        获取数据库模式的表关系，按架构指纹缓存结果
+        
+        数据库声明了外键时只使用外键，不再根据命名推测关系
+        
+        参数:
+            db_schema: 数据库模式
+            
+        返回:
+            List[Tuple]: (关系类型, 源表, 源列, 目标表, 目标列) 列表
+        """
+        key = db_schema.fingerprint
+        if key is None:
+            return DatabaseSchemaEnhancer._compute_relationship_edges(db_schema)
+        
+        cache = DatabaseSchemaEnhancer._edge_cache
+        edges = cache.get(key)
+        if edges is None:
+            edges = DatabaseSchemaEnhancer._compute_relationship_edges(db_schema)
+            cache[key] = edges
+            while len(cache) > _EDGE_CACHE_SIZE:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
+        return edges
+    
+    @staticmethod
+    def _compute_relationship_edges(db_schema: DatabaseSchemaModel) -> List[Tuple[str, str, str, str, Optional[str]]]:
+        if DatabaseSchemaEnhancer.has_declared_foreign_keys(db_schema):
+            return DatabaseSchemaEnhancer.foreign_key_edges(db_schema.tables)
+        return DatabaseSchemaEnhancer.detect_relationship_edges(db_schema.tables)
+    
+    @staticmethod
+    def _find_table_names(trie: Dict[Optional[str], Any], text: str) -> List[str]:
+        """返回text中作为子串出现的所有表名（小写）"""
+        found = []
+        for start in range(len(text)):
+            node = trie
+            for char in text[start:]:
+                node = node.get(char)
+                if node is None:
+                    break
+                if None in node:
+                    found.append(node[None])
+        return list(dict.fromkeys(found))
+    
+    @staticmethod
+    def _format_relationship(edge: Tuple[str, str, str, str, Optional[str]]) -> str:
+        """将结构化的关系转换为描述文本"""
+        kind, table1, col1, table2, col2 = edge
+        if kind == RELATION_FOREIGN_KEY:
+            return f"{table1}.{col1} 引用 {table2}.{col2}"
+        if kind == RELATION_TABLE_ID:
+            return f"{table1}.{col1} 可能引用 {table2} 表的主键"
+        if kind == RELATION_PRIMARY_KEY:
+            return f"{table1}.{col1} 可能引用 {table2}.{col2}"
+        return f"{table1}.{col1} 可能与 {table2} 表有关联"
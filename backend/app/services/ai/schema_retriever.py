@@ -0,0 +1,207 @@
+import hashlib
+import math
+import re
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Set
+
+from app.config import settings
+from app.models.database import DatabaseSchemaModel
+from app.services.ai.ai_messages import estimate_tokens
+from app.services.ai.db_schema_enhancer import (
+    DatabaseSchemaEnhancer,
+    RELATION_FOREIGN_KEY,
+    RELATION_TABLE_ID,
+    RELATION_PRIMARY_KEY
+)
+
+# BM25参数
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+# 表名中的词比列名中的词更能代表表的含义
+_TABLE_NAME_WEIGHT = 3
+
+_CAMEL_BOUNDARY = re.compile(r"([a-z0-9])([A-Z])")
+_WORD = re.compile(r"[a-z0-9]+")
+# 中日韩文字没有词边界，连续的一段按相邻两字切分
+_CJK_RUN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+")
+
+def tokenize(text: str) -> List[str]:
+    """
+    将标识符或自然语言文本拆分为词
+
+    英文部分拆分为小写词，处理下划线、驼峰命名和简单的英文复数；
+    中文等连续文字切分为相邻两字的二元组，单个字单独成词
+    """
+    words = _WORD.findall(_CAMEL_BOUNDARY.sub(r"\1 \2", text).lower())
+    tokens = []
+    for word in words:
+        if len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+class SchemaIndex:
+    """单个数据库架构的BM25索引，以表为文档，表名和列名为词"""
+
+    def __init__(self, db_schema: DatabaseSchemaModel):
+        self.table_names = [table.name for table in db_schema.tables]
+        self._term_freqs: List[Counter] = []
+        self._lengths: List[int] = []
+        document_freq: Counter = Counter()
+
+        for table in db_schema.tables:
+            terms = tokenize(table.name) * _TABLE_NAME_WEIGHT
+            for column in table.columns:
+                terms.extend(tokenize(column["name"]))
+            freqs = Counter(terms)
+            self._term_freqs.append(freqs)
+            self._lengths.append(len(terms))
+            document_freq.update(freqs.keys())
+
+        count = len(self.table_names)
+        self._avg_length = (sum(self._lengths) / count) if count else 0.0
+        self._idf = {
+            term: math.log(1 + (count - df + 0.5) / (df + 0.5))
+            for term, df in document_freq.items()
+        }
+
+        # 关系图：只使用外键和较可靠的命名关系（表名_id、与主键同名），用于扩展相关表
+        primary_keys = {
+            (table.name, column["name"])
+            for table in db_schema.tables
+            for column in table.columns
+            if column.get("key") == "PRI"
+        }
+        self.neighbors: Dict[str, Set[str]] = {name: set() for name in self.table_names}
+        for kind, table1, col1, table2, _ in DatabaseSchemaEnhancer.relationship_edges(db_schema):
+            if kind not in (RELATION_FOREIGN_KEY, RELATION_TABLE_ID, RELATION_PRIMARY_KEY):
+                continue
+            # 两个表的同名主键（如都叫id）不代表关系
+            if kind == RELATION_PRIMARY_KEY and (table1, col1) in primary_keys:
+                continue
+            # 外键可能引用不在当前架构中的表（如其他schema）
+            if table2 not in self.neighbors or table1 == table2:
+                continue
+            self.neighbors[table1].add(table2)
+            self.neighbors[table2].add(table1)
+
+    def score(self, query: str) -> Dict[str, float]:
+        """计算每个表与查询的BM25相关度，只返回得分大于0的表"""
+        query_terms = set(tokenize(query))
+        scores: Dict[str, float] = {}
+
+        for index, freqs in enumerate(self._term_freqs):
+            length_norm = 1 - _BM25_B + _BM25_B * self._lengths[index] / (self._avg_length or 1)
+            total = 0.0
+            for term in query_terms:
+                tf = freqs.get(term)
+                if tf:
+                    total += self._idf[term] * tf * (_BM25_K1 + 1) / (tf + _BM25_K1 * length_norm)
+            if total > 0:
+                scores[self.table_names[index]] = total
+
+        return scores
+
+class SchemaRetriever:
+    """
+    基于相关度的架构裁剪
+
+    针对用户提示对表进行排序，沿检测到的表关系扩展，并在token预算内只保留前top_k个表。
+    索引按架构指纹构建并缓存在内存中。
+    """
+
+    def __init__(self, max_indexes: int = 16):
+        self.max_indexes = max_indexes
+        self._indexes: "OrderedDict[str, SchemaIndex]" = OrderedDict()
+
+    def get_index(self, db_schema: DatabaseSchemaModel) -> SchemaIndex:
+        """获取架构的索引，按指纹缓存"""
+        key = db_schema.fingerprint
+        if key is None:
+            return SchemaIndex(db_schema)
+
+        index = self._indexes.get(key)
+        if index is None:
+            index = SchemaIndex(db_schema)
+            self._indexes[key] = index
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+        else:
+            self._indexes.move_to_end(key)
+        return index
+
+    def prune(
+        self,
+        db_schema: DatabaseSchemaModel,
+        user_prompt: str,
+        top_k: Optional[int] = None,
+        token_budget: Optional[int] = None
+    ) -> DatabaseSchemaModel:
+        """
+        返回只包含与用户提示相关的表的架构
+
+        表数量未超过阈值，或提示与任何表都不匹配时，返回原架构
+        """
+        if not settings.SCHEMA_PRUNING_ENABLED or len(db_schema.tables) <= settings.SCHEMA_PRUNING_MIN_TABLES:
+            return db_schema
+
+        if not tokenize(user_prompt):
+            print("用户提示中没有可用于匹配表名和列名的词，不裁剪架构")
+            return db_schema
+
+        top_k = top_k or settings.SCHEMA_PRUNING_TOP_K
+        token_budget = token_budget or settings.SCHEMA_PRUNING_TOKEN_BUDGET
+
+        index = self.get_index(db_schema)
+        scores = index.score(user_prompt)
+        if not scores:
+            return db_schema
+
+        # 按相关度排序，再把直接相关的表紧跟在各自的命中表后面
+        ranked = sorted(scores, key=lambda name: scores[name], reverse=True)
+        candidates: List[str] = []
+        seen: Set[str] = set()
+        for name in ranked:
+            for candidate in [name] + sorted(index.neighbors.get(name, ())):
+                if candidate not in seen:
+                    seen.add(candidate)
+                    candidates.append(candidate)
+
+        raw_by_name = {
+            table.name: raw for table, raw in zip(db_schema.tables, db_schema.schema_raw)
+        }
+        selected: Set[str] = set()
+        used_tokens = 0
+        for name in candidates:
+            if len(selected) >= top_k:
+                break
+            cost = estimate_tokens(raw_by_name.get(name, ""))
+            # 至少保留一个表，即使它超出预算
+            if selected and used_tokens + cost > token_budget:
+                continue
+            selected.add(name)
+            used_tokens += cost
+
+        pairs = [
+            (table, raw) for table, raw in zip(db_schema.tables, db_schema.schema_raw)
+            if table.name in selected
+        ]
+        pruned = DatabaseSchemaModel(
+            name=db_schema.name,
+            tables=[table for table, _ in pairs],
+            schema_raw=[raw for _, raw in pairs]
+        )
+        if db_schema.fingerprint:
+            subset = ",".join(sorted(selected))
+            pruned.fingerprint = hashlib.sha256(f"{db_schema.fingerprint}:{subset}".encode("utf-8")).hexdigest()
+        return pruned
+
+# 进程级检索器，按架构指纹缓存索引
+schema_retriever = SchemaRetriever()
@@ -0,0 +1,96 @@
+from typing import Dict, List, Tuple
+
+from app.models.database import DatabaseSchemaModel
+from app.services.ai.db_schema_enhancer import (
+    DatabaseSchemaEnhancer,
+    RELATION_FOREIGN_KEY,
+    RELATION_TABLE_ID,
+    RELATION_PRIMARY_KEY
+)
+
+# 紧凑格式的说明，放在表定义之前
+COMPACT_SCHEMA_LEGEND = "格式: 表名(列名 类型 [PK] [NULL] [->引用表.列] [~可能相关的表])，未标NULL的列非空"
+
+class SchemaSerializer:
+    """
+    将数据库架构序列化为紧凑的单一表示
+
+    每个表一行，同时包含类型、可空性、主键和表关系（优先使用声明的外键），避免在提示中重复列出相同的列。
+    """
+
+    @staticmethod
+    def serialize_compact(db_schema: DatabaseSchemaModel) -> str:
+        """
+        生成紧凑的架构描述
+
+        参数:
+            db_schema: 数据库模式
+
+        返回:
+            str: 每个表一行的架构描述
+        """
+        references, related = SchemaSerializer._collect_relationships(db_schema)
+
+        lines = [COMPACT_SCHEMA_LEGEND]
+        for table in db_schema.tables:
+            columns = []
+            for column in table.columns:
+                parts = [column["name"], column["type"]]
+                if column.get("key") == "PRI":
+                    parts.append("PK")
+                if SchemaSerializer._is_nullable(column):
+                    parts.append("NULL")
+                reference = references.get((table.name, column["name"]))
+                if reference:
+                    parts.append(f"->{reference}")
+                hints = related.get((table.name, column["name"]))
+                if hints:
+                    parts.append(" ".join(f"~{name}" for name in hints))
+                columns.append(" ".join(parts))
+            lines.append(f"{table.name}({', '.join(columns)})")
+
+        return "\n".join(lines)
+
+    @staticmethod
+    def _is_nullable(column: Dict) -> bool:
+        # 列信息经过模型校验后布尔值可能被转换为字符串
+        value = column.get("nullable", True)
+        if isinstance(value, str):
+            return value.lower() in ("true", "yes", "1")
+        return bool(value)
+
+    @staticmethod
+    def _collect_relationships(db_schema: DatabaseSchemaModel) -> Tuple[Dict[Tuple[str, str], str], Dict[Tuple[str, str], List[str]]]:
+        """
+        按列汇总表关系
+
+        返回:
+            (引用关系, 可能相关的表)：引用关系为 (表, 列) -> "表.列" 或 "表"，
+            可能相关的表为 (表, 列) -> 表名列表
+        """
+        primary_keys = {
+            (table.name, column["name"])
+            for table in db_schema.tables
+            for column in table.columns
+            if column.get("key") == "PRI"
+        }
+
+        references: Dict[Tuple[str, str], str] = {}
+        related: Dict[Tuple[str, str], List[str]] = {}
+        for kind, table1, col1, table2, col2 in DatabaseSchemaEnhancer.relationship_edges(db_schema):
+            key = (table1, col1)
+            if kind == RELATION_FOREIGN_KEY:
+                references[key] = f"{table2}.{col2}"
+            elif kind == RELATION_PRIMARY_KEY:
+                # 两个表的同名主键（如都叫id）不代表引用
+                if key not in primary_keys:
+                    references[key] = f"{table2}.{col2}"
+            elif kind == RELATION_TABLE_ID:
+                references.setdefault(key, table2)
+            else:
+                related.setdefault(key, []).append(table2)
+
+        for names in related.values():
+            names.sort()
+
+        return references, related
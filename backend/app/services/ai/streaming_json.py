@@ -0,0 +1,82 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+class IncrementalJSONFieldParser:
+    """
+    增量JSON字段解析器
+
+    逐段接收AI流式输出的文本，当顶层对象中某个字符串字段的值完整闭合时立即返回该字段，
+    而不必等待整个JSON结束。用于在 {"summary": ..., "query": ...} 的 query 字段
+    生成完毕时就开始执行查询。第一个 { 之前的内容（如 ```json 标记）会被忽略。
+    """
+
+    def __init__(self):
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_chars: List[str] = []
+        self._string_is_key = False
+        self._string_is_value = False
+        self._expect_key = False
+        self._current_key: Optional[str] = None
+        self.fields = {}
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        输入一段文本，返回本段中完成的顶层字符串字段 (字段名, 值) 列表
+
+        参数:
+            chunk: AI输出的一段文本
+        """
+        completed: List[Tuple[str, Any]] = []
+
+        for char in chunk:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    self._string_chars.append(char)
+                elif char == "\\":
+                    self._escape = True
+                    self._string_chars.append(char)
+                elif char == '"':
+                    self._in_string = False
+                    self._close_string(completed)
+                else:
+                    self._string_chars.append(char)
+                continue
+
+            if char == '"':
+                if self._depth == 0:
+                    continue
+                self._in_string = True
+                self._string_chars = []
+                self._string_is_key = self._depth == 1 and self._expect_key
+                self._string_is_value = self._depth == 1 and not self._expect_key
+            elif char in "{[":
+                if char == "{" and self._depth == 0:
+                    self._expect_key = True
+                self._depth += 1
+            elif char in "}]":
+                if self._depth > 0:
+                    self._depth -= 1
+            elif self._depth == 1:
+                if char == ":":
+                    self._expect_key = False
+                elif char == ",":
+                    self._expect_key = True
+
+        return completed
+
+    def _close_string(self, completed: List[Tuple[str, Any]]) -> None:
+        raw = "".join(self._string_chars)
+        try:
+            value = json.loads(f'"{raw}"')
+        except json.JSONDecodeError:
+            value = raw
+
+        if self._string_is_key:
+            self._current_key = value
+        elif self._string_is_value and self._current_key is not None:
+            self.fields[self._current_key] = value
+            completed.append((self._current_key, value))
+            self._current_key = None
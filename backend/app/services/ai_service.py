@@ -1,5 +1,5 @@
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 from fastapi import HTTPException
 
 from app.models.database import DatabaseSchemaModel, AIQueryModel
@@ -9,6 +9,14 @@ from app.services.ai import (
     BaseAIClient,
     AIPromptBuilder
 )
+from app.services.ai.schema_retriever import schema_retriever
+from app.services.ai.ai_query_cache import AIQueryCache, build_cache_key
+from app.services.db_services.schema_cache import compute_schema_fingerprint
+from app.services.admission import admission, TARGET_AI
+from app.services.single_flight import SingleFlight
+
+# 进程内正在进行的SQL生成请求，相同的并发请求共享一次AI调用
+_sql_query_flights = SingleFlight()
 
 class AIService:
     """
@@ -16,9 +24,10 @@ class AIService:
     提供SQL生成和通用聊天功能
     """
     
-    def __init__(self):
+    def __init__(self, query_cache: Optional[AIQueryCache] = None):
         self.client: Optional[BaseAIClient] = None
         self.use_enhanced_prompts: bool = True  # 是否使用增强的提示词
+        self.query_cache = query_cache  # 自然语言到SQL的结果缓存
     
     async def get_ai_sql_query(
         self,
@@ -26,7 +35,8 @@ class AIService:
         ai_service: str, 
         user_prompt: str, 
         db_schema: DatabaseSchemaModel,
-        database_type: str
+        database_type: str,
+        timeout: Optional[float] = None
     ) -> AIQueryModel:
         """
         使用AI生成SQL查询
@@ -37,21 +47,129 @@ class AIService:
             user_prompt: 用户的自然语言提示
             db_schema: 数据库模式
             database_type: 数据库类型
+            timeout: AI请求的截止时间（秒），为空时使用 AI_HTTP_TIMEOUT
             
         返回:
             AIQueryModel: 包含生成的SQL查询和解释
         """
+        key, fingerprint = self._query_key(ai_model, ai_service, user_prompt, db_schema)
+        
+        # 优先使用缓存的结果
+        if self.query_cache is not None:
+            cached = await self.query_cache.get(key)
+            if cached is not None:
+                return cached
+        
+        # 相同的并发请求共享同一次AI调用
+        return await _sql_query_flights.do(
+            key,
+            lambda: self._generate_sql_query(
+                ai_model, ai_service, user_prompt, db_schema, database_type, key, fingerprint, timeout
+            )
+        )
+    
+    async def _generate_sql_query(
+        self,
+        ai_model: str, 
+        ai_service: str, 
+        user_prompt: str, 
+        db_schema: DatabaseSchemaModel,
+        database_type: str,
+        key: str,
+        fingerprint: str,
+        timeout: Optional[float] = None
+    ) -> AIQueryModel:
+        """调用AI服务生成SQL查询并写入缓存"""
         # 确保有可用的客户端
         if not self.client:
             self.client = create_ai_client(ai_service, ai_model)
         
-        # 选择提示构建方法
-        if self.use_enhanced_prompts:
-            system_prompt = AIPromptBuilder.build_sql_generation_prompt(db_schema, database_type)
-        else:
-            system_prompt = AIPromptBuilder.build_basic_sql_prompt(db_schema, database_type)
+        chat_messages = self._build_sql_messages(ai_service, user_prompt, db_schema, database_type)
+        
+        # 发送到AI服务，同一服务端点上的并发调用受准入控制限制
+        async with admission.slot(TARGET_AI, self._admission_target()):
+            response_content = await self.client.complete_chat(chat_messages, timeout=timeout)
+        
+        result = self.parse_sql_response(response_content)
+        if self.query_cache is not None:
+            await self.query_cache.set(key, fingerprint, result)
+        
+        return result
+    
+    async def stream_ai_sql_query(
+        self,
+        ai_model: str, 
+        ai_service: str, 
+        user_prompt: str, 
+        db_schema: DatabaseSchemaModel,
+        database_type: str
+    ) -> AsyncIterator[str]:
+        """
+        使用AI生成SQL查询，并在生成过程中逐段返回原始响应文本
+        
+        调用方在流结束后可将拼接的完整文本交给parse_sql_response解析。
+        命中缓存时以单个片段返回缓存结果的JSON文本
+        """
+        key, fingerprint = self._query_key(ai_model, ai_service, user_prompt, db_schema)
+        if self.query_cache is not None:
+            cached = await self.query_cache.get(key)
+            if cached is not None:
+                yield json.dumps(cached.dict(), ensure_ascii=False)
+                return
+        
+        if not self.client:
+            self.client = create_ai_client(ai_service, ai_model)
+        
+        chat_messages = self._build_sql_messages(ai_service, user_prompt, db_schema, database_type)
+        
+        chunks = []
+        async with admission.slot(TARGET_AI, self._admission_target()):
+            async for token in self.client.stream_chat(chat_messages):
+                chunks.append(token)
+                yield token
         
-        # 准备消息
+        # 完整响应可以解析时写入缓存
+        if self.query_cache is not None:
+            try:
+                result = self.parse_sql_response("".join(chunks))
+            except HTTPException:
+                return
+            await self.query_cache.set(key, fingerprint, result)
+    
+    def _query_key(
+        self,
+        ai_model: str,
+        ai_service: str,
+        user_prompt: str,
+        db_schema: DatabaseSchemaModel
+    ) -> Tuple[str, str]:
+        """
+        计算请求键，用于结果缓存和并发请求合并
+        
+        返回:
+            (请求键, 架构指纹)
+        """
+        fingerprint = db_schema.fingerprint or compute_schema_fingerprint(db_schema)
+        key = build_cache_key(user_prompt, ai_service, ai_model, self.use_enhanced_prompts, fingerprint)
+        return key, fingerprint
+    
+    def _build_sql_messages(
+        self,
+        ai_service: str,
+        user_prompt: str,
+        db_schema: DatabaseSchemaModel,
+        database_type: str
+    ) -> List[ChatMessage]:
+        """构建SQL生成请求的消息列表"""
+        # 大型数据库只保留与用户提示相关的表
+        db_schema = schema_retriever.prune(db_schema, user_prompt)
+        
+        # 系统提示按架构指纹缓存，只有用户消息随请求变化
+        system_prompt = AIPromptBuilder.get_sql_system_prompt(
+            db_schema, database_type, enhanced=self.use_enhanced_prompts
+        )
+        
+        # 准备消息：系统提示在前、用户提示在后，使相同架构的请求共享提示前缀
         chat_messages = []
         
         # Ollama对系统提示支持有限，因此在使用Ollama时将系统提示作为用户提示
@@ -62,9 +180,11 @@ class AIService:
             
         chat_messages.append(ChatMessage(role="user", content=user_prompt))
         
-        # 发送到AI服务
-        response_content = await self.client.complete_chat(chat_messages)
-        
+        return chat_messages
+    
+    @staticmethod
+    def parse_sql_response(response_content: str) -> AIQueryModel:
+        """将AI返回的JSON文本解析为AIQueryModel"""
         # 清理并解析响应
         cleaned_response = response_content.replace("```json", "").replace("```", "").replace("\\n", " ")
         
@@ -82,7 +202,8 @@ class AIService:
         self,
         prompt_messages: List[ChatMessage], 
         ai_model: str, 
-        ai_service: str
+        ai_service: str,
+        timeout: Optional[float] = None
     ) -> str:
         """
         发送通用聊天提示到AI服务
@@ -91,6 +212,7 @@ class AIService:
             prompt_messages: 消息列表
             ai_model: AI模型
             ai_service: AI服务类型
+            timeout: AI请求的截止时间（秒），为空时使用 AI_HTTP_TIMEOUT
             
         返回:
             str: AI的响应文本
@@ -98,9 +220,35 @@ class AIService:
         if not self.client:
             self.client = create_ai_client(ai_service, ai_model)
             
-        response = await self.client.complete_chat(prompt_messages)
+        async with admission.slot(TARGET_AI, self._admission_target()):
+            response = await self.client.complete_chat(prompt_messages, timeout=timeout)
         return response
     
+    async def stream_chat_prompt(
+        self,
+        prompt_messages: List[ChatMessage], 
+        ai_model: str, 
+        ai_service: str
+    ) -> AsyncIterator[str]:
+        """
+        发送通用聊天提示到AI服务，并在生成过程中逐段返回响应文本
+        
+        参数:
+            prompt_messages: 消息列表
+            ai_model: AI模型
+            ai_service: AI服务类型
+        """
+        if not self.client:
+            self.client = create_ai_client(ai_service, ai_model)
+        
+        async with admission.slot(TARGET_AI, self._admission_target()):
+            async for token in self.client.stream_chat(prompt_messages):
+                yield token
+    
+    def _admission_target(self) -> str:
+        """准入控制按AI服务端点区分目标，Azure OpenAI按部署区分"""
+        return getattr(self.client, "api_url", type(self.client).__name__).split("?", 1)[0]
+    
     def set_use_enhanced_prompts(self, value: bool) -> None:
         """
         设置是否使用增强的提示词
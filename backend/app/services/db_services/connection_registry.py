@@ -0,0 +1,271 @@
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from app.services.db_services.db_interface import IDatabaseService
+
+# 前端未指定连接ID时使用的默认连接
+DEFAULT_CONNECTION_ID = "default"
+
+@dataclass
+class _RegistryEntry:
+    """注册表中的一个连接项"""
+    service: IDatabaseService
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    # 健康检查状态
+    pool_created_at: float = field(default_factory=time.monotonic)
+    healthy: bool = True
+    failures: int = 0
+    next_attempt: float = 0.0
+    reconnects: int = 0
+    last_error: Optional[str] = None
+
+class ConnectionRegistry:
+    """
+    进程级数据库连接注册表
+
+    按会话/连接ID保存已建立连接池的数据库服务，使连接池在多个请求之间复用。
+    空闲超过TTL的连接由后台任务回收，超过容量时按LRU顺序淘汰，仍在使用的连接不会被回收或淘汰，
+    应用关闭时统一释放。
+    另一个后台任务定期检查连接池是否可用，失效（如数据库故障转移后）或超过最大生命周期的
+    连接池会被透明地重建，重建失败时按指数退避重试；连接全部借出的繁忙连接池不做检查。
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 32,
+        idle_ttl: float = 1800,
+        sweep_interval: float = 60,
+        health_check_interval: float = 30,
+        health_check_timeout: float = 5,
+        max_pool_lifetime: float = 0,
+        backoff_base: float = 1,
+        backoff_max: float = 60
+    ):
+        self.max_connections = max_connections
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.max_pool_lifetime = max_pool_lifetime
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._entries: "OrderedDict[str, _RegistryEntry]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._sweeper: Optional[asyncio.Task] = None
+        self._health_checker: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """启动空闲连接回收和健康检查任务"""
+        if self._sweeper is None and self.idle_ttl > 0:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+        if self._health_checker is None and self.health_check_interval > 0:
+            self._health_checker = asyncio.create_task(self._health_check_loop())
+
+    def get(self, connection_id: str) -> Optional[IDatabaseService]:
+        """获取连接ID对应的数据库服务，并刷新其最近使用时间"""
+        entry = self._entries.get(connection_id)
+        if entry is None:
+            return None
+        entry.last_used = time.monotonic()
+        self._entries.move_to_end(connection_id)
+        return entry.service
+
+    def find_by_connection_string(self, connection_string: str) -> Optional[IDatabaseService]:
+        """查找使用相同连接字符串建立的已注册服务，不刷新其最近使用时间"""
+        for entry in self._entries.values():
+            if entry.service.connection_string == connection_string:
+                return entry.service
+        return None
+
+    def keys(self) -> List[str]:
+        """返回当前注册的所有连接ID"""
+        return list(self._entries.keys())
+
+    async def register(self, connection_id: str, service: IDatabaseService) -> None:
+        """注册数据库服务，替换同ID的旧服务，必要时淘汰最久未使用的连接"""
+        to_close: List[IDatabaseService] = []
+        async with self._lock:
+            previous = self._entries.pop(connection_id, None)
+            if previous is not None and previous.service is not service:
+                to_close.append(previous.service)
+
+            self._entries[connection_id] = _RegistryEntry(service=service)
+            to_close.extend(self._evict_over_capacity(keep=connection_id))
+
+        await self._close_services(to_close)
+
+    def _evict_over_capacity(self, keep: Optional[str] = None) -> List[IDatabaseService]:
+        """
+        超过容量时按LRU顺序淘汰，跳过keep和仍有请求在使用的连接，避免关闭正在执行查询的连接池
+
+        所有连接都在使用时暂时超过容量，由之后的注册或空闲回收继续淘汰
+        """
+        evicted: List[IDatabaseService] = []
+        for key in list(self._entries.keys()):
+            if len(self._entries) <= self.max_connections:
+                break
+            if key == keep or self._entries[key].service.in_use:
+                continue
+            evicted.append(self._entries.pop(key).service)
+        return evicted
+
+    async def remove(self, connection_id: str) -> bool:
+        """移除并关闭指定连接"""
+        async with self._lock:
+            entry = self._entries.pop(connection_id, None)
+
+        if entry is None:
+            return False
+
+        await self._close_services([entry.service])
+        return True
+
+    async def evict_idle(self) -> int:
+        """关闭空闲时间超过TTL且没有请求在使用的连接，并淘汰超过容量的连接，返回回收的数量"""
+        now = time.monotonic()
+        to_close: List[IDatabaseService] = []
+        async with self._lock:
+            expired = [
+                key for key, entry in self._entries.items()
+                if now - entry.last_used > self.idle_ttl and not entry.service.in_use
+            ]
+            for key in expired:
+                to_close.append(self._entries.pop(key).service)
+            to_close.extend(self._evict_over_capacity())
+
+        await self._close_services(to_close)
+        return len(to_close)
+
+    async def check_health(self) -> None:
+        """检查所有连接池，重建失效或超过最大生命周期的连接池"""
+        async with self._lock:
+            entries = list(self._entries.items())
+
+        for connection_id, entry in entries:
+            now = time.monotonic()
+            # 上次重建失败后处于退避期
+            if now < entry.next_attempt:
+                continue
+
+            if self.max_pool_lifetime and now - entry.pool_created_at > self.max_pool_lifetime:
+                await self._rebuild(connection_id, entry)
+                continue
+
+            # 连接全部借出时ping需要排队等待连接，等待超时只说明连接池繁忙，不说明连接池失效
+            if self._pool_busy(entry.service):
+                continue
+
+            try:
+                await asyncio.wait_for(entry.service.ping(), timeout=self.health_check_timeout)
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError) and self._pool_busy(entry.service):
+                    continue
+                entry.healthy = False
+                entry.last_error = str(e) or type(e).__name__
+                print(f"数据库连接 {connection_id} 健康检查失败: {entry.last_error}")
+                await self._rebuild(connection_id, entry)
+            else:
+                entry.healthy = True
+                entry.failures = 0
+                entry.last_error = None
+
+    @staticmethod
+    def _pool_busy(service: IDatabaseService) -> bool:
+        """连接池已达到最大连接数且没有空闲连接"""
+        stats = service.pool_stats()
+        return bool(stats) and stats["idle"] == 0 and stats["size"] >= stats["max_size"]
+
+    async def _rebuild(self, connection_id: str, entry: _RegistryEntry) -> None:
+        """重建连接池，失败时按指数退避安排下一次尝试"""
+        try:
+            success = await entry.service.reconnect()
+        except Exception as e:
+            success = False
+            entry.last_error = str(e) or type(e).__name__
+
+        # 重建期间连接已被移除或替换，新建的连接池无人使用，直接关闭
+        if self._entries.get(connection_id) is not entry:
+            await self._close_services([entry.service])
+            return
+
+        if success:
+            entry.healthy = True
+            entry.failures = 0
+            entry.next_attempt = 0.0
+            entry.pool_created_at = time.monotonic()
+            entry.reconnects += 1
+            entry.last_error = None
+        else:
+            entry.healthy = False
+            entry.failures += 1
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (entry.failures - 1))
+            entry.next_attempt = time.monotonic() + delay
+            print(f"重建数据库连接 {connection_id} 失败，{delay:.0f} 秒后重试")
+
+    async def close(self) -> None:
+        """停止后台任务并关闭所有连接"""
+        for task in (self._sweeper, self._health_checker):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._sweeper = None
+        self._health_checker = None
+
+        async with self._lock:
+            services = [entry.service for entry in self._entries.values()]
+            self._entries.clear()
+
+        await self._close_services(services)
+
+    def stats(self) -> Dict[str, object]:
+        """返回注册表状态"""
+        now = time.monotonic()
+        return {
+            "connections": len(self._entries),
+            "max_connections": self.max_connections,
+            "idle_ttl": self.idle_ttl,
+            "health_check_interval": self.health_check_interval,
+            "entries": {
+                key: {
+                    "idle_seconds": round(now - entry.last_used, 1),
+                    "pool_age_seconds": round(now - entry.pool_created_at, 1),
+                    "healthy": entry.healthy,
+                    "failures": entry.failures,
+                    "reconnects": entry.reconnects,
+                    "last_error": entry.last_error,
+                    "pool": entry.service.pool_stats(),
+                }
+                for key, entry in self._entries.items()
+            },
+        }
+
+    async def _health_check_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                print(f"数据库连接健康检查错误: {str(e)}")
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.evict_idle()
+            except Exception as e:
+                print(f"回收空闲数据库连接错误: {str(e)}")
+
+    @staticmethod
+    async def _close_services(services: List[IDatabaseService]) -> None:
+        for service in services:
+            try:
+                await service.close()
+            except Exception as e:
+                print(f"关闭数据库连接错误: {str(e)}")
@@ -0,0 +1,145 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from app.services.db_services.db_interface import IDatabaseService
+from app.services.db_services.query_plan import PlanEstimate
+from app.services.db_services.sql_text import leading_keyword, normalize_sql
+from app.services.single_flight import SingleFlight
+
+# 超过阈值的查询的处理方式
+COST_GUARD_ACTION_REJECT = "reject"  # 直接拒绝
+COST_GUARD_ACTION_QUEUE = "queue"  # 排队，同时只执行有限个高代价查询
+
+# 只对这些语句获取执行计划，DDL等语句不支持EXPLAIN
+_EXPLAINABLE_KEYWORDS = ("select", "with", "insert", "update", "delete")
+
+class QueryCostExceededError(Exception):
+    """查询的估计代价超过了配置的阈值"""
+
+    def __init__(self, message: str, estimate: PlanEstimate):
+        super().__init__(message)
+        self.estimate = estimate
+
+class QueryCostGuard:
+    """
+    执行前的代价检查
+
+    执行查询前先通过数据库的EXPLAIN获取估计行数和代价，超过阈值的查询被拒绝，
+    或者在queue模式下排队，同时最多执行 queue_concurrency 个。
+    执行计划按连接和规范化后的SQL缓存，重复的查询不再额外访问数据库
+    """
+
+    def __init__(
+        self,
+        max_rows: float = 0,
+        max_cost: float = 0,
+        action: str = COST_GUARD_ACTION_REJECT,
+        queue_concurrency: int = 1,
+        queue_timeout: float = 30,
+        cache_size: int = 512,
+        cache_ttl: float = 300
+    ):
+        self.max_rows = max_rows
+        self.max_cost = max_cost
+        self.action = action
+        self.queue_timeout = queue_timeout
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._heavy_slots = asyncio.Semaphore(queue_concurrency)
+        # (连接字符串, 规范化SQL) -> (缓存时间, 估计)，无法获取执行计划时估计为None
+        self._plans: "OrderedDict[Tuple[str, str], Tuple[float, Optional[PlanEstimate]]]" = OrderedDict()
+        self._flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.queued = 0
+
+    async def estimate(self, service: IDatabaseService, query: str) -> Optional[PlanEstimate]:
+        """获取查询的代价估计，优先使用缓存的执行计划"""
+        # 按跳过注释和括号后的第一个关键字判断，AI生成的SQL经常以注释开头
+        if leading_keyword(query) not in _EXPLAINABLE_KEYWORDS:
+            return None
+
+        normalized = normalize_sql(query)
+
+        key = (service.connection_string or str(id(service)), normalized)
+        cached = self._plans.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self.cache_ttl:
+            self._plans.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+
+        self.misses += 1
+        estimate = await self._flights.do(key, lambda: self._explain(service, query))
+        self._plans[key] = (time.monotonic(), estimate)
+        self._plans.move_to_end(key)
+        while len(self._plans) > self.cache_size:
+            self._plans.popitem(last=False)
+        return estimate
+
+    @staticmethod
+    async def _explain(service: IDatabaseService, query: str) -> Optional[PlanEstimate]:
+        try:
+            return await service.explain_query(query)
+        except Exception as e:
+            # 获取不到执行计划时不阻止执行，由数据库在执行时报告错误
+            print(f"获取执行计划错误: {str(e)}")
+            return None
+
+    def exceeded(self, estimate: Optional[PlanEstimate]) -> Optional[str]:
+        """返回超过阈值的原因，未超过时返回None"""
+        if estimate is None:
+            return None
+        if self.max_rows and estimate.rows is not None and estimate.rows > self.max_rows:
+            return f"估计处理 {estimate.rows:.0f} 行，超过上限 {self.max_rows:.0f} 行"
+        if self.max_cost and estimate.cost is not None and estimate.cost > self.max_cost:
+            return f"估计代价 {estimate.cost:.2f}，超过上限 {self.max_cost:.2f}"
+        return None
+
+    @asynccontextmanager
+    async def admit(self, service: IDatabaseService, query: str) -> AsyncIterator[Optional[PlanEstimate]]:
+        """
+        在执行查询前检查代价
+
+        超过阈值时抛出QueryCostExceededError；queue模式下等待执行名额，
+        等待超过 queue_timeout 秒同样抛出QueryCostExceededError
+        """
+        estimate = await self.estimate(service, query)
+        reason = self.exceeded(estimate)
+        if reason is None:
+            yield estimate
+            return
+
+        if self.action != COST_GUARD_ACTION_QUEUE:
+            self.rejected += 1
+            raise QueryCostExceededError(f"查询代价过高: {reason}", estimate)
+
+        try:
+            await asyncio.wait_for(self._heavy_slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise QueryCostExceededError(
+                f"查询代价过高且排队超过 {self.queue_timeout:g} 秒: {reason}", estimate
+            )
+
+        self.queued += 1
+        try:
+            yield estimate
+        finally:
+            self._heavy_slots.release()
+
+    def stats(self) -> Dict[str, object]:
+        """代价检查统计"""
+        return {
+            "max_rows": self.max_rows,
+            "max_cost": self.max_cost,
+            "action": self.action,
+            "cached_plans": len(self._plans),
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected": self.rejected,
+            "queued": self.queued,
+        }
@@ -1,10 +1,25 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, AsyncIterator, Set
+from app.config import settings
 from app.models.database import DatabaseSchemaModel
+from app.services.db_services.query_plan import PlanEstimate
+from app.services.db_services.query_result import QueryResult, limit_rows
+
+# 正在后台关闭的旧连接池，保留任务的引用直到关闭完成
+_closing_pools: Set[asyncio.Task] = set()
 
 class IDatabaseService(ABC):
     """数据库服务接口，定义与数据库交互的通用方法"""
     
+    # 建立连接时使用的连接字符串，用于识别指向同一数据库的已注册连接
+    connection_string: Optional[str] = None
+    # 驱动的连接池，未连接时为None
+    pool: Any = None
+    # 正在获取或占用连接的调用数，注册表不会淘汰仍在使用的服务
+    in_use: int = 0
+    
     @abstractmethod
     async def connect(self, connection_string: str) -> bool:
         """连接到数据库"""
@@ -12,19 +27,155 @@ class IDatabaseService(ABC):
     
     @abstractmethod
     async def test_connection(self, connection_string: str) -> bool:
-        """测试数据库连接是否有效"""
+        """测试数据库连接是否有效，应使用单个短超时的连接而不是创建连接池"""
+        pass
+    
+    async def ping(self) -> bool:
+        """通过已建立的连接池执行简单查询，检查连接是否仍然可用"""
+        await self.execute_query_rows("SELECT 1", max_rows=1)
+        return True
+    
+    @asynccontextmanager
+    async def acquire(self):
+        """从连接池获取连接，等待超过 DB_POOL_ACQUIRE_TIMEOUT 秒时抛出 asyncio.TimeoutError"""
+        pool = self.pool
+        if not pool:
+            raise ConnectionError("未连接到数据库")
+        
+        self.in_use += 1
+        try:
+            conn = await asyncio.wait_for(pool.acquire(), timeout=settings.DB_POOL_ACQUIRE_TIMEOUT)
+            try:
+                yield conn
+            finally:
+                await pool.release(conn)
+        finally:
+            self.in_use -= 1
+    
+    async def reconnect(self) -> bool:
+        """
+        使用原连接字符串重建连接池
+        
+        新连接池建立成功后才替换旧连接池，新的请求立即使用新连接池；旧连接池在后台关闭，
+        关闭时等待借出的连接归还，正在执行的语句和流式查询不会被中断。重建失败时保留旧连接池并返回False
+        """
+        if not self.connection_string:
+            return False
+        
+        old_pool = self.pool
+        if not await self.connect(self.connection_string):
+            return False
+        
+        if old_pool is not None and old_pool is not self.pool:
+            task = asyncio.create_task(self._drain_pool(old_pool))
+            _closing_pools.add(task)
+            task.add_done_callback(_closing_pools.discard)
+        return True
+    
+    async def _drain_pool(self, pool: Any) -> None:
+        """关闭旧连接池，不限制等待时间：超时取消关闭会使驱动强制断开仍在使用的连接"""
+        try:
+            await self._close_pool(pool)
+        except Exception as e:
+            print(f"关闭旧连接池错误: {str(e)}")
+    
+    async def _close_pool(self, pool: Any) -> None:
+        """关闭指定的连接池，由各实现按驱动的方式覆盖"""
         pass
     
+    def pool_stats(self) -> Optional[Dict[str, int]]:
+        """返回连接池的大小和空闲连接数，不支持时返回None"""
+        return None
+    
     @abstractmethod
     async def get_database_schema(self) -> DatabaseSchemaModel:
         """获取数据库架构信息"""
         pass
     
+    async def get_schema_versions(self) -> Optional[Dict[str, str]]:
+        """
+        获取每个表的变更标记（表名 -> 标记），用于低成本地检测架构变化
+        
+        不支持变更检测的实现返回None
+        """
+        return None
+    
+    async def get_table_change_counters(self) -> Optional[Dict[str, str]]:
+        """
+        获取每个表的数据变更计数（表名 -> 标记），任何写入都应改变对应表的标记，用于使查询结果缓存失效
+        
+        不支持的实现返回None
+        """
+        return None
+    
+    async def get_tables_schema(self, table_names: List[str]) -> DatabaseSchemaModel:
+        """仅获取指定表的架构信息，默认实现从完整架构中筛选"""
+        schema = await self.get_database_schema()
+        wanted = set(table_names)
+        pairs = [
+            (table, raw) for table, raw in zip(schema.tables, schema.schema_raw)
+            if table.name in wanted
+        ]
+        return DatabaseSchemaModel(
+            name=schema.name,
+            tables=[table for table, _ in pairs],
+            schema_raw=[raw for _, raw in pairs]
+        )
+    
+    @staticmethod
+    def resolve_timeout(timeout: Optional[float]) -> Optional[float]:
+        """计算语句超时（秒）：请求指定的超时不能超过 DB_STATEMENT_TIMEOUT，两者都未设置时返回None"""
+        limit = settings.DB_STATEMENT_TIMEOUT or None
+        if timeout is None:
+            return limit
+        return min(timeout, limit) if limit else timeout
+    
     @abstractmethod
-    async def execute_query(self, query: str) -> List[Dict[str, Any]]:
-        """执行SQL查询并返回结果"""
+    async def execute_query(
+        self, query: str, max_rows: Optional[int] = None, timeout: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        执行SQL查询并返回结果，max_rows限制最多读取的行数
+        
+        timeout为语句超时（秒），由数据库服务端执行，超时或调用被取消时中止服务端的语句
+        """
         pass
     
+    async def execute_query_rows(
+        self, query: str, max_rows: Optional[int] = None, timeout: Optional[float] = None
+    ) -> QueryResult:
+        """
+        执行SQL查询并以列名加元组行的紧凑形式返回结果
+        
+        指定max_rows时最多读取max_rows + 1行，超出部分不再读取，并在结果中标记truncated。
+        默认实现基于execute_query的字典结果转换，各实现应覆盖此方法以避免创建字典
+        """
+        records = await self.execute_query(
+            query, max_rows=max_rows + 1 if max_rows is not None else None, timeout=timeout
+        )
+        columns = list(records[0].keys()) if records else []
+        rows, truncated = limit_rows([tuple(record.values()) for record in records], max_rows)
+        return QueryResult(columns=columns, rows=rows, truncated=truncated)
+    
+    async def explain_query(self, query: str) -> Optional[PlanEstimate]:
+        """
+        通过EXPLAIN获取查询的估计行数和代价，不执行查询本身
+        
+        不支持执行计划的实现返回None
+        """
+        return None
+    
+    async def stream_query(
+        self, query: str, batch_size: int = 500, timeout: Optional[float] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        以批次流式返回查询结果，内存占用与结果集大小无关
+        
+        timeout为语句超时（秒），与execute_query相同由数据库服务端执行。
+        默认实现一次性执行查询后作为单个批次返回，支持服务端游标的实现应覆盖此方法
+        """
+        yield await self.execute_query(query, timeout=timeout)
+    
     @abstractmethod
     async def get_database_type(self) -> str:
         """获取数据库类型"""
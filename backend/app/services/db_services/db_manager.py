@@ -1,65 +1,220 @@
-from typing import Dict, Optional, Type
+import asyncio
+import hashlib
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from app.config import settings
+from app.models.database import DatabaseSchemaModel
 from app.services.db_services.db_interface import IDatabaseService
-from app.services.db_services.mysql_service import MySQLDatabaseService
-from app.services.db_services.postgres_service import PostgreSQLDatabaseService
-from app.services.db_services.sqlserver_service import SQLServerDatabaseService
+from app.services.db_services.connection_registry import ConnectionRegistry, DEFAULT_CONNECTION_ID
+from app.services.db_services.cost_guard import QueryCostGuard
+from app.services.db_services.query_result import QueryResult
+from app.services.db_services.result_cache import QueryResultCache
+from app.services.db_services.schema_cache import SchemaCache
+from app.services.db_services.service_types import detect_database_type, resolve_service_class
+from app.services.db_services.sql_text import is_read_only
+from app.services.admission import admission, PRIORITY_BATCH, TARGET_DATABASE
+from app.services.single_flight import SingleFlight
+
+# 未启用架构缓存时，合并同一连接上并发的架构查询
+_schema_flights = SingleFlight()
+
+# 连接测试：合并相同的并发测试，并短时间缓存结果，避免前端轮询反复连接数据库服务器
+_connection_test_flights = SingleFlight()
+# 连接字符串摘要 -> (测试时间, 结果)
+_connection_test_results: Dict[str, Tuple[float, bool]] = {}
+
+def _admission_target(service: IDatabaseService) -> str:
+    """准入控制按数据库区分目标，指向同一数据库的连接共享并发限制"""
+    return service.connection_string or str(id(service))
 
 class DatabaseManagerService:
     """数据库管理服务，负责选择合适的数据库服务实现"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        registry: Optional[ConnectionRegistry] = None,
+        connection_id: str = DEFAULT_CONNECTION_ID,
+        schema_cache: Optional[SchemaCache] = None,
+        cost_guard: Optional[QueryCostGuard] = None,
+        result_cache: Optional[QueryResultCache] = None
+    ):
+        self.registry = registry
+        self.schema_cache = schema_cache
+        self.cost_guard = cost_guard
+        self.result_cache = result_cache
+        self.connection_id = connection_id
         self.current_service: Optional[IDatabaseService] = None
-        self.service_types: Dict[str, Type[IDatabaseService]] = {
-            "mysql": MySQLDatabaseService,
-            "postgres": PostgreSQLDatabaseService,
-            "sqlserver": SQLServerDatabaseService,
-        }
     
     def get_service_for_connection_string(self, connection_string: str) -> IDatabaseService:
-        """根据连接字符串选择合适的数据库服务"""
+        """根据连接字符串选择合适的数据库服务，对应的数据库驱动在首次使用时才导入"""
         
         # 从连接字符串中检测数据库类型
-        db_type = "unknown"
-        if connection_string.startswith("mysql://"):
-            db_type = "mysql"
-        elif connection_string.startswith("postgresql://"):
-            db_type = "postgres"
-        elif connection_string.startswith("mssql://"):
-            db_type = "sqlserver"
-            
+        db_type = detect_database_type(connection_string)
+        
         # 如果找到匹配的服务类型，创建并返回实例
-        if db_type in self.service_types:
-            service_class = self.service_types[db_type]
-            return service_class()
-        else:
-            raise ValueError(f"不支持的数据库类型: {db_type}")
+        service_class = resolve_service_class(db_type)
+        return service_class()
     
     async def connect_to_database(self, connection_string: str) -> bool:
         """连接到数据库"""
         try:
             # 获取合适的服务
-            self.current_service = self.get_service_for_connection_string(connection_string)
+            service = self.get_service_for_connection_string(connection_string)
             
             # 连接到数据库
-            success = await self.current_service.connect(connection_string)
+            success = await service.connect(connection_string)
             if not success:
                 self.current_service = None
+                return False
+            
+            # 注册到进程级注册表，使连接池在后续请求中复用
+            if self.registry is not None:
+                await self.registry.register(self.connection_id, service)
+            self.current_service = service
                 
-            return success
+            return True
         except Exception as e:
             print(f"连接数据库错误: {str(e)}")
             self.current_service = None
             return False
     
     async def test_connection(self, connection_string: str) -> bool:
-        """测试数据库连接"""
+        """测试数据库连接，结果缓存 DB_TEST_CACHE_TTL 秒"""
+        key = hashlib.sha256(connection_string.encode("utf-8")).hexdigest()
+        now = time.monotonic()
+        cached = _connection_test_results.get(key)
+        if cached is not None and now - cached[0] < settings.DB_TEST_CACHE_TTL:
+            return cached[1]
+        
+        success = await _connection_test_flights.do(key, lambda: self._test_connection(connection_string))
+        
+        # 顺便清理过期的结果，避免缓存无限增长
+        now = time.monotonic()
+        for expired in [k for k, (tested_at, _) in _connection_test_results.items() if now - tested_at >= settings.DB_TEST_CACHE_TTL]:
+            del _connection_test_results[expired]
+        _connection_test_results[key] = (now, success)
+        return success
+    
+    async def _test_connection(self, connection_string: str) -> bool:
+        # 已有相同连接字符串的连接池时直接复用，不再建立新连接
+        if self.registry is not None:
+            service = self.registry.find_by_connection_string(connection_string)
+            if service is not None:
+                try:
+                    return await asyncio.wait_for(service.ping(), timeout=settings.DB_TEST_CONNECT_TIMEOUT)
+                except Exception as e:
+                    print(f"通过已有连接池测试数据库连接错误: {str(e)}")
+        
         try:
             service = self.get_service_for_connection_string(connection_string)
-            return await service.test_connection(connection_string)
+            # 驱动自身的连接超时之外再加一层总超时，覆盖DNS解析和登录等阶段
+            return await asyncio.wait_for(
+                service.test_connection(connection_string),
+                timeout=settings.DB_TEST_CONNECT_TIMEOUT * 2
+            )
         except Exception as e:
             print(f"测试数据库连接错误: {str(e)}")
             return False
     
     def get_current_service(self) -> Optional[IDatabaseService]:
         """获取当前活动的数据库服务"""
-        return self.current_service
\ No newline at end of file
+        if self.current_service is None and self.registry is not None:
+            self.current_service = self.registry.get(self.connection_id)
+        return self.current_service
+    
+    async def get_database_schema(self) -> DatabaseSchemaModel:
+        """获取当前连接的数据库架构，启用架构缓存时优先从缓存读取"""
+        service = self.get_current_service()
+        if not service:
+            raise ConnectionError("未连接到数据库")
+        
+        if self.schema_cache is not None:
+            return await self.schema_cache.get_schema(self.connection_id, service)
+        return await _schema_flights.do(id(service), service.get_database_schema)
+    
+    async def execute_query_rows(
+        self, query: str, max_rows: Optional[int] = None, timeout: Optional[float] = None
+    ) -> QueryResult:
+        """
+        在当前连接上执行查询
+        
+        启用结果缓存时，只读查询优先从缓存返回，写入语句执行后使涉及的表的缓存失效。
+        启用代价检查时先获取执行计划，估计代价超过阈值的查询抛出QueryCostExceededError或排队执行
+        """
+        service = self.get_current_service()
+        if not service:
+            raise ConnectionError("未连接到数据库")
+        
+        if self.result_cache is None:
+            return await self._execute_query_rows(service, query, max_rows, timeout)
+        return await self.result_cache.run(
+            service, query, max_rows,
+            lambda: self._execute_query_rows(service, query, max_rows, timeout)
+        )
+    
+    async def _execute_query_rows(
+        self, service: IDatabaseService, query: str, max_rows: Optional[int], timeout: Optional[float]
+    ) -> QueryResult:
+        if self.cost_guard is None:
+            return await self._admit_and_execute(service, query, max_rows, timeout)
+        
+        async with self.cost_guard.admit(service, query):
+            return await self._admit_and_execute(service, query, max_rows, timeout)
+    
+    @staticmethod
+    async def _admit_and_execute(
+        service: IDatabaseService, query: str, max_rows: Optional[int], timeout: Optional[float]
+    ) -> QueryResult:
+        # 限制同一数据库上的并发查询，繁忙时在进入驱动之前抛出AdmissionRejected
+        async with admission.slot(TARGET_DATABASE, _admission_target(service)):
+            return await service.execute_query_rows(query, max_rows=max_rows, timeout=timeout)
+    
+    async def stream_query(
+        self, query: str, batch_size: int, timeout: Optional[float] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        以批量优先级流式执行查询，整个流式读取期间占用一个执行名额
+        
+        语句超时和代价检查与execute_query_rows相同，queue模式下高代价查询在整个流式读取期间占用排队名额
+        """
+        service = self.get_current_service()
+        if not service:
+            raise ConnectionError("未连接到数据库")
+        
+        if self.cost_guard is None:
+            async for batch in self._admit_and_stream(service, query, batch_size, timeout):
+                yield batch
+            return
+        
+        async with self.cost_guard.admit(service, query):
+            async for batch in self._admit_and_stream(service, query, batch_size, timeout):
+                yield batch
+    
+    @staticmethod
+    async def _admit_and_stream(
+        service: IDatabaseService, query: str, batch_size: int, timeout: Optional[float]
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        async with admission.slot(TARGET_DATABASE, _admission_target(service), PRIORITY_BATCH):
+            async for batch in service.stream_query(query, batch_size=batch_size, timeout=timeout):
+                yield batch
+    
+    def invalidate_result_cache_for(self, query: str) -> int:
+        """语句不是只读查询时，使其涉及的表的结果缓存失效（用于不经过execute_query_rows执行的语句）"""
+        service = self.get_current_service()
+        if self.result_cache is None or service is None or is_read_only(query):
+            return 0
+        return self.result_cache.invalidate_for_write(service, query)
+    
+    def invalidate_schema_cache(self) -> int:
+        """使当前连接的架构缓存失效"""
+        if self.schema_cache is None:
+            return 0
+        return self.schema_cache.invalidate(self.connection_id)
+    
+    async def disconnect(self) -> bool:
+        """断开当前连接并释放连接池"""
+        self.current_service = None
+        self.invalidate_schema_cache()
+        if self.registry is not None:
+            return await self.registry.remove(self.connection_id)
+        return False
\ No newline at end of file
@@ -0,0 +1,37 @@
+from typing import Dict, Iterable, List, Tuple
+
+from app.models.database import ForeignKeyModel
+
+def group_foreign_keys(rows: Iterable[Tuple[str, str, str, str, str]]) -> Dict[str, List[ForeignKeyModel]]:
+    """
+    将外键的逐列查询结果按表和约束分组
+
+    参数:
+        rows: (表名, 约束名, 列名, 引用表, 引用列) 行，同一约束的列按约束中的顺序排列
+
+    返回:
+        Dict[str, List[ForeignKeyModel]]: 表名 -> 该表声明的外键列表
+    """
+    grouped: Dict[str, Dict[str, ForeignKeyModel]] = {}
+    for table_name, constraint_name, column_name, referenced_table, referenced_column in rows:
+        constraints = grouped.setdefault(table_name, {})
+        foreign_key = constraints.get(constraint_name)
+        if foreign_key is None:
+            foreign_key = ForeignKeyModel(
+                name=constraint_name,
+                columns=[],
+                referenced_table=referenced_table,
+                referenced_columns=[]
+            )
+            constraints[constraint_name] = foreign_key
+        foreign_key.columns.append(column_name)
+        foreign_key.referenced_columns.append(referenced_column)
+
+    return {table_name: list(constraints.values()) for table_name, constraints in grouped.items()}
+
+def foreign_key_clauses(foreign_keys: List[ForeignKeyModel]) -> List[str]:
+    """生成原始模式字符串中的 FOREIGN KEY 子句"""
+    return [
+        f"FOREIGN KEY ({', '.join(fk.columns)}) REFERENCES {fk.referenced_table} ({', '.join(fk.referenced_columns)})"
+        for fk in foreign_keys
+    ]
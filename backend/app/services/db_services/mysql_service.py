@@ -1,7 +1,16 @@
+import asyncio
 import aiomysql
-from typing import List, Dict, Any, Optional
-from app.models.database import DatabaseSchemaModel, TableSchemaModel
+from typing import List, Dict, Any, Optional, Set, Tuple, AsyncIterator
+from app.config import settings
+from app.models.database import DatabaseSchemaModel, TableSchemaModel, ForeignKeyModel
 from app.services.db_services.db_interface import IDatabaseService
+from app.services.db_services.foreign_keys import group_foreign_keys, foreign_key_clauses
+from app.services.db_services.query_plan import PlanEstimate, parse_mysql_plan
+from app.services.db_services.query_result import QueryResult, limit_rows
+from app.services.db_services.sql_text import trailing_limit
+
+# 后台执行中的KILL QUERY任务，保留引用避免任务被垃圾回收
+_kill_tasks: Set[asyncio.Task] = set()
 
 class MySQLDatabaseService(IDatabaseService):
     """MySQL数据库服务实现"""
@@ -33,8 +42,13 @@ class MySQLDatabaseService(IDatabaseService):
                 user=user,
                 password=password,
                 db=db,
-                autocommit=True
+                autocommit=True,
+                minsize=settings.DB_POOL_MIN_SIZE,
+                maxsize=settings.DB_POOL_MAX_SIZE,
+                pool_recycle=settings.DB_POOL_RECYCLE,
+                connect_timeout=settings.DB_POOL_CONNECT_TIMEOUT
             )
+            self.connection_string = connection_string
             
             return True
         except Exception as e:
@@ -42,8 +56,8 @@ class MySQLDatabaseService(IDatabaseService):
             return False
     
     async def test_connection(self, connection_string: str) -> bool:
-        """测试MySQL数据库连接"""
-        temp_pool = None
+        """使用单个短超时的连接测试MySQL数据库连接"""
+        conn = None
         try:
             # 解析连接字符串
             parts = connection_string.replace("mysql://", "").split("@")
@@ -57,39 +71,149 @@ class MySQLDatabaseService(IDatabaseService):
             port = int(host_port[1]) if len(host_port) > 1 else 3306
             db = host_port_db[1] if len(host_port_db) > 1 else ""
             
-            # 创建临时连接池
-            temp_pool = await aiomysql.create_pool(
+            # 创建临时连接
+            conn = await aiomysql.connect(
                 host=host,
                 port=port,
                 user=user,
                 password=password,
                 db=db,
-                autocommit=True
+                autocommit=True,
+                connect_timeout=settings.DB_TEST_CONNECT_TIMEOUT
             )
             
-            async with temp_pool.acquire() as conn:
-                async with conn.cursor() as cur:
-                    await cur.execute("SELECT 1")
+            async with conn.cursor() as cur:
+                await cur.execute("SELECT 1")
                     
             return True
         except Exception as e:
             print(f"MySQL连接测试错误: {str(e)}")
             return False
         finally:
-            if temp_pool:
-                temp_pool.close()
-                await temp_pool.wait_closed()
+            if conn:
+                conn.close()
     
     async def get_database_schema(self) -> DatabaseSchemaModel:
         """获取MySQL数据库架构"""
         if not self.pool:
             raise ConnectionError("未连接到数据库")
         
+        if settings.SCHEMA_BULK_INTROSPECTION:
+            return await self._get_database_schema_bulk()
+        return await self._get_database_schema_per_table()
+    
+    async def get_schema_versions(self) -> Optional[Dict[str, str]]:
+        """通过 INFORMATION_SCHEMA.TABLES 的创建/更新时间获取每个表的变更标记"""
+        if not self.pool:
+            raise ConnectionError("未连接到数据库")
+        
+        async with self.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT TABLE_NAME, CREATE_TIME, UPDATE_TIME
+                    FROM INFORMATION_SCHEMA.TABLES
+                    WHERE TABLE_SCHEMA = DATABASE()
+                """)
+                rows = await cur.fetchall()
+        
+        return {row[0]: f"{row[1]}|{row[2]}" for row in rows}
+    
+    async def get_table_change_counters(self) -> Optional[Dict[str, str]]:
+        """
+        通过 INFORMATION_SCHEMA.TABLES 的 UPDATE_TIME 获取每个表的数据变更标记
+        
+        MySQL 8.0 会按 information_schema_stats_expiry 缓存该值，需要及时失效时应将其设为0
+        """
+        if not self.pool:
+            raise ConnectionError("未连接到数据库")
+        
+        async with self.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT TABLE_NAME, UPDATE_TIME
+                    FROM INFORMATION_SCHEMA.TABLES
+                    WHERE TABLE_SCHEMA = DATABASE()
+                """)
+                rows = await cur.fetchall()
+        
+        return {row[0]: str(row[1]) for row in rows}
+    
+    async def get_tables_schema(self, table_names: List[str]) -> DatabaseSchemaModel:
+        """仅获取指定表的架构信息"""
+        if not self.pool:
+            raise ConnectionError("未连接到数据库")
+        
+        return await self._get_database_schema_bulk(table_names)
+    
+    async def _get_database_schema_bulk(self, table_names: Optional[List[str]] = None) -> DatabaseSchemaModel:
+        """通过少量集合查询一次性获取所有表（或指定表）的列信息，并在内存中按表分组"""
+        tables = []
+        schema_raw = []
+        
+        # 可选的表名过滤条件
+        table_filter = ""
+        params: Tuple = ()
+        if table_names:
+            table_filter = f"AND TABLE_NAME IN ({', '.join(['%s'] * len(table_names))})"
+            params = tuple(table_names)
+        
+        async with self.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("SELECT DATABASE()")
+                result = await cur.fetchone()
+                db_name = result[0] if result else "unknown"
+                
+                # 获取表列表
+                await cur.execute(f"""
+                    SELECT TABLE_NAME 
+                    FROM INFORMATION_SCHEMA.TABLES 
+                    WHERE TABLE_SCHEMA = DATABASE()
+                    {table_filter}
+                """, params)
+                table_rows = await cur.fetchall()
+                
+                # 一次获取所有表的列
+                await cur.execute(f"""
+                    SELECT 
+                        TABLE_NAME,
+                        COLUMN_NAME, 
+                        DATA_TYPE,
+                        IS_NULLABLE,
+                        COLUMN_KEY
+                    FROM INFORMATION_SCHEMA.COLUMNS
+                    WHERE TABLE_SCHEMA = DATABASE()
+                    {table_filter}
+                    ORDER BY TABLE_NAME, ORDINAL_POSITION
+                """, params)
+                column_rows = await cur.fetchall()
+                
+                foreign_keys = await self._fetch_foreign_keys(cur, table_filter, params)
+        
+        columns_by_table: Dict[str, List[Tuple]] = {}
+        for col in column_rows:
+            columns_by_table.setdefault(col[0], []).append(col[1:])
+        
+        for table_row in table_rows:
+            table_name = table_row[0]
+            table, create_table_str = self._build_table_schema(
+                table_name, columns_by_table.get(table_name, []), foreign_keys.get(table_name)
+            )
+            tables.append(table)
+            schema_raw.append(create_table_str)
+        
+        return DatabaseSchemaModel(
+            name=db_name,
+            tables=tables,
+            schema_raw=schema_raw
+        )
+    
+    async def _get_database_schema_per_table(self) -> DatabaseSchemaModel:
+        """逐表查询列信息获取数据库架构"""
         tables = []
         schema_raw = []
         db_name = ""
         
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
             # 获取数据库名称
             async with conn.cursor() as cur:
                 await cur.execute("SELECT DATABASE()")
@@ -105,11 +229,13 @@ class MySQLDatabaseService(IDatabaseService):
                 """)
                 table_rows = await cur.fetchall()
                 
+                foreign_keys = await self._fetch_foreign_keys(cur)
+                
                 for table_row in table_rows:
                     table_name = table_row[0]
                     
                     # 获取表结构
-                    await cur.execute(f"""
+                    await cur.execute("""
                         SELECT 
                             COLUMN_NAME, 
                             DATA_TYPE,
@@ -117,36 +243,17 @@ class MySQLDatabaseService(IDatabaseService):
                             COLUMN_KEY
                         FROM INFORMATION_SCHEMA.COLUMNS
                         WHERE TABLE_SCHEMA = DATABASE()
-                        AND TABLE_NAME = '{table_name}'
-                    """)
+                        AND TABLE_NAME = %s
+                        ORDER BY ORDINAL_POSITION
+                    """, (table_name,))
                     
-                    columns = []
                     column_rows = await cur.fetchall()
                     
-                    for col in column_rows:
-                        column_name = col[0]
-                        data_type = col[1]
-                        is_nullable = col[2]
-                        column_key = col[3]
-                        
-                        columns.append({
-                            "name": column_name,
-                            "type": data_type,
-                            "nullable": is_nullable == "YES",
-                            "key": column_key
-                        })
-                    
-                    tables.append(TableSchemaModel(
-                        name=table_name,
-                        columns=columns
-                    ))
-                    
-                    # 创建原始模式字符串
-                    column_text = ", ".join([
-                        f"{col['name']} {col['type']}{'NOT NULL' if not col['nullable'] else ''}{' PRIMARY KEY' if col['key'] == 'PRI' else ''}"
-                        for col in columns
-                    ])
-                    schema_raw.append(f"CREATE TABLE {table_name} ({column_text});")
+                    table, create_table_str = self._build_table_schema(
+                        table_name, column_rows, foreign_keys.get(table_name)
+                    )
+                    tables.append(table)
+                    schema_raw.append(create_table_str)
         
         return DatabaseSchemaModel(
             name=db_name,
@@ -154,22 +261,235 @@ class MySQLDatabaseService(IDatabaseService):
             schema_raw=schema_raw
         )
     
-    async def execute_query(self, query: str) -> List[Dict[str, Any]]:
+    @staticmethod
+    async def _fetch_foreign_keys(cur, table_filter: str = "", params: Tuple = ()) -> Dict[str, List[ForeignKeyModel]]:
+        """一次获取所有表（或指定表）声明的外键，按表分组"""
+        await cur.execute(f"""
+            SELECT 
+                TABLE_NAME,
+                CONSTRAINT_NAME,
+                COLUMN_NAME,
+                REFERENCED_TABLE_NAME,
+                REFERENCED_COLUMN_NAME
+            FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
+            WHERE TABLE_SCHEMA = DATABASE()
+            AND REFERENCED_TABLE_NAME IS NOT NULL
+            {table_filter}
+            ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION
+        """, params)
+        return group_foreign_keys(await cur.fetchall())
+    
+    @staticmethod
+    def _build_table_schema(
+        table_name: str,
+        column_rows: List[Tuple],
+        foreign_keys: Optional[List[ForeignKeyModel]] = None
+    ) -> Tuple[TableSchemaModel, str]:
+        """
+        根据列信息构建表模型和原始模式字符串
+        
+        参数:
+            table_name: 表名
+            column_rows: (列名, 数据类型, 是否可空, 键类型) 元组列表
+            foreign_keys: 表声明的外键
+        """
+        foreign_keys = foreign_keys or []
+        columns = []
+        
+        for col in column_rows:
+            column_name = col[0]
+            data_type = col[1]
+            is_nullable = col[2]
+            column_key = col[3]
+            
+            columns.append({
+                "name": column_name,
+                "type": data_type,
+                "nullable": is_nullable == "YES",
+                "key": column_key
+            })
+        
+        # 创建原始模式字符串
+        column_text = ", ".join([
+            f"{col['name']} {col['type']}{'NOT NULL' if not col['nullable'] else ''}{' PRIMARY KEY' if col['key'] == 'PRI' else ''}"
+            for col in columns
+        ] + foreign_key_clauses(foreign_keys))
+        
+        table = TableSchemaModel(name=table_name, columns=columns, foreign_keys=foreign_keys)
+        return table, f"CREATE TABLE {table_name} ({column_text});"
+    
+    async def execute_query(
+        self, query: str, max_rows: Optional[int] = None, timeout: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
         """执行SQL查询并返回结果"""
+        result = await self.execute_query_rows(query, max_rows, timeout=timeout)
+        return result.to_records()
+    
+    async def execute_query_rows(
+        self, query: str, max_rows: Optional[int] = None, timeout: Optional[float] = None
+    ) -> QueryResult:
+        """
+        执行SQL查询并以列名加元组行的紧凑形式返回结果
+        
+        SELECT语句的超时由服务端的MAX_EXECUTION_TIME执行；其他语句不受该变量限制，由客户端在超时后中止。
+        调用被取消或超时时丢弃连接，并通过KILL QUERY中止服务端仍在执行的语句
+        """
         if not self.pool:
             raise ConnectionError("未连接到数据库")
         
-        results = []
+        statement_timeout = self.resolve_timeout(timeout)
+        if not statement_timeout:
+            return await self._execute_query_rows(query, max_rows, None)
         
-        async with self.pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cur:
+        try:
+            # 客户端的截止时间略晚于服务端，使SELECT优先由服务端超时，连接得以保留
+            return await asyncio.wait_for(
+                self._execute_query_rows(query, max_rows, statement_timeout),
+                timeout=statement_timeout + 1
+            )
+        except asyncio.TimeoutError:
+            raise Exception(f"执行查询错误: 查询超过 {statement_timeout:g} 秒未完成，已取消")
+    
+    async def _execute_query_rows(
+        self, query: str, max_rows: Optional[int], statement_timeout: Optional[float]
+    ) -> QueryResult:
+        async with self.acquire() as conn:
+            try:
+                if statement_timeout:
+                    await self._set_max_execution_time(conn, int(statement_timeout * 1000))
+                return await self._fetch_rows(conn, query, max_rows)
+            except asyncio.CancelledError:
+                self._abort_query(conn)
+                raise
+            finally:
+                # 连接会被连接池复用，恢复会话的默认超时
+                if statement_timeout and not conn.closed:
+                    await self._set_max_execution_time(conn, None)
+    
+    @staticmethod
+    async def _set_max_execution_time(conn, milliseconds: Optional[int]) -> None:
+        async with conn.cursor() as cur:
+            if milliseconds is None:
+                await cur.execute("SET SESSION MAX_EXECUTION_TIME = DEFAULT")
+            else:
+                await cur.execute("SET SESSION MAX_EXECUTION_TIME = %s", (milliseconds,))
+    
+    @staticmethod
+    async def _fetch_rows(conn, query: str, max_rows: Optional[int]) -> QueryResult:
+        if max_rows is None:
+            async with conn.cursor() as cur:
                 await cur.execute(query)
-                rows = await cur.fetchall()
                 
-                for row in rows:
-                    results.append(dict(row))
+                # 非查询语句没有结果集
+                if cur.description is None:
+                    return QueryResult(columns=["affected_rows"], rows=[(cur.rowcount,)])
+                
+                columns = [column[0] for column in cur.description]
+                rows = await cur.fetchall()
+            
+            return QueryResult(columns=columns, rows=list(rows))
         
-        return results
+        # 使用非缓冲游标，只从网络读取 max_rows + 1 行
+        cur = await conn.cursor(aiomysql.SSCursor)
+        try:
+            await cur.execute(query)
+            
+            if cur.description is None:
+                await cur.close()
+                return QueryResult(columns=["affected_rows"], rows=[(cur.rowcount,)])
+            
+            columns = [column[0] for column in cur.description]
+            rows, truncated = limit_rows(list(await cur.fetchmany(max_rows + 1)), max_rows)
+        except Exception:
+            conn.close()
+            raise
+        
+        if truncated:
+            # 关闭非缓冲游标需要读完剩余结果，直接丢弃连接更便宜，连接池会重新建立连接
+            conn.close()
+        else:
+            await cur.close()
+        
+        return QueryResult(columns=columns, rows=rows, truncated=truncated)
+    
+    def _abort_query(self, conn) -> None:
+        """丢弃执行被取消的连接，并在后台通过另一个连接中止服务端仍在执行的语句"""
+        if conn.closed:
+            return
+        thread_id = conn.thread_id()
+        conn.close()
+        task = asyncio.create_task(self._kill_query(thread_id))
+        _kill_tasks.add(task)
+        task.add_done_callback(_kill_tasks.discard)
+    
+    async def _kill_query(self, thread_id: int) -> None:
+        try:
+            async with self.acquire() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute("KILL QUERY %s", (thread_id,))
+        except Exception as e:
+            print(f"中止MySQL查询错误: {str(e)}")
+    
+    async def explain_query(self, query: str) -> Optional[PlanEstimate]:
+        """通过 EXPLAIN FORMAT=JSON 获取估计行数和代价"""
+        if not self.pool:
+            raise ConnectionError("未连接到数据库")
+        
+        async with self.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(f"EXPLAIN FORMAT=JSON {query}")
+                row = await cur.fetchone()
+        
+        return parse_mysql_plan(row[0], row_limit=trailing_limit(query)) if row else None
+    
+    async def stream_query(
+        self, query: str, batch_size: int = 500, timeout: Optional[float] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        使用非缓冲的服务端游标(SSCursor)分批读取查询结果
+        
+        与execute_query_rows相同，SELECT语句的超时由服务端的MAX_EXECUTION_TIME执行，
+        其他语句由客户端在超时后中止
+        """
+        if not self.pool:
+            raise ConnectionError("未连接到数据库")
+        
+        statement_timeout = self.resolve_timeout(timeout)
+        async with self.acquire() as conn:
+            if statement_timeout:
+                await self._set_max_execution_time(conn, int(statement_timeout * 1000))
+            cur = await conn.cursor(aiomysql.SSDictCursor)
+            drained = False
+            try:
+                try:
+                    await asyncio.wait_for(
+                        cur.execute(query), timeout=statement_timeout + 1 if statement_timeout else None
+                    )
+                except asyncio.TimeoutError:
+                    raise Exception(f"执行查询错误: 查询超过 {statement_timeout:g} 秒未完成，已取消")
+                
+                # 非查询语句没有结果集
+                if cur.description is None:
+                    drained = True
+                    yield [{"affected_rows": cur.rowcount}]
+                    return
+                
+                while True:
+                    rows = await cur.fetchmany(batch_size)
+                    if not rows:
+                        drained = True
+                        break
+                    yield [dict(row) for row in rows]
+            finally:
+                if drained:
+                    await cur.close()
+                    # 连接会被连接池复用，恢复会话的默认超时
+                    if statement_timeout:
+                        await self._set_max_execution_time(conn, None)
+                else:
+                    # 客户端断开或读取出错时结果集还没有读完，关闭非缓冲游标会读完剩余结果；
+                    # 直接丢弃连接，并中止服务端仍在执行的语句
+                    self._abort_query(conn)
     
     async def get_database_type(self) -> str:
         """获取数据库类型"""
@@ -178,6 +498,19 @@ class MySQLDatabaseService(IDatabaseService):
     async def close(self) -> None:
         """关闭数据库连接"""
         if self.pool:
-            self.pool.close()
-            await self.pool.wait_closed()
-            self.pool = None
\ No newline at end of file
+            await self._close_pool(self.pool)
+            self.pool = None
+    
+    async def _close_pool(self, pool: Any) -> None:
+        pool.close()
+        await pool.wait_closed()
+    
+    def pool_stats(self) -> Optional[Dict[str, int]]:
+        if not self.pool:
+            return None
+        return {
+            "size": self.pool.size,
+            "idle": self.pool.freesize,
+            "min_size": self.pool.minsize,
+            "max_size": self.pool.maxsize,
+        }
\ No newline at end of file
@@ -1,7 +1,11 @@
 import asyncpg
-from typing import List, Dict, Any, Optional
-from app.models.database import DatabaseSchemaModel, TableSchemaModel
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
+from app.config import settings
+from app.models.database import DatabaseSchemaModel, TableSchemaModel, ForeignKeyModel
 from app.services.db_services.db_interface import IDatabaseService
+from app.services.db_services.foreign_keys import group_foreign_keys, foreign_key_clauses
+from app.services.db_services.query_plan import PlanEstimate, parse_postgres_plan
+from app.services.db_services.query_result import QueryResult, limit_rows
 
 class PostgreSQLDatabaseService(IDatabaseService):
     """PostgreSQL数据库服务实现"""
@@ -33,8 +37,13 @@ class PostgreSQLDatabaseService(IDatabaseService):
                 password=password,
                 host=host,
                 port=port,
-                database=self.current_db
+                database=self.current_db,
+                min_size=settings.DB_POOL_MIN_SIZE,
+                max_size=settings.DB_POOL_MAX_SIZE,
+                max_inactive_connection_lifetime=settings.DB_POOL_RECYCLE,
+                timeout=settings.DB_POOL_CONNECT_TIMEOUT
             )
+            self.connection_string = connection_string
             
             return True
         except Exception as e:
@@ -42,7 +51,7 @@ class PostgreSQLDatabaseService(IDatabaseService):
             return False
     
     async def test_connection(self, connection_string: str) -> bool:
-        """测试PostgreSQL数据库连接"""
+        """使用单个短超时的连接测试PostgreSQL数据库连接"""
         conn = None
         try:
             # 解析连接字符串
@@ -63,7 +72,8 @@ class PostgreSQLDatabaseService(IDatabaseService):
                 password=password,
                 host=host,
                 port=port,
-                database=db
+                database=db,
+                timeout=settings.DB_TEST_CONNECT_TIMEOUT
             )
             
             # 执行简单查询测试连接
@@ -81,10 +91,147 @@ class PostgreSQLDatabaseService(IDatabaseService):
         if not self.pool:
             raise ConnectionError("未连接到数据库")
         
+        if settings.SCHEMA_BULK_INTROSPECTION:
+            return await self._get_database_schema_bulk()
+        return await self._get_database_schema_per_table()
+    
+    async def get_schema_versions(self) -> Optional[Dict[str, str]]:
+        """通过 pg_class 与 pg_attribute 行的 xmin 获取每个表的变更标记，任何DDL都会改变它们"""
+        if not self.pool:
+            raise ConnectionError("未连接到数据库")
+        
+        async with self.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT 
+                    c.relname AS table_name,
+                    c.xmin::text || ':' || COALESCE(MAX(a.xmin::text::bigint), 0)::text AS version
+                FROM 
+                    pg_class c
+                JOIN 
+                    pg_namespace n ON n.oid = c.relnamespace
+                LEFT JOIN 
+                    pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0
+                WHERE 
+                    n.nspname = 'public'
+                    AND c.relkind IN ('r', 'p')
+                GROUP BY 
+                    c.relname, c.xmin
+            """)
+        
+        return {row['table_name']: row['version'] for row in rows}
+    
+    async def get_table_change_counters(self) -> Optional[Dict[str, str]]:
+        """通过 pg_stat_user_tables 的插入、更新和删除行数获取每个表的数据变更计数，统计在事务结束后异步更新"""
+        if not self.pool:
+            raise ConnectionError("未连接到数据库")
+        
+        async with self.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT 
+                    relname AS table_name,
+                    n_tup_ins || ':' || n_tup_upd || ':' || n_tup_del AS counter
+                FROM 
+                    pg_stat_user_tables
+                WHERE 
+                    schemaname = 'public'
+            """)
+        
+        return {row['table_name']: row['counter'] for row in rows}
+    
+    async def get_tables_schema(self, table_names: List[str]) -> DatabaseSchemaModel:
+        """仅获取指定表的架构信息"""
+        if not self.pool:
+            raise ConnectionError("未连接到数据库")
+        
+        return await self._get_database_schema_bulk(table_names)
+    
+    async def _get_database_schema_bulk(self, table_names: Optional[List[str]] = None) -> DatabaseSchemaModel:
+        """通过少量集合查询一次性获取所有表（或指定表）的列和主键信息，并在内存中按表分组"""
         tables = []
         schema_raw = []
         
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
+            # 获取所有表名
+            table_rows = await conn.fetch("""
+                SELECT table_name 
+                FROM information_schema.tables 
+                WHERE table_schema = 'public'
+                AND table_type = 'BASE TABLE'
+                AND ($1::text[] IS NULL OR table_name = ANY($1::text[]))
+            """, table_names)
+            
+            # 一次获取所有表的列
+            column_rows = await conn.fetch("""
+                SELECT 
+                    table_name,
+                    column_name, 
+                    data_type,
+                    is_nullable,
+                    column_default
+                FROM 
+                    information_schema.columns
+                WHERE 
+                    table_schema = 'public'
+                    AND ($1::text[] IS NULL OR table_name = ANY($1::text[]))
+                ORDER BY 
+                    table_name, ordinal_position
+            """, table_names)
+            
+            # 一次获取所有主键列，直接读取系统目录避免逐列的相关子查询
+            pk_rows = await conn.fetch("""
+                SELECT 
+                    c.relname AS table_name,
+                    a.attname AS column_name
+                FROM 
+                    pg_index i
+                JOIN 
+                    pg_class c ON c.oid = i.indrelid
+                JOIN 
+                    pg_namespace n ON n.oid = c.relnamespace
+                JOIN 
+                    pg_attribute a ON a.attrelid = c.oid AND a.attnum = ANY(i.indkey)
+                WHERE 
+                    i.indisprimary
+                    AND n.nspname = 'public'
+                    AND ($1::text[] IS NULL OR c.relname = ANY($1::text[]))
+            """, table_names)
+            
+            foreign_keys = await self._fetch_foreign_keys(conn, table_names)
+        
+        primary_keys = {(row['table_name'], row['column_name']) for row in pk_rows}
+        
+        columns_by_table: Dict[str, List[Tuple]] = {}
+        for col in column_rows:
+            table_name = col['table_name']
+            key = "PRI" if (table_name, col['column_name']) in primary_keys else ""
+            columns_by_table.setdefault(table_name, []).append((
+                col['column_name'],
+                col['data_type'],
+                col['is_nullable'],
+                col['column_default'],
+                key
+            ))
+        
+        for table_row in table_rows:
+            table_name = table_row['table_name']
+            table, create_table_str = self._build_table_schema(
+                table_name, columns_by_table.get(table_name, []), foreign_keys.get(table_name)
+            )
+            tables.append(table)
+            schema_raw.append(create_table_str)
+        
+        return DatabaseSchemaModel(
+            name=self.current_db,
+            tables=tables,
+            schema_raw=schema_raw
+        )
+    
+    async def _get_database_schema_per_table(self) -> DatabaseSchemaModel:
+        """逐表查询列信息获取数据库架构"""
+        tables = []
+        schema_raw = []
+        
+        async with self.acquire() as conn:
             # 获取所有表名
             table_rows = await conn.fetch("""
                 SELECT table_name 
@@ -93,6 +240,8 @@ class PostgreSQLDatabaseService(IDatabaseService):
                 AND table_type = 'BASE TABLE'
             """)
             
+            foreign_keys = await self._fetch_foreign_keys(conn)
+            
             for table_row in table_rows:
                 table_name = table_row['table_name']
                 
@@ -125,43 +274,15 @@ class PostgreSQLDatabaseService(IDatabaseService):
                         ordinal_position
                 """, table_name)
                 
-                columns = []
-                columns_info = []
-                
-                for col in column_rows:
-                    column_name = col['column_name']
-                    data_type = col['data_type']
-                    is_nullable = col['is_nullable']
-                    default_value = col['column_default']
-                    key = col['key']
-                    
-                    columns.append({
-                        "name": column_name,
-                        "type": data_type,
-                        "nullable": is_nullable == "YES",
-                        "key": key
-                    })
-                    
-                    # 构建列信息字符串
-                    column_str = f"{column_name} {data_type}"
-                    if is_nullable == "NO":
-                        column_str += " NOT NULL"
-                    if default_value:
-                        column_str += f" DEFAULT {default_value}"
-                    if key == "PRI":
-                        column_str += " PRIMARY KEY"
-                    
-                    columns_info.append(column_str)
-                
-                tables.append(TableSchemaModel(
-                    name=table_name,
-                    columns=columns
-                ))
-                
-                # 创建原始模式字符串
-                create_table_str = f"CREATE TABLE {table_name} (\n  "
-                create_table_str += ",\n  ".join(columns_info)
-                create_table_str += "\n);"
+                table, create_table_str = self._build_table_schema(
+                    table_name,
+                    [
+                        (col['column_name'], col['data_type'], col['is_nullable'], col['column_default'], col['key'])
+                        for col in column_rows
+                    ],
+                    foreign_keys.get(table_name)
+                )
+                tables.append(table)
                 schema_raw.append(create_table_str)
         
         return DatabaseSchemaModel(
@@ -170,29 +291,175 @@ class PostgreSQLDatabaseService(IDatabaseService):
             schema_raw=schema_raw
         )
     
-    async def execute_query(self, query: str) -> List[Dict[str, Any]]:
+    @staticmethod
+    async def _fetch_foreign_keys(conn, table_names: Optional[List[str]] = None) -> Dict[str, List[ForeignKeyModel]]:
+        """从 pg_constraint 一次获取所有表（或指定表）声明的外键，按表分组"""
+        rows = await conn.fetch("""
+            SELECT 
+                c.relname AS table_name,
+                con.conname AS constraint_name,
+                a.attname AS column_name,
+                rc.relname AS referenced_table,
+                ra.attname AS referenced_column
+            FROM 
+                pg_constraint con
+            JOIN 
+                pg_class c ON c.oid = con.conrelid
+            JOIN 
+                pg_namespace n ON n.oid = c.relnamespace
+            JOIN 
+                pg_class rc ON rc.oid = con.confrelid
+            CROSS JOIN LATERAL 
+                unnest(con.conkey, con.confkey) WITH ORDINALITY AS k(attnum, ref_attnum, position)
+            JOIN 
+                pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+            JOIN 
+                pg_attribute ra ON ra.attrelid = con.confrelid AND ra.attnum = k.ref_attnum
+            WHERE 
+                con.contype = 'f'
+                AND n.nspname = 'public'
+                AND ($1::text[] IS NULL OR c.relname = ANY($1::text[]))
+            ORDER BY 
+                c.relname, con.conname, k.position
+        """, table_names)
+        return group_foreign_keys(tuple(row.values()) for row in rows)
+    
+    @staticmethod
+    def _build_table_schema(
+        table_name: str,
+        column_rows: List[Tuple],
+        foreign_keys: Optional[List[ForeignKeyModel]] = None
+    ) -> Tuple[TableSchemaModel, str]:
+        """
+        根据列信息构建表模型和原始模式字符串
+        
+        参数:
+            table_name: 表名
+            column_rows: (列名, 数据类型, 是否可空, 默认值, 键类型) 元组列表
+            foreign_keys: 表声明的外键
+        """
+        foreign_keys = foreign_keys or []
+        columns = []
+        columns_info = []
+        
+        for column_name, data_type, is_nullable, default_value, key in column_rows:
+            columns.append({
+                "name": column_name,
+                "type": data_type,
+                "nullable": is_nullable == "YES",
+                "key": key
+            })
+            
+            # 构建列信息字符串
+            column_str = f"{column_name} {data_type}"
+            if is_nullable == "NO":
+                column_str += " NOT NULL"
+            if default_value:
+                column_str += f" DEFAULT {default_value}"
+            if key == "PRI":
+                column_str += " PRIMARY KEY"
+            
+            columns_info.append(column_str)
+        
+        columns_info.extend(foreign_key_clauses(foreign_keys))
+        
+        # 创建原始模式字符串
+        create_table_str = f"CREATE TABLE {table_name} (\n  "
+        create_table_str += ",\n  ".join(columns_info)
+        create_table_str += "\n);"
+        
+        return TableSchemaModel(name=table_name, columns=columns, foreign_keys=foreign_keys), create_table_str
+    
+    async def execute_query(
+        self, query: str, max_rows: Optional[int] = None, timeout: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
         """执行SQL查询并返回结果"""
+        result = await self.execute_query_rows(query, max_rows, timeout=timeout)
+        return result.to_records()
+    
+    async def execute_query_rows(
+        self, query: str, max_rows: Optional[int] = None, timeout: Optional[float] = None
+    ) -> QueryResult:
+        """
+        执行SQL查询并以列名加元组行的紧凑形式返回结果
+        
+        超时通过statement_timeout由服务端执行。调用被取消时asyncpg会向服务端发送取消请求，
+        连接归还连接池时的RESET ALL会恢复statement_timeout
+        """
         if not self.pool:
             raise ConnectionError("未连接到数据库")
         
-        results = []
-        
-        async with self.pool.acquire() as conn:
+        statement_timeout = self.resolve_timeout(timeout)
+        async with self.acquire() as conn:
             try:
+                if statement_timeout:
+                    await conn.execute(f"SET statement_timeout = {int(statement_timeout * 1000)}")
+                
                 # 针对SELECT查询
                 if query.strip().upper().startswith("SELECT"):
-                    rows = await conn.fetch(query)
+                    if max_rows is None:
+                        statement = await conn.prepare(query)
+                        columns = [attribute.name for attribute in statement.get_attributes()]
+                        rows = await statement.fetch()
+                        
+                        return QueryResult(columns=columns, rows=[tuple(row) for row in rows])
                     
-                    for row in rows:
-                        results.append(dict(row))
+                    # 通过服务端游标只读取 max_rows + 1 行，事务结束时关闭游标，剩余结果不会再生成
+                    async with conn.transaction():
+                        statement = await conn.prepare(query)
+                        columns = [attribute.name for attribute in statement.get_attributes()]
+                        cursor = await statement.cursor()
+                        rows = await cursor.fetch(max_rows + 1)
+                    
+                    rows, truncated = limit_rows([tuple(row) for row in rows], max_rows)
+                    return QueryResult(columns=columns, rows=rows, truncated=truncated)
                 # 针对非SELECT查询（INSERT, UPDATE, DELETE等）
                 else:
                     await conn.execute(query)
-                    return [{"affected_rows": "Query executed successfully"}]
+                    return QueryResult(columns=["affected_rows"], rows=[("Query executed successfully",)])
             except Exception as e:
                 raise Exception(f"执行查询错误: {str(e)}")
+    
+    async def explain_query(self, query: str) -> Optional[PlanEstimate]:
+        """通过 EXPLAIN (FORMAT JSON) 获取估计行数和代价"""
+        if not self.pool:
+            raise ConnectionError("未连接到数据库")
+        
+        async with self.acquire() as conn:
+            plan = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {query}")
+        
+        return parse_postgres_plan(plan)
+    
+    async def stream_query(
+        self, query: str, batch_size: int = 500, timeout: Optional[float] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        在事务中使用服务端游标分批读取查询结果
         
-        return results
+        statement_timeout对游标的每次FETCH分别生效，连接归还连接池时的RESET ALL会恢复该设置
+        """
+        if not self.pool:
+            raise ConnectionError("未连接到数据库")
+        
+        statement_timeout = self.resolve_timeout(timeout)
+        async with self.acquire() as conn:
+            if statement_timeout:
+                await conn.execute(f"SET statement_timeout = {int(statement_timeout * 1000)}")
+            
+            # 针对非SELECT查询（INSERT, UPDATE, DELETE等）
+            if not query.strip().upper().startswith("SELECT"):
+                await conn.execute(query)
+                yield [{"affected_rows": "Query executed successfully"}]
+                return
+            
+            # asyncpg的游标只能在事务中使用
+            async with conn.transaction():
+                cursor = await conn.cursor(query)
+                while True:
+                    rows = await cursor.fetch(batch_size)
+                    if not rows:
+                        break
+                    yield [dict(row) for row in rows]
     
     async def get_database_type(self) -> str:
         """获取数据库类型"""
@@ -201,5 +468,18 @@ class PostgreSQLDatabaseService(IDatabaseService):
     async def close(self) -> None:
         """关闭数据库连接"""
         if self.pool:
-            await self.pool.close()
-            self.pool = None
\ No newline at end of file
+            await self._close_pool(self.pool)
+            self.pool = None
+    
+    async def _close_pool(self, pool: Any) -> None:
+        await pool.close()
+    
+    def pool_stats(self) -> Optional[Dict[str, int]]:
+        if not self.pool:
+            return None
+        return {
+            "size": self.pool.get_size(),
+            "idle": self.pool.get_idle_size(),
+            "min_size": self.pool.get_min_size(),
+            "max_size": self.pool.get_max_size(),
+        }
\ No newline at end of file
@@ -0,0 +1,161 @@
+import json
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional
+
+# SQL Server执行计划XML的命名空间
+SHOWPLAN_NAMESPACE = "{http://schemas.microsoft.com/sqlserver/2004/07/showplan}"
+
+@dataclass
+class PlanEstimate:
+    """
+    从执行计划中提取的代价估计
+
+    rows为计划中任一节点估计处理的最大行数，能反映全表扫描和笛卡尔积，而不只是最终返回的行数。
+    LIMIT/TOP之下按流水线执行的节点读到足够的行就停止，这些节点的行数以限制的行数为上限；
+    排序、哈希等需要读完输入的节点及其之下的节点不受限制。
+    cost为优化器估计的总代价，单位因数据库而异，只能与同一数据库的阈值比较
+    """
+    rows: Optional[float] = None
+    cost: Optional[float] = None
+
+def _max_or_none(values: Iterator[float]) -> Optional[float]:
+    return max(values, default=None)
+
+def _capped(value: float, cap: Optional[float]) -> float:
+    return value if cap is None else min(value, cap)
+
+def _walk_json(node: Any) -> Iterator[dict]:
+    """深度优先遍历JSON中的所有对象"""
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from _walk_json(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk_json(value)
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+# PostgreSQL中需要读完全部输入才能输出的节点
+_POSTGRES_BLOCKING_NODES = ("Sort", "Hash")
+# InitPlan和SubPlan独立执行，不受外层LIMIT限制
+_POSTGRES_INDEPENDENT_PLANS = ("InitPlan", "SubPlan")
+
+def _postgres_blocking(node: dict) -> bool:
+    node_type = node.get("Node Type")
+    if node_type in _POSTGRES_BLOCKING_NODES:
+        return True
+    # 排序后的分组聚合按流水线执行，哈希聚合和不分组的聚合需要读完输入
+    if node_type in ("Aggregate", "SetOp"):
+        return node.get("Strategy") != "Sorted"
+    return False
+
+def _postgres_rows(node: dict, cap: Optional[float]) -> Iterator[float]:
+    rows = _to_float(node.get("Plan Rows"))
+    if rows is not None:
+        yield _capped(rows, cap)
+        if node.get("Node Type") == "Limit":
+            cap = _capped(rows, cap)
+    if _postgres_blocking(node):
+        cap = None
+    for child in node.get("Plans") or ():
+        child_cap = None if child.get("Parent Relationship") in _POSTGRES_INDEPENDENT_PLANS else cap
+        yield from _postgres_rows(child, child_cap)
+
+def parse_postgres_plan(raw: Any) -> PlanEstimate:
+    """解析 EXPLAIN (FORMAT JSON) 的输出"""
+    data = json.loads(raw) if isinstance(raw, (str, bytes)) else raw
+    plan = data[0]["Plan"]
+    return PlanEstimate(rows=_max_or_none(_postgres_rows(plan, None)), cost=_to_float(plan.get("Total Cost")))
+
+# MySQL和MariaDB的JSON计划中表示估计行数的字段
+_MYSQL_ROW_KEYS = ("rows_examined_per_scan", "rows_produced_per_join", "rows")
+# 子查询独立执行，不受外层LIMIT限制
+_MYSQL_SUBQUERY_KEYS = (
+    "materialized_from_subquery", "attached_subqueries", "optimized_away_subqueries",
+    "having_subqueries", "select_list_subqueries", "order_by_subqueries", "group_by_subqueries",
+)
+
+def _mysql_blocking(data: Any) -> bool:
+    """计划中是否有文件排序、临时表、分组或窗口函数，这些操作需要读完输入"""
+    return any(
+        node.get("using_filesort") is True
+        or node.get("using_temporary_table") is True
+        or "grouping_operation" in node
+        or "windowing" in node
+        for node in _walk_json(data)
+    )
+
+def _mysql_rows(node: Any, cap: Optional[float]) -> Iterator[float]:
+    if isinstance(node, dict):
+        for key in _MYSQL_ROW_KEYS:
+            if key in node and not isinstance(node[key], (dict, list)):
+                value = _to_float(node[key])
+                if value is not None:
+                    yield _capped(value, cap)
+        for key, value in node.items():
+            yield from _mysql_rows(value, None if key in _MYSQL_SUBQUERY_KEYS else cap)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _mysql_rows(value, cap)
+
+def parse_mysql_plan(raw: Any, row_limit: Optional[float] = None) -> PlanEstimate:
+    """
+    解析 EXPLAIN FORMAT=JSON 的输出
+
+    JSON计划中不包含LIMIT，row_limit为语句末尾的LIMIT需要读取的行数（含OFFSET），由调用方从SQL中解析
+    """
+    data = json.loads(raw) if isinstance(raw, (str, bytes)) else raw
+    cap = row_limit if row_limit is not None and not _mysql_blocking(data) else None
+    cost_info = (data.get("query_block") or {}).get("cost_info") or {}
+    return PlanEstimate(rows=_max_or_none(_mysql_rows(data, cap)), cost=_to_float(cost_info.get("query_cost")))
+
+# SQL Server中需要读完全部输入才能输出的运算符（Top N Sort的PhysicalOp也是Sort）
+_SHOWPLAN_BLOCKING_OPS = ("Sort", "Hash Match", "Table Spool", "Index Spool")
+
+def _child_rel_ops(element: ET.Element) -> Iterator[ET.Element]:
+    """返回element之下最近一层的RelOp"""
+    for child in element:
+        if child.tag == f"{SHOWPLAN_NAMESPACE}RelOp":
+            yield child
+        else:
+            yield from _child_rel_ops(child)
+
+def _showplan_rows(rel_op: ET.Element, cap: Optional[float]) -> Iterator[float]:
+    for attribute in ("EstimateRows", "EstimatedRowsRead"):
+        value = _to_float(rel_op.get(attribute))
+        if value is not None:
+            yield _capped(value, cap)
+
+    physical_op = rel_op.get("PhysicalOp")
+    if physical_op == "Top":
+        rows = _to_float(rel_op.get("EstimateRows"))
+        if rows is not None:
+            cap = _capped(rows, cap)
+    elif physical_op in _SHOWPLAN_BLOCKING_OPS:
+        cap = None
+    for child in _child_rel_ops(rel_op):
+        yield from _showplan_rows(child, cap)
+
+def parse_showplan_xml(raw: str) -> PlanEstimate:
+    """解析 SET SHOWPLAN_XML ON 返回的执行计划，多条语句的代价相加"""
+    root = ET.fromstring(raw)
+    statements = list(root.iter(f"{SHOWPLAN_NAMESPACE}StmtSimple"))
+    rows = _max_or_none(
+        value
+        for statement in statements
+        for rel_op in _child_rel_ops(statement)
+        for value in _showplan_rows(rel_op, None)
+    )
+    costs = [
+        value
+        for statement in statements
+        for value in (_to_float(statement.get("StatementSubTreeCost")),)
+        if value is not None
+    ]
+    return PlanEstimate(rows=rows, cost=sum(costs) if costs else None)
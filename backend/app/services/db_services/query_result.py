@@ -0,0 +1,97 @@
+import datetime
+import decimal
+import json
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，未安装时回退到标准库json
+    orjson = None
+
+# 支持的查询结果格式
+RESULT_FORMAT_RECORDS = "records"  # 每行一个字典（默认，兼容旧接口）
+RESULT_FORMAT_ROWS = "rows"  # 列名只出现一次，行为数组
+RESULT_FORMAT_COLUMNS = "columns"  # 按列存储，适合以数值为主的结果
+RESULT_FORMATS = (RESULT_FORMAT_RECORDS, RESULT_FORMAT_ROWS, RESULT_FORMAT_COLUMNS)
+
+def limit_rows(rows: List[tuple], max_rows: Optional[int]) -> Tuple[List[tuple], bool]:
+    """
+    按行数限制截取结果
+    
+    调用方应读取最多 max_rows + 1 行，多出的一行仅用于判断结果是否被截断
+    """
+    if max_rows is None or len(rows) <= max_rows:
+        return rows, False
+    return rows[:max_rows], True
+
+@dataclass
+class QueryResult:
+    """
+    紧凑的查询结果表示：一个列名列表加上元组形式的行
+
+    相比每行一个字典，避免了在每一行中重复列名和分配字典。
+    """
+    columns: List[str]
+    rows: List[tuple] = field(default_factory=list)
+    truncated: bool = False  # 结果是否因行数限制被截断
+
+    @property
+    def row_count(self) -> int:
+        return len(self.rows)
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """转换为每行一个字典的格式"""
+        columns = self.columns
+        return [dict(zip(columns, row)) for row in self.rows]
+
+    def to_rows(self) -> Dict[str, Any]:
+        """转换为行优先的紧凑格式"""
+        return {
+            "columns": self.columns,
+            "rows": self.rows,
+            "row_count": self.row_count,
+            "truncated": self.truncated,
+        }
+
+    def to_columns(self) -> Dict[str, Any]:
+        """转换为列优先的格式，每列的值放在一个数组中"""
+        if self.rows:
+            data = [list(values) for values in zip(*self.rows)]
+        else:
+            data = [[] for _ in self.columns]
+        return {
+            "columns": self.columns,
+            "data": data,
+            "row_count": self.row_count,
+            "truncated": self.truncated,
+        }
+
+    def to_format(self, result_format: str) -> Any:
+        """按指定格式转换查询结果"""
+        if result_format == RESULT_FORMAT_ROWS:
+            return self.to_rows()
+        if result_format == RESULT_FORMAT_COLUMNS:
+            return self.to_columns()
+        return self.to_records()
+
+def _json_default(value: Any) -> Any:
+    """处理JSON无法直接序列化的数据库类型，与FastAPI默认编码保持一致"""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode("utf-8", errors="replace")
+    if isinstance(value, (uuid.UUID, datetime.timedelta)):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+def json_dumps(value: Any) -> bytes:
+    """将查询结果编码为JSON，安装了orjson时使用orjson"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, default=_json_default).encode("utf-8")
@@ -0,0 +1,217 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, FrozenSet, Optional, Set, Tuple
+
+from app.services.db_services.db_interface import IDatabaseService
+from app.services.db_services.query_result import QueryResult, json_dumps
+from app.services.db_services.sql_text import normalize_sql, referenced_tables, is_read_only
+from app.services.single_flight import SingleFlight
+
+# (连接字符串, 规范化SQL, 最大行数)
+ResultCacheKey = Tuple[str, str, Optional[int]]
+
+@dataclass
+class _ResultCacheEntry:
+    """一条缓存的查询结果"""
+    scope: str
+    tables: FrozenSet[str]
+    result: QueryResult
+    size: int  # 结果序列化为JSON后的字节数，用于内存上限
+    cached_at: float = field(default_factory=time.monotonic)
+
+class QueryResultCache:
+    """
+    按连接和规范化SQL缓存只读查询的结果
+
+    缓存项按总字节数做LRU淘汰，超过TTL后失效，并按表失效：
+    通过同一进程执行的写入语句会立即使其涉及的表的缓存失效；
+    其他客户端的写入通过数据库的表变更计数发现，每隔 check_interval 秒检查一次。
+    识别不出表名的只读查询（如 SELECT 1、SELECT now()）不缓存
+    """
+
+    def __init__(
+        self,
+        ttl: float = 60,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_entry_bytes: int = 4 * 1024 * 1024,
+        check_interval: float = 5
+    ):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.check_interval = check_interval
+        self._entries: "OrderedDict[ResultCacheKey, _ResultCacheEntry]" = OrderedDict()
+        # (连接字符串, 表名) -> 引用该表的缓存键
+        self._table_index: Dict[Tuple[str, str], Set[ResultCacheKey]] = {}
+        # 连接字符串 -> 最近一次读取的表变更计数，以及读取时间
+        self._counters: Dict[str, Dict[str, str]] = {}
+        self._checked_at: Dict[str, float] = {}
+        # 连接字符串 -> 失效次数，执行期间发生过失效的结果不写入缓存
+        self._generations: Dict[str, int] = {}
+        self._flights = SingleFlight()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    async def run(
+        self,
+        service: IDatabaseService,
+        query: str,
+        max_rows: Optional[int],
+        execute: Callable[[], Awaitable[QueryResult]]
+    ) -> QueryResult:
+        """
+        通过缓存执行查询
+
+        只读查询命中缓存时直接返回缓存的结果，否则调用execute并写入缓存，相同的并发查询只执行一次；
+        写入语句执行后使涉及的表的缓存失效
+        """
+        scope = self._scope(service)
+        if not is_read_only(query):
+            try:
+                return await execute()
+            finally:
+                self.invalidate_for_write(service, query)
+
+        tables = referenced_tables(query)
+        if not tables:
+            return await execute()
+
+        await self._check_counters(scope, service)
+
+        key = (scope, normalize_sql(query), max_rows)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if time.monotonic() - entry.cached_at < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.result
+            self._remove(key)
+
+        self.misses += 1
+        return await self._flights.do(key, lambda: self._load(key, frozenset(tables), execute))
+
+    async def _load(
+        self,
+        key: ResultCacheKey,
+        tables: FrozenSet[str],
+        execute: Callable[[], Awaitable[QueryResult]]
+    ) -> QueryResult:
+        scope = key[0]
+        generation = self._generations.get(scope, 0)
+        result = await execute()
+        # 执行期间有写入使缓存失效时，结果可能已经过时
+        if self._generations.get(scope, 0) == generation:
+            self._store(key, tables, result)
+        return result
+
+    def invalidate_for_write(self, service: IDatabaseService, query: str) -> int:
+        """使写入语句涉及的表的缓存失效，识别不出表名时（如存储过程）使整个连接的缓存失效"""
+        scope = self._scope(service)
+        tables = referenced_tables(query)
+        if not tables:
+            return self.invalidate_scope(scope)
+        return self.invalidate_tables(scope, tables)
+
+    def invalidate_tables(self, scope: str, tables: Set[str]) -> int:
+        """使引用了指定表的缓存失效，返回失效的缓存项数量"""
+        self._generations[scope] = self._generations.get(scope, 0) + 1
+        count = 0
+        for table in tables:
+            for key in list(self._table_index.get((scope, table.lower()), ())):
+                count += self._remove(key)
+        self.invalidations += count
+        return count
+
+    def invalidate_scope(self, scope: str) -> int:
+        """使一个连接的所有缓存失效"""
+        self._generations[scope] = self._generations.get(scope, 0) + 1
+        count = 0
+        for key in [key for key in self._entries if key[0] == scope]:
+            count += self._remove(key)
+        self.invalidations += count
+        return count
+
+    def clear(self) -> None:
+        """清空缓存"""
+        for scope in {key[0] for key in self._entries}:
+            self._generations[scope] = self._generations.get(scope, 0) + 1
+        self._entries.clear()
+        self._table_index.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, object]:
+        """返回缓存命中率和内存占用"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
+
+    @staticmethod
+    def _scope(service: IDatabaseService) -> str:
+        return service.connection_string or str(id(service))
+
+    async def _check_counters(self, scope: str, service: IDatabaseService) -> None:
+        """超过检查间隔时读取表变更计数，使计数发生变化的表的缓存失效"""
+        now = time.monotonic()
+        if now - self._checked_at.get(scope, 0.0) < self.check_interval:
+            return
+        self._checked_at[scope] = now
+
+        try:
+            counters = await self._flights.do(("counters", scope), service.get_table_change_counters)
+        except Exception as e:
+            print(f"获取表变更计数错误: {str(e)}")
+            return
+        if counters is None:
+            return
+
+        previous = self._counters.get(scope)
+        self._counters[scope] = counters
+        if previous is None or previous == counters:
+            return
+
+        changed = {
+            name for name in previous.keys() | counters.keys()
+            if previous.get(name) != counters.get(name)
+        }
+        self.invalidate_tables(scope, changed)
+
+    def _store(self, key: ResultCacheKey, tables: FrozenSet[str], result: QueryResult) -> None:
+        size = len(json_dumps(result.to_rows()))
+        if size > self.max_entry_bytes:
+            return
+
+        self._remove(key)
+        self._entries[key] = _ResultCacheEntry(scope=key[0], tables=tables, result=result, size=size)
+        for table in tables:
+            self._table_index.setdefault((key[0], table), set()).add(key)
+        self.bytes += size
+
+        while self.bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: ResultCacheKey) -> int:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return 0
+
+        self.bytes -= entry.size
+        for table in entry.tables:
+            keys = self._table_index.get((entry.scope, table))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._table_index[(entry.scope, table)]
+        return 1
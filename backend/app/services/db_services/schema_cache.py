@@ -0,0 +1,174 @@
+import hashlib
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from app.models.database import DatabaseSchemaModel, TableSchemaModel
+from app.services.db_services.db_interface import IDatabaseService
+from app.services.single_flight import SingleFlight
+
+def compute_schema_fingerprint(schema: DatabaseSchemaModel) -> str:
+    """计算数据库架构内容的指纹（不含指纹字段本身）"""
+    payload = {
+        "name": schema.name,
+        "tables": [table.dict() for table in schema.tables],
+        "schema_raw": schema.schema_raw,
+    }
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+@dataclass
+class _SchemaCacheEntry:
+    """单个连接的架构缓存项"""
+    service: IDatabaseService
+    name: str
+    # 表名 -> (表模型, 原始模式字符串)，保持表的原始顺序
+    tables: Dict[str, Tuple[TableSchemaModel, str]]
+    versions: Optional[Dict[str, str]]
+    schema: DatabaseSchemaModel
+    checked_at: float = field(default_factory=time.monotonic)
+
+class SchemaCache:
+    """
+    按连接缓存数据库架构
+
+    每个缓存项带有内容指纹和每个表的变更标记。超过检查间隔后，通过数据库服务的
+    get_schema_versions 做低成本的变更检测，只重新获取发生变化的表。
+    """
+
+    def __init__(self, check_interval: float = 30):
+        self.check_interval = check_interval
+        self._entries: Dict[str, _SchemaCacheEntry] = {}
+        self._flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.invalidations = 0
+
+    async def get_schema(self, connection_id: str, service: IDatabaseService) -> DatabaseSchemaModel:
+        """获取连接的数据库架构，必要时加载或增量刷新"""
+        entry = self._entries.get(connection_id)
+        if (
+            entry is not None
+            and entry.service is service
+            and time.monotonic() - entry.checked_at < self.check_interval
+        ):
+            self.hits += 1
+            return entry.schema
+
+        # 需要访问数据库时，同一连接的并发请求共享一次加载或变更检测
+        return await self._flights.do(
+            (connection_id, id(service)),
+            lambda: self._load_or_refresh(connection_id, service)
+        )
+
+    async def _load_or_refresh(self, connection_id: str, service: IDatabaseService) -> DatabaseSchemaModel:
+        entry = self._entries.get(connection_id)
+
+        # 连接已被替换（例如重新连接到其他数据库），旧缓存作废
+        if entry is not None and entry.service is not service:
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            entry = await self._load(service)
+            self._entries[connection_id] = entry
+            return entry.schema
+
+        versions = await service.get_schema_versions()
+        if versions is None:
+            # 不支持变更检测，只能全量重新加载
+            self.misses += 1
+            entry = await self._load(service)
+            self._entries[connection_id] = entry
+            return entry.schema
+
+        if versions == entry.versions:
+            self.hits += 1
+            entry.checked_at = time.monotonic()
+            return entry.schema
+
+        self.refreshes += 1
+        await self._refresh(entry, service, versions)
+        return entry.schema
+
+    def invalidate(self, connection_id: Optional[str] = None) -> int:
+        """使指定连接（或全部连接）的缓存失效，返回失效的缓存项数量"""
+        if connection_id is None:
+            count = len(self._entries)
+            self._entries.clear()
+        else:
+            count = 1 if self._entries.pop(connection_id, None) is not None else 0
+
+        self.invalidations += count
+        return count
+
+    def stats(self) -> Dict[str, object]:
+        """返回缓存命中统计"""
+        lookups = self.hits + self.misses + self.refreshes
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "fingerprints": {key: entry.schema.fingerprint for key, entry in self._entries.items()},
+        }
+
+    async def _load(self, service: IDatabaseService) -> _SchemaCacheEntry:
+        # 先读取变更标记再读取架构，避免漏掉两者之间发生的变化
+        versions = await service.get_schema_versions()
+        schema = await service.get_database_schema()
+        tables = {
+            table.name: (table, raw)
+            for table, raw in zip(schema.tables, schema.schema_raw)
+        }
+        entry = _SchemaCacheEntry(
+            service=service,
+            name=schema.name,
+            tables=tables,
+            versions=versions,
+            schema=schema
+        )
+        entry.schema = self._assemble(entry)
+        return entry
+
+    async def _refresh(self, entry: _SchemaCacheEntry, service: IDatabaseService, versions: Dict[str, str]) -> None:
+        old_versions = entry.versions or {}
+        changed = [name for name, version in versions.items() if old_versions.get(name) != version]
+
+        # 删除已不存在的表
+        for name in list(entry.tables.keys()):
+            if name not in versions:
+                del entry.tables[name]
+
+        if changed:
+            changed_set = set(changed)
+            partial = await service.get_tables_schema(changed)
+            fetched = set()
+            for table, raw in zip(partial.tables, partial.schema_raw):
+                if table.name in changed_set:
+                    entry.tables[table.name] = (table, raw)
+                    fetched.add(table.name)
+
+            # 变更检测可能包含架构查询不返回的表（如其他schema中的同名对象），保持一致
+            for name in changed_set - fetched:
+                entry.tables.pop(name, None)
+
+        entry.versions = versions
+        entry.checked_at = time.monotonic()
+        entry.schema = self._assemble(entry)
+
+    @staticmethod
+    def _assemble(entry: _SchemaCacheEntry) -> DatabaseSchemaModel:
+        tables: List[TableSchemaModel] = []
+        schema_raw: List[str] = []
+        for table, raw in entry.tables.values():
+            tables.append(table)
+            schema_raw.append(raw)
+
+        schema = DatabaseSchemaModel(name=entry.name, tables=tables, schema_raw=schema_raw)
+        schema.fingerprint = compute_schema_fingerprint(schema)
+        return schema
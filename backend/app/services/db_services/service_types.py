@@ -0,0 +1,85 @@
+import importlib
+from importlib.metadata import entry_points
+from typing import Dict, Iterable, Type, Union
+
+from app.services.db_services.db_interface import IDatabaseService
+
+# 第三方数据库服务的入口点分组。入口点名称同时作为数据库类型和连接字符串前缀，
+# 值为 "模块:类名"，例如 sqlite = "my_package.sqlite_service:SQLiteDatabaseService"
+SERVICE_ENTRY_POINT_GROUP = "dbchatpro.database_services"
+
+# 数据库类型 -> 服务类，或 "模块:类名" 形式的延迟导入路径。
+# 数据库驱动只在首次使用对应类型时导入，只连接一种数据库的部署不会加载其他驱动
+_service_types: Dict[str, Union[str, Type[IDatabaseService]]] = {
+    "mysql": "app.services.db_services.mysql_service:MySQLDatabaseService",
+    "postgres": "app.services.db_services.postgres_service:PostgreSQLDatabaseService",
+    "sqlserver": "app.services.db_services.sqlserver_service:SQLServerDatabaseService",
+}
+
+# 连接字符串前缀（://之前的部分） -> 数据库类型
+_connection_schemes: Dict[str, str] = {
+    "mysql": "mysql",
+    "postgresql": "postgres",
+    "mssql": "sqlserver",
+}
+
+_entry_points_loaded = False
+
+def register_service_type(
+    db_type: str,
+    service: Union[str, Type[IDatabaseService]],
+    schemes: Iterable[str] = ()
+) -> None:
+    """
+    注册数据库服务
+
+    参数:
+        db_type: 数据库类型
+        service: 服务类，或 "模块:类名" 形式的延迟导入路径
+        schemes: 使用该服务的连接字符串前缀
+    """
+    _service_types[db_type] = service
+    for scheme in schemes:
+        _connection_schemes[scheme] = db_type
+
+def _load_entry_points() -> None:
+    """加载通过入口点注册的第三方数据库服务，只执行一次"""
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+
+    eps = entry_points()
+    # Python 3.10以前的entry_points()返回按分组的字典
+    group = eps.select(group=SERVICE_ENTRY_POINT_GROUP) if hasattr(eps, "select") else eps.get(SERVICE_ENTRY_POINT_GROUP, [])
+    for entry_point in group:
+        # 内置服务优先，插件不能覆盖
+        if entry_point.name not in _service_types:
+            register_service_type(entry_point.name, entry_point.value, schemes=(entry_point.name,))
+
+def detect_database_type(connection_string: str) -> str:
+    """根据连接字符串前缀检测数据库类型，无法识别时返回 "unknown" """
+    scheme = connection_string.split("://", 1)[0] if "://" in connection_string else ""
+    if scheme not in _connection_schemes:
+        _load_entry_points()
+    return _connection_schemes.get(scheme, "unknown")
+
+def resolve_service_class(db_type: str) -> Type[IDatabaseService]:
+    """获取数据库类型对应的服务类，首次使用时导入其模块"""
+    service = _service_types.get(db_type)
+    if service is None:
+        _load_entry_points()
+        service = _service_types.get(db_type)
+    if service is None:
+        raise ValueError(f"不支持的数据库类型: {db_type}")
+
+    if isinstance(service, str):
+        module_name, _, class_name = service.partition(":")
+        service = getattr(importlib.import_module(module_name), class_name)
+        _service_types[db_type] = service
+    return service
+
+def available_service_types() -> Dict[str, Union[str, Type[IDatabaseService]]]:
+    """返回所有已注册的数据库服务（包括入口点插件），不触发导入"""
+    _load_entry_points()
+    return dict(_service_types)
@@ -0,0 +1,96 @@
+import re
+from typing import Optional, Set
+
+# 字符串字面量和带引号的标识符
+_QUOTED = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\])")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_WHITESPACE = re.compile(r"\s+")
+
+# 标识符：带引号的或普通的，可以带schema前缀
+_IDENTIFIER = r'(?:"[^"]+"|`[^`]+`|\[[^\]]+\]|[A-Za-z_][\w$]*)'
+_TABLE_NAME = rf"{_IDENTIFIER}(?:\s*\.\s*{_IDENTIFIER})*"
+# 表名后可选的别名，不能把下一个关键字当作别名
+_ALIAS = r"(?:\s+(?:as\s+)?(?!(?:where|on|join|inner|left|right|full|cross|natural|group|order|limit|union|set|values|using|having|window|for|select|offset|fetch|with|returning|default|output)\b)[A-Za-z_][\w$]*)?"
+_TABLE_LIST = re.compile(
+    rf"\b(?:from|join|update|into|table)\s+(?:only\s+|if\s+(?:not\s+)?exists\s+)?"
+    rf"({_TABLE_NAME}{_ALIAS}(?:\s*,\s*{_TABLE_NAME}{_ALIAS})*)",
+    re.I
+)
+_TABLE_REF = re.compile(rf"({_TABLE_NAME}){_ALIAS}", re.I)
+
+# 出现在语句中任意位置即表示会修改数据或结构的关键字
+_WRITE_KEYWORDS = re.compile(
+    r"\b(?:insert|update|delete|merge|replace|upsert|create|alter|drop|truncate|rename|grant|revoke|into|call|exec|execute)\b",
+    re.I
+)
+_READ_KEYWORDS = ("select", "with", "show", "describe", "desc", "explain")
+
+# 跳过开头的空白和左括号后的第一个单词
+_LEADING_KEYWORD = re.compile(r"[\s(]*([A-Za-z]+)")
+
+# 语句末尾的 LIMIT n、LIMIT m, n 或 LIMIT n OFFSET m
+_TRAILING_LIMIT = re.compile(
+    r"\blimit\s+(\d+)(?:\s*,\s*(\d+)|\s+offset\s+(\d+))?"
+    r"(?:\s+for\s+(?:update|share)|\s+lock\s+in\s+share\s+mode)?\s*;?\s*$",
+    re.I
+)
+
+def normalize_sql(query: str) -> str:
+    """规范化SQL文本用作缓存的键：合并引号外的空白，去掉末尾的分号"""
+    parts = _QUOTED.split(query)
+    # split保留了捕获组，奇数位置是引号内的部分
+    for i in range(0, len(parts), 2):
+        parts[i] = _WHITESPACE.sub(" ", parts[i])
+    return "".join(parts).strip().rstrip(";").strip()
+
+def _strip_literals(query: str) -> str:
+    """去掉注释和字符串字面量，避免其中的文字被当作关键字或表名"""
+    return _STRING_LITERAL.sub("''", _COMMENT.sub(" ", query))
+
+def _unquote(name: str) -> str:
+    name = name.strip()
+    if name[:1] in ('"', "`", "[") and len(name) >= 2:
+        return name[1:-1]
+    return name
+
+def referenced_tables(query: str) -> Set[str]:
+    """
+    找出语句中引用的表名（小写，不含schema前缀）
+
+    基于FROM、JOIN、UPDATE、INTO和TABLE之后的标识符识别，子查询中的表同样会被找到。
+    这是一个近似：CTE的名称也会被当作表名返回
+    """
+    text = _strip_literals(query)
+    tables: Set[str] = set()
+    for match in _TABLE_LIST.finditer(text):
+        for ref in _TABLE_REF.finditer(match.group(1)):
+            parts = re.split(rf"\s*\.\s*(?={_IDENTIFIER})", ref.group(1))
+            tables.add(_unquote(parts[-1]).lower())
+    return tables
+
+def leading_keyword(query: str) -> str:
+    """语句的第一个关键字（小写），跳过开头的注释和括号，如 /* x */ (SELECT ...) UNION ... 返回select"""
+    match = _LEADING_KEYWORD.match(_strip_literals(query))
+    return match.group(1).lower() if match else ""
+
+def is_read_only(query: str) -> bool:
+    """语句是否只读取数据（以SELECT等开头，且不包含任何写入关键字，SELECT ... FOR UPDATE也视为写入）"""
+    if leading_keyword(query) not in _READ_KEYWORDS:
+        return False
+    return _WRITE_KEYWORDS.search(_strip_literals(query)) is None
+
+def trailing_limit(query: str) -> Optional[int]:
+    """
+    语句末尾的LIMIT需要读取的行数（LIMIT加上OFFSET），没有LIMIT时返回None
+
+    只识别语句最后的LIMIT，子查询中的LIMIT以右括号结尾，不会被当作整个语句的限制
+    """
+    match = _TRAILING_LIMIT.search(_strip_literals(query))
+    if match is None:
+        return None
+    first, count, offset = match.groups()
+    # MySQL的 LIMIT m, n 中第一个数是偏移量
+    if count is not None:
+        return int(first) + int(count)
+    return int(first) + int(offset or 0)
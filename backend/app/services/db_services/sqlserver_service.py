@@ -1,12 +1,58 @@
+import asyncio
+import math
 import aioodbc
 import pyodbc
-from typing import List, Dict, Any, Optional
-from app.models.database import DatabaseSchemaModel, TableSchemaModel
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
+from app.config import settings
+from app.models.database import DatabaseSchemaModel, TableSchemaModel, ForeignKeyModel
 from app.services.db_services.db_interface import IDatabaseService
+from app.services.db_services.foreign_keys import group_foreign_keys, foreign_key_clauses
+from app.services.db_services.query_plan import PlanEstimate, parse_showplan_xml
+from app.services.db_services.query_result import QueryResult, limit_rows
+
+# 已经输出过的驱动降级提示，每种只输出一次
+_logged_fallbacks = set()
+
+def _log_driver_fallback(message: str) -> None:
+    if message not in _logged_fallbacks:
+        _logged_fallbacks.add(message)
+        print(message)
 
 class SQLServerDatabaseService(IDatabaseService):
     """SQL Server数据库服务实现"""
     
+    # 单条语句可用的表名过滤参数上限（SQL Server限制为2100个参数）
+    _MAX_FILTER_PARAMS = 2000
+    
+    # 列查询的公共部分，逐表和批量两种模式共用
+    _COLUMN_SELECT_LIST = """c.COLUMN_NAME, 
+                        c.DATA_TYPE,
+                        c.CHARACTER_MAXIMUM_LENGTH,
+                        c.IS_NULLABLE,
+                        c.COLUMN_DEFAULT,
+                        CASE WHEN pk.COLUMN_NAME IS NOT NULL THEN 'PRI' ELSE '' END AS COLUMN_KEY"""
+    
+    _COLUMN_FROM_CLAUSE = """FROM 
+                        INFORMATION_SCHEMA.COLUMNS c
+                    LEFT JOIN (
+                        SELECT 
+                            ku.TABLE_CATALOG,
+                            ku.TABLE_SCHEMA,
+                            ku.TABLE_NAME,
+                            ku.COLUMN_NAME
+                        FROM 
+                            INFORMATION_SCHEMA.TABLE_CONSTRAINTS AS tc
+                        JOIN 
+                            INFORMATION_SCHEMA.KEY_COLUMN_USAGE AS ku
+                            ON tc.CONSTRAINT_TYPE = 'PRIMARY KEY' 
+                            AND tc.CONSTRAINT_NAME = ku.CONSTRAINT_NAME
+                    ) pk
+                    ON 
+                        c.TABLE_CATALOG = pk.TABLE_CATALOG
+                        AND c.TABLE_SCHEMA = pk.TABLE_SCHEMA
+                        AND c.TABLE_NAME = pk.TABLE_NAME
+                        AND c.COLUMN_NAME = pk.COLUMN_NAME"""
+    
     def __init__(self):
         self.connection = None
         self.pool = None
@@ -33,7 +79,15 @@ class SQLServerDatabaseService(IDatabaseService):
             self.dsn = f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={host},{port};DATABASE={self.current_db};UID={user};PWD={password}"
             
             # 创建连接池
-            self.pool = await aioodbc.create_pool(dsn=self.dsn, autocommit=True)
+            self.pool = await aioodbc.create_pool(
+                dsn=self.dsn,
+                autocommit=True,
+                minsize=settings.DB_POOL_MIN_SIZE,
+                maxsize=settings.DB_POOL_MAX_SIZE,
+                pool_recycle=settings.DB_POOL_RECYCLE,
+                timeout=settings.DB_POOL_CONNECT_TIMEOUT
+            )
+            self.connection_string = connection_string
             
             return True
         except Exception as e:
@@ -41,8 +95,7 @@ class SQLServerDatabaseService(IDatabaseService):
             return False
     
     async def test_connection(self, connection_string: str) -> bool:
-        """测试SQL Server数据库连接"""
-        temp_pool = None
+        """使用单个短超时的连接测试SQL Server数据库连接"""
         conn = None
         try:
             # 解析连接字符串
@@ -60,30 +113,160 @@ class SQLServerDatabaseService(IDatabaseService):
             # 创建ODBC连接字符串
             dsn = f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={host},{port};DATABASE={db};UID={user};PWD={password}"
             
-            # 创建临时连接
-            temp_pool = await aioodbc.create_pool(dsn=dsn, autocommit=True)
-            async with temp_pool.acquire() as conn:
-                async with conn.cursor() as cur:
-                    await cur.execute("SELECT 1")
-                    await cur.fetchall()
+            # 创建临时连接，timeout为ODBC登录超时
+            conn = await aioodbc.connect(
+                dsn=dsn,
+                autocommit=True,
+                timeout=settings.DB_TEST_CONNECT_TIMEOUT
+            )
+            async with conn.cursor() as cur:
+                await cur.execute("SELECT 1")
+                await cur.fetchall()
             
             return True
         except Exception as e:
             print(f"SQL Server连接测试错误: {str(e)}")
             return False
         finally:
-            if temp_pool:
-                temp_pool.close()
+            if conn:
+                await conn.close()
     
     async def get_database_schema(self) -> DatabaseSchemaModel:
         """获取SQL Server数据库架构"""
         if not self.pool:
             raise ConnectionError("未连接到数据库")
         
+        if settings.SCHEMA_BULK_INTROSPECTION:
+            return await self._get_database_schema_bulk()
+        return await self._get_database_schema_per_table()
+    
+    async def get_schema_versions(self) -> Optional[Dict[str, str]]:
+        """通过 sys.objects.modify_date 获取每个用户表的变更标记"""
+        if not self.pool:
+            raise ConnectionError("未连接到数据库")
+        
+        async with self.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT 
+                        name,
+                        CONVERT(varchar(30), modify_date, 126)
+                    FROM 
+                        sys.objects
+                    WHERE 
+                        type = 'U'
+                """)
+                rows = await cur.fetchall()
+        
+        return {row[0]: row[1] for row in rows}
+    
+    async def get_table_change_counters(self) -> Optional[Dict[str, str]]:
+        """通过 sys.dm_db_index_usage_stats 的最后写入时间获取每个表的数据变更标记，需要 VIEW SERVER STATE 权限"""
+        if not self.pool:
+            raise ConnectionError("未连接到数据库")
+        
+        async with self.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT 
+                        OBJECT_NAME(object_id),
+                        CONVERT(varchar(30), MAX(last_user_update), 126)
+                    FROM 
+                        sys.dm_db_index_usage_stats
+                    WHERE 
+                        database_id = DB_ID()
+                        AND OBJECTPROPERTY(object_id, 'IsUserTable') = 1
+                    GROUP BY 
+                        object_id
+                """)
+                rows = await cur.fetchall()
+        
+        return {row[0]: row[1] or "" for row in rows}
+    
+    async def get_tables_schema(self, table_names: List[str]) -> DatabaseSchemaModel:
+        """仅获取指定表的架构信息"""
+        if not self.pool:
+            raise ConnectionError("未连接到数据库")
+        
+        # 超过SQL Server参数个数上限时退回到全量获取
+        if len(table_names) > self._MAX_FILTER_PARAMS:
+            return await self._get_database_schema_bulk()
+        return await self._get_database_schema_bulk(table_names)
+    
+    async def _get_database_schema_bulk(self, table_names: Optional[List[str]] = None) -> DatabaseSchemaModel:
+        """通过少量集合查询一次性获取所有表（或指定表）的列和主键信息，并在内存中按表分组"""
         tables = []
         schema_raw = []
         
-        async with self.pool.acquire() as conn:
+        # 可选的表名过滤条件
+        table_filter = ""
+        column_filter = ""
+        foreign_key_filter = ""
+        filter_params: List[str] = []
+        if table_names:
+            placeholders = ", ".join(["?"] * len(table_names))
+            table_filter = f"AND TABLE_NAME IN ({placeholders})"
+            column_filter = f"AND c.TABLE_NAME IN ({placeholders})"
+            foreign_key_filter = f"AND OBJECT_NAME(fk.parent_object_id) IN ({placeholders})"
+            filter_params = list(table_names)
+        
+        async with self.acquire() as conn:
+            async with conn.cursor() as cur:
+                # 获取所有用户表名
+                await cur.execute(f"""
+                    SELECT 
+                        TABLE_NAME 
+                    FROM 
+                        INFORMATION_SCHEMA.TABLES 
+                    WHERE 
+                        TABLE_TYPE = 'BASE TABLE' 
+                        AND TABLE_CATALOG = ?
+                        {table_filter}
+                """, self.current_db, *filter_params)
+                
+                table_rows = await cur.fetchall()
+                
+                # 一次获取所有表的列及主键标记
+                await cur.execute(f"""
+                    SELECT 
+                        c.TABLE_NAME,
+                        {self._COLUMN_SELECT_LIST}
+                    {self._COLUMN_FROM_CLAUSE}
+                    WHERE 
+                        c.TABLE_CATALOG = ?
+                        {column_filter}
+                    ORDER BY 
+                        c.TABLE_NAME, c.ORDINAL_POSITION
+                """, self.current_db, *filter_params)
+                
+                column_rows = await cur.fetchall()
+                
+                foreign_keys = await self._fetch_foreign_keys(cur, foreign_key_filter, filter_params)
+        
+        columns_by_table: Dict[str, List[Tuple]] = {}
+        for col in column_rows:
+            columns_by_table.setdefault(col[0], []).append(tuple(col[1:]))
+        
+        for table_row in table_rows:
+            table_name = table_row[0]
+            table, create_table_str = self._build_table_schema(
+                table_name, columns_by_table.get(table_name, []), foreign_keys.get(table_name)
+            )
+            tables.append(table)
+            schema_raw.append(create_table_str)
+        
+        return DatabaseSchemaModel(
+            name=self.current_db,
+            tables=tables,
+            schema_raw=schema_raw
+        )
+    
+    async def _get_database_schema_per_table(self) -> DatabaseSchemaModel:
+        """逐表查询列信息获取数据库架构"""
+        tables = []
+        schema_raw = []
+        
+        async with self.acquire() as conn:
             async with conn.cursor() as cur:
                 # 获取所有用户表名
                 await cur.execute("""
@@ -98,38 +281,16 @@ class SQLServerDatabaseService(IDatabaseService):
                 
                 table_rows = await cur.fetchall()
                 
+                foreign_keys = await self._fetch_foreign_keys(cur)
+                
                 for table_row in table_rows:
                     table_name = table_row[0]
                     
                     # 获取表结构
-                    await cur.execute("""
+                    await cur.execute(f"""
                         SELECT 
-                            c.COLUMN_NAME, 
-                            c.DATA_TYPE,
-                            c.CHARACTER_MAXIMUM_LENGTH,
-                            c.IS_NULLABLE,
-                            c.COLUMN_DEFAULT,
-                            CASE WHEN pk.COLUMN_NAME IS NOT NULL THEN 'PRI' ELSE '' END AS COLUMN_KEY
-                        FROM 
-                            INFORMATION_SCHEMA.COLUMNS c
-                        LEFT JOIN (
-                            SELECT 
-                                ku.TABLE_CATALOG,
-                                ku.TABLE_SCHEMA,
-                                ku.TABLE_NAME,
-                                ku.COLUMN_NAME
-                            FROM 
-                                INFORMATION_SCHEMA.TABLE_CONSTRAINTS AS tc
-                            JOIN 
-                                INFORMATION_SCHEMA.KEY_COLUMN_USAGE AS ku
-                                ON tc.CONSTRAINT_TYPE = 'PRIMARY KEY' 
-                                AND tc.CONSTRAINT_NAME = ku.CONSTRAINT_NAME
-                        ) pk
-                        ON 
-                            c.TABLE_CATALOG = pk.TABLE_CATALOG
-                            AND c.TABLE_SCHEMA = pk.TABLE_SCHEMA
-                            AND c.TABLE_NAME = pk.TABLE_NAME
-                            AND c.COLUMN_NAME = pk.COLUMN_NAME
+                            {self._COLUMN_SELECT_LIST}
+                        {self._COLUMN_FROM_CLAUSE}
                         WHERE 
                             c.TABLE_NAME = ? 
                             AND c.TABLE_CATALOG = ?
@@ -139,50 +300,10 @@ class SQLServerDatabaseService(IDatabaseService):
                     
                     column_rows = await cur.fetchall()
                     
-                    columns = []
-                    columns_info = []
-                    
-                    for col in column_rows:
-                        column_name = col[0]
-                        data_type = col[1]
-                        max_length = col[2]
-                        is_nullable = col[3]
-                        default_value = col[4]
-                        key = col[5]
-                        
-                        # 如果数据类型是字符串类型且有最大长度
-                        if max_length and data_type.lower() in ('char', 'varchar', 'nchar', 'nvarchar'):
-                            data_type_full = f"{data_type}({max_length if max_length != -1 else 'MAX'})"
-                        else:
-                            data_type_full = data_type
-                        
-                        columns.append({
-                            "name": column_name,
-                            "type": data_type_full,
-                            "nullable": is_nullable == "YES",
-                            "key": key
-                        })
-                        
-                        # 构建列信息字符串
-                        column_str = f"{column_name} {data_type_full}"
-                        if is_nullable == "NO":
-                            column_str += " NOT NULL"
-                        if default_value:
-                            column_str += f" DEFAULT {default_value}"
-                        if key == "PRI":
-                            column_str += " PRIMARY KEY"
-                        
-                        columns_info.append(column_str)
-                    
-                    tables.append(TableSchemaModel(
-                        name=table_name,
-                        columns=columns
-                    ))
-                    
-                    # 创建原始模式字符串
-                    create_table_str = f"CREATE TABLE {table_name} (\n  "
-                    create_table_str += ",\n  ".join(columns_info)
-                    create_table_str += "\n);"
+                    table, create_table_str = self._build_table_schema(
+                        table_name, column_rows, foreign_keys.get(table_name)
+                    )
+                    tables.append(table)
                     schema_raw.append(create_table_str)
         
         return DatabaseSchemaModel(
@@ -191,39 +312,254 @@ class SQLServerDatabaseService(IDatabaseService):
             schema_raw=schema_raw
         )
     
-    async def execute_query(self, query: str) -> List[Dict[str, Any]]:
+    @staticmethod
+    async def _fetch_foreign_keys(
+        cur,
+        foreign_key_filter: str = "",
+        filter_params: Optional[List[str]] = None
+    ) -> Dict[str, List[ForeignKeyModel]]:
+        """从 sys.foreign_keys 一次获取所有表（或指定表）声明的外键，按表分组"""
+        await cur.execute(f"""
+            SELECT 
+                OBJECT_NAME(fk.parent_object_id) AS TABLE_NAME,
+                fk.name AS CONSTRAINT_NAME,
+                COL_NAME(fkc.parent_object_id, fkc.parent_column_id) AS COLUMN_NAME,
+                OBJECT_NAME(fk.referenced_object_id) AS REFERENCED_TABLE_NAME,
+                COL_NAME(fkc.referenced_object_id, fkc.referenced_column_id) AS REFERENCED_COLUMN_NAME
+            FROM 
+                sys.foreign_keys fk
+            JOIN 
+                sys.foreign_key_columns fkc ON fkc.constraint_object_id = fk.object_id
+            WHERE 
+                1 = 1
+                {foreign_key_filter}
+            ORDER BY 
+                TABLE_NAME, CONSTRAINT_NAME, fkc.constraint_column_id
+        """, *(filter_params or []))
+        return group_foreign_keys(tuple(row) for row in await cur.fetchall())
+    
+    @staticmethod
+    def _build_table_schema(
+        table_name: str,
+        column_rows: List[Tuple],
+        foreign_keys: Optional[List[ForeignKeyModel]] = None
+    ) -> Tuple[TableSchemaModel, str]:
+        """
+        根据列信息构建表模型和原始模式字符串
+        
+        参数:
+            table_name: 表名
+            column_rows: (列名, 数据类型, 最大长度, 是否可空, 默认值, 键类型) 元组列表
+            foreign_keys: 表声明的外键
+        """
+        foreign_keys = foreign_keys or []
+        columns = []
+        columns_info = []
+        
+        for col in column_rows:
+            column_name = col[0]
+            data_type = col[1]
+            max_length = col[2]
+            is_nullable = col[3]
+            default_value = col[4]
+            key = col[5]
+            
+            # 如果数据类型是字符串类型且有最大长度
+            if max_length and data_type.lower() in ('char', 'varchar', 'nchar', 'nvarchar'):
+                data_type_full = f"{data_type}({max_length if max_length != -1 else 'MAX'})"
+            else:
+                data_type_full = data_type
+            
+            columns.append({
+                "name": column_name,
+                "type": data_type_full,
+                "nullable": is_nullable == "YES",
+                "key": key
+            })
+            
+            # 构建列信息字符串
+            column_str = f"{column_name} {data_type_full}"
+            if is_nullable == "NO":
+                column_str += " NOT NULL"
+            if default_value:
+                column_str += f" DEFAULT {default_value}"
+            if key == "PRI":
+                column_str += " PRIMARY KEY"
+            
+            columns_info.append(column_str)
+        
+        columns_info.extend(foreign_key_clauses(foreign_keys))
+        
+        # 创建原始模式字符串
+        create_table_str = f"CREATE TABLE {table_name} (\n  "
+        create_table_str += ",\n  ".join(columns_info)
+        create_table_str += "\n);"
+        
+        return TableSchemaModel(name=table_name, columns=columns, foreign_keys=foreign_keys), create_table_str
+    
+    async def execute_query(
+        self, query: str, max_rows: Optional[int] = None, timeout: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
         """执行SQL查询并返回结果"""
+        result = await self.execute_query_rows(query, max_rows, timeout=timeout)
+        return result.to_records()
+    
+    async def execute_query_rows(
+        self, query: str, max_rows: Optional[int] = None, timeout: Optional[float] = None
+    ) -> QueryResult:
+        """
+        执行SQL查询并以列名加元组行的紧凑形式返回结果
+        
+        超时通过ODBC的查询超时（SQL_ATTR_QUERY_TIMEOUT）由驱动执行，客户端的截止时间略晚于驱动，
+        在无法设置查询超时时兜底；调用被取消或超时时通过SQLCancel中止语句
+        """
         if not self.pool:
             raise ConnectionError("未连接到数据库")
         
-        results = []
+        statement_timeout = self.resolve_timeout(timeout)
+        if not statement_timeout:
+            return await self._execute_query_rows(query, max_rows, None)
         
-        async with self.pool.acquire() as conn:
-            async with conn.cursor() as cur:
+        try:
+            return await asyncio.wait_for(
+                self._execute_query_rows(query, max_rows, statement_timeout),
+                timeout=statement_timeout + 1
+            )
+        except asyncio.TimeoutError:
+            raise Exception(f"执行查询错误: 查询超过 {statement_timeout:g} 秒未完成，已取消")
+    
+    async def _execute_query_rows(
+        self, query: str, max_rows: Optional[int], statement_timeout: Optional[float]
+    ) -> QueryResult:
+        async with self.acquire() as conn:
+            cur = await self._create_cursor(conn, statement_timeout)
+            async with cur:
                 try:
                     await cur.execute(query)
                     
                     # 针对SELECT查询
                     if query.strip().upper().startswith("SELECT"):
-                        rows = await cur.fetchall()
-                        
                         # 获取列名
                         columns = [column[0] for column in cur.description]
                         
-                        # 构建结果字典
-                        for row in rows:
-                            result = {}
-                            for i, value in enumerate(row):
-                                result[columns[i]] = value
-                            results.append(result)
+                        if max_rows is None:
+                            rows = await cur.fetchall()
+                            return QueryResult(columns=columns, rows=[tuple(row) for row in rows])
+                        
+                        # 只读取 max_rows + 1 行，退出时关闭游标会取消剩余结果
+                        rows = await cur.fetchmany(max_rows + 1)
+                        rows, truncated = limit_rows([tuple(row) for row in rows], max_rows)
+                        return QueryResult(columns=columns, rows=rows, truncated=truncated)
                     # 针对非SELECT查询
                     else:
                         rowcount = cur.rowcount
-                        return [{"affected_rows": rowcount}]
+                        return QueryResult(columns=["affected_rows"], rows=[(rowcount,)])
+                except asyncio.CancelledError:
+                    self._cancel_statement(cur)
+                    raise
                 except Exception as e:
                     raise Exception(f"执行查询错误: {str(e)}")
+    
+    @staticmethod
+    async def _create_cursor(conn, statement_timeout: Optional[float]):
+        """
+        创建游标，statement_timeout不为空时为游标设置查询超时
+        
+        aioodbc的Connection.timeout是只读属性，查询超时只能设置在底层的pyodbc连接上；
+        aioodbc的实现变化导致取不到底层连接时不设置驱动超时，由调用方的客户端截止时间中止查询
+        """
+        if not statement_timeout:
+            return await conn.cursor()
+        
+        raw_conn = getattr(conn, "_conn", None)
+        if raw_conn is None or not hasattr(raw_conn, "timeout"):
+            _log_driver_fallback("无法访问aioodbc的底层pyodbc连接，SQL Server查询超时改由客户端执行")
+            return await conn.cursor()
+        
+        # pyodbc连接的timeout在创建游标时复制到语句上，单位为整秒；创建后立即恢复，避免影响复用该连接的其他查询
+        raw_conn.timeout = max(1, math.ceil(statement_timeout))
+        try:
+            return await conn.cursor()
+        finally:
+            raw_conn.timeout = 0
+    
+    @staticmethod
+    def _cancel_statement(cur) -> None:
+        """
+        中止游标上正在执行的语句，SQLCancel可以在执行器线程阻塞于驱动调用时从其他线程调用
+        
+        aioodbc没有公开取消接口，通过底层的pyodbc游标调用；取不到时语句在服务端执行完毕后结束
+        """
+        cancel = getattr(getattr(cur, "_impl", None), "cancel", None)
+        if cancel is None:
+            _log_driver_fallback("无法访问aioodbc的底层pyodbc游标，被取消的SQL Server语句将继续执行到结束")
+            return
+        try:
+            cancel()
+        except Exception as e:
+            print(f"取消SQL Server查询错误: {str(e)}")
+    
+    async def explain_query(self, query: str) -> Optional[PlanEstimate]:
+        """通过 SET SHOWPLAN_XML 获取估计行数和代价，SHOWPLAN_XML 开启期间语句只编译不执行"""
+        if not self.pool:
+            raise ConnectionError("未连接到数据库")
+        
+        async with self.acquire() as conn:
+            showplan_off = False
+            try:
+                async with conn.cursor() as cur:
+                    # SET SHOWPLAN_XML 必须单独成批
+                    await cur.execute("SET SHOWPLAN_XML ON")
+                    try:
+                        await cur.execute(query)
+                        row = await cur.fetchone()
+                    finally:
+                        # 连接会被连接池复用，必须关闭，否则之后的查询都只返回执行计划
+                        await cur.execute("SET SHOWPLAN_XML OFF")
+                        showplan_off = True
+            finally:
+                # 关闭失败或被取消时连接可能仍处于SHOWPLAN模式，不能归还连接池复用
+                if not showplan_off:
+                    await self._discard_connection(conn)
         
-        return results
+        return parse_showplan_xml(row[0]) if row else None
+    
+    @staticmethod
+    async def _discard_connection(conn) -> None:
+        """关闭连接，连接池在归还时会丢弃已关闭的连接"""
+        try:
+            await conn.close()
+        except Exception as e:
+            print(f"关闭SQL Server连接错误: {str(e)}")
+    
+    async def stream_query(
+        self, query: str, batch_size: int = 500, timeout: Optional[float] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """使用fetchmany分批读取查询结果，查询超时与execute_query_rows相同由驱动执行"""
+        if not self.pool:
+            raise ConnectionError("未连接到数据库")
+        
+        statement_timeout = self.resolve_timeout(timeout)
+        async with self.acquire() as conn:
+            cur = await self._create_cursor(conn, statement_timeout)
+            async with cur:
+                try:
+                    await cur.execute(query)
+                    
+                    # 非查询语句没有结果集
+                    if cur.description is None:
+                        yield [{"affected_rows": cur.rowcount}]
+                        return
+                    
+                    columns = [column[0] for column in cur.description]
+                    while True:
+                        rows = await cur.fetchmany(batch_size)
+                        if not rows:
+                            break
+                        yield [dict(zip(columns, row)) for row in rows]
+                except asyncio.CancelledError:
+                    self._cancel_statement(cur)
+                    raise
     
     async def get_database_type(self) -> str:
         """获取数据库类型"""
@@ -232,5 +568,19 @@ class SQLServerDatabaseService(IDatabaseService):
     async def close(self) -> None:
         """关闭数据库连接"""
         if self.pool:
-            self.pool.close()
-            self.pool = None
\ No newline at end of file
+            await self._close_pool(self.pool)
+            self.pool = None
+    
+    async def _close_pool(self, pool: Any) -> None:
+        pool.close()
+        await pool.wait_closed()
+    
+    def pool_stats(self) -> Optional[Dict[str, int]]:
+        if not self.pool:
+            return None
+        return {
+            "size": self.pool.size,
+            "idle": self.pool.freesize,
+            "min_size": self.pool.minsize,
+            "max_size": self.pool.maxsize,
+        }
\ No newline at end of file
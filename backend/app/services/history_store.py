@@ -0,0 +1,251 @@
+import asyncio
+import base64
+import sqlite3
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from app.models.database import HistoryItem, HistoryItemModel
+
+_TABLE = HistoryItem.__tablename__
+_FTS_TABLE = f"{_TABLE}_fts"
+
+# trigram分词器支持中文和子串匹配，但少于3个字符的词无法通过全文索引匹配
+_TRIGRAM_MIN_LENGTH = 3
+
+def _to_db_timestamp(value: datetime) -> str:
+    """统一为本地时间的定长ISO字符串，使字符串顺序与时间顺序一致"""
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value.isoformat(timespec="microseconds")
+
+def encode_cursor(timestamp: str, item_id: int) -> str:
+    """将分页位置编码为不透明的游标字符串"""
+    return base64.urlsafe_b64encode(f"{timestamp}|{item_id}".encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """解析游标字符串，格式不正确时抛出ValueError"""
+    try:
+        timestamp, item_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return timestamp, int(item_id)
+    except Exception:
+        raise ValueError(f"无效的分页游标: {cursor}")
+
+class HistoryStore:
+    """
+    基于SQLite文件的查询历史存储
+
+    按 (时间戳, ID) 倒序做键集分页，通过FTS5全文索引搜索提示、查询和摘要。
+    新记录先进入缓冲区，在短暂延迟内到达的记录合并为一个事务批量写入。
+    """
+
+    def __init__(self, path: str, batch_size: int = 100, batch_delay: float = 0.05):
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self._lock = asyncio.Lock()
+        self._pending: List[Tuple[HistoryItemModel, asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {_TABLE} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                query TEXT NOT NULL,
+                summary TEXT NOT NULL
+            )
+        """)
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{_TABLE}_timestamp ON {_TABLE} (timestamp, id)")
+        self.fts_enabled = self._create_fts_index()
+        self._conn.commit()
+
+    def _create_fts_index(self) -> bool:
+        """创建外部内容FTS5索引及同步触发器，SQLite不支持FTS5或trigram时返回False"""
+        try:
+            self._conn.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {_FTS_TABLE} USING fts5(
+                    prompt, query, summary,
+                    content='{_TABLE}', content_rowid='id', tokenize='trigram'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            print(f"历史记录全文索引不可用，搜索将退回到LIKE扫描: {str(e)}")
+            return False
+
+        self._conn.executescript(f"""
+            CREATE TRIGGER IF NOT EXISTS {_TABLE}_ai AFTER INSERT ON {_TABLE} BEGIN
+                INSERT INTO {_FTS_TABLE} (rowid, prompt, query, summary)
+                VALUES (new.id, new.prompt, new.query, new.summary);
+            END;
+            CREATE TRIGGER IF NOT EXISTS {_TABLE}_ad AFTER DELETE ON {_TABLE} BEGIN
+                INSERT INTO {_FTS_TABLE} ({_FTS_TABLE}, rowid, prompt, query, summary)
+                VALUES ('delete', old.id, old.prompt, old.query, old.summary);
+            END;
+            CREATE TRIGGER IF NOT EXISTS {_TABLE}_au AFTER UPDATE ON {_TABLE} BEGIN
+                INSERT INTO {_FTS_TABLE} ({_FTS_TABLE}, rowid, prompt, query, summary)
+                VALUES ('delete', old.id, old.prompt, old.query, old.summary);
+                INSERT INTO {_FTS_TABLE} (rowid, prompt, query, summary)
+                VALUES (new.id, new.prompt, new.query, new.summary);
+            END;
+        """)
+        return True
+
+    async def _run(self, func, *args):
+        # SQLite调用在线程池中执行，避免阻塞事件循环；连接不支持并发使用，因此串行化
+        async with self._lock:
+            return await asyncio.to_thread(func, *args)
+
+    async def add(self, item: HistoryItemModel) -> HistoryItemModel:
+        """添加一条历史记录，与同时到达的其他记录合并写入，返回带有存储分配ID的记录"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.batch_size:
+            await self._flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+        return await future
+
+    async def add_many(self, items: List[HistoryItemModel]) -> List[HistoryItemModel]:
+        """在一个事务中批量添加历史记录"""
+        return await self._run(self._insert, items)
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.batch_delay)
+        # 写入期间到达的记录看到本任务尚未结束，不会安排新的写入，由本任务继续写入
+        while self._pending:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        try:
+            saved = await self._run(self._insert, [item for item, _ in pending])
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), item in zip(pending, saved):
+            if not future.done():
+                future.set_result(item)
+
+    def _insert(self, items: List[HistoryItemModel]) -> List[HistoryItemModel]:
+        saved = []
+        with self._conn:
+            for item in items:
+                # ID由存储分配，客户端提供的临时ID被忽略
+                timestamp = item.timestamp or datetime.now()
+                cursor = self._conn.execute(
+                    f"INSERT INTO {_TABLE} (timestamp, prompt, query, summary) VALUES (?, ?, ?, ?)",
+                    (_to_db_timestamp(timestamp), item.prompt, item.query, item.summary)
+                )
+                saved.append(HistoryItemModel(
+                    id=cursor.lastrowid,
+                    timestamp=timestamp,
+                    prompt=item.prompt,
+                    query=item.query,
+                    summary=item.summary
+                ))
+        return saved
+
+    async def list_items(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        search: Optional[str] = None
+    ) -> Tuple[List[HistoryItemModel], Optional[str]]:
+        """
+        按时间倒序分页获取历史记录
+
+        参数:
+            limit: 每页数量
+            cursor: 上一页返回的游标，为空时从最新的记录开始
+            search: 在提示、查询和摘要中搜索的文本
+
+        返回:
+            (历史记录列表, 下一页游标)，没有更多记录时游标为None
+        """
+        position = decode_cursor(cursor) if cursor else None
+        return await self._run(self._list, limit, position, search)
+
+    def _list(
+        self,
+        limit: int,
+        position: Optional[Tuple[str, int]],
+        search: Optional[str]
+    ) -> Tuple[List[HistoryItemModel], Optional[str]]:
+        conditions = []
+        params: list = []
+        source = f"{_TABLE} h"
+
+        terms = search.split() if search else []
+        if terms:
+            if self.fts_enabled and all(len(term) >= _TRIGRAM_MIN_LENGTH for term in terms):
+                source = f"{_FTS_TABLE} JOIN {_TABLE} h ON h.id = {_FTS_TABLE}.rowid"
+                conditions.append(f"{_FTS_TABLE} MATCH ?")
+                # 每个词作为短语引用，避免用户输入被解析为FTS查询语法
+                params.append(" ".join('"' + term.replace('"', '""') + '"' for term in terms))
+            else:
+                for term in terms:
+                    conditions.append("(h.prompt LIKE ? OR h.query LIKE ? OR h.summary LIKE ?)")
+                    pattern = f"%{term}%"
+                    params.extend([pattern, pattern, pattern])
+
+        if position is not None:
+            conditions.append("(h.timestamp < ? OR (h.timestamp = ? AND h.id < ?))")
+            params.extend([position[0], position[0], position[1]])
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._conn.execute(
+            f"SELECT h.id, h.timestamp, h.prompt, h.query, h.summary FROM {source} {where} "
+            f"ORDER BY h.timestamp DESC, h.id DESC LIMIT ?",
+            (*params, limit + 1)
+        ).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+
+        items = [
+            HistoryItemModel(
+                id=item_id,
+                timestamp=datetime.fromisoformat(timestamp),
+                prompt=prompt,
+                query=query,
+                summary=summary
+            )
+            for item_id, timestamp, prompt, query, summary in rows
+        ]
+        return items, next_cursor
+
+    async def delete(self, item_id: int) -> bool:
+        """按ID删除历史记录，返回是否存在该记录"""
+        return await self._run(self._delete, item_id)
+
+    def _delete(self, item_id: int) -> bool:
+        with self._conn:
+            cursor = self._conn.execute(f"DELETE FROM {_TABLE} WHERE id = ?", (item_id,))
+        return cursor.rowcount > 0
+
+    async def clear(self) -> None:
+        """删除所有历史记录"""
+        await self._run(self._clear)
+
+    def _clear(self) -> None:
+        with self._conn:
+            self._conn.execute(f"DELETE FROM {_TABLE}")
+
+    async def close(self) -> None:
+        """写入缓冲区中剩余的记录并关闭数据库"""
+        if self._flush_task is not None:
+            await self._flush_task
+        await self._flush()
+        self._conn.close()
@@ -0,0 +1,56 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+@dataclass
+class _Call:
+    """一次正在进行中的调用"""
+    task: asyncio.Task
+    waiters: int = 0
+
+class SingleFlight:
+    """
+    合并相同的并发调用
+
+    同一个键同时只会执行一次调用，期间到达的相同请求共享这次调用的结果；
+    调用抛出的异常会传递给每一个等待者。单个等待者被取消不会影响其他等待者，
+    只有当所有等待者都已取消时，才会取消底层调用。调用完成后键即被释放，不缓存结果。
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def in_flight(self) -> int:
+        """当前正在进行的调用数量"""
+        return len(self._calls)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """执行func，若相同键的调用正在进行则等待其结果"""
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(task=asyncio.ensure_future(func()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._release(key, call))
+
+        call.waiters += 1
+        try:
+            # shield使单个等待者的取消不会直接取消共享的调用
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # 立即释放键：取消要到之后的循环才完成，期间到达的调用不能加入已取消的任务
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def _release(self, key: Hashable, call: _Call) -> None:
+        self._forget(key, call)
+        # 所有等待者都已离开时仍需读取异常，避免"异常未被获取"的警告
+        if not call.task.cancelled():
+            call.task.exception()
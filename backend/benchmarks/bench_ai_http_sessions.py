@@ -0,0 +1,86 @@
+"""
+比较每次请求新建aiohttp会话与使用共享会话池调用AI服务的延迟
+
+在本地启动一个模拟OpenAI聊天接口的HTTP服务器，分别用两种方式发送相同数量的请求。
+
+用法（在 backend 目录下运行）:
+    python -m benchmarks.bench_ai_http_sessions --requests 200 --concurrency 10
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+from aiohttp import web
+
+from app.services.ai.ai_clients import OpenAIClient
+from app.services.ai.ai_http import ai_http_sessions
+from app.services.ai.ai_messages import ChatMessage
+
+async def _fake_completion(request: web.Request) -> web.Response:
+    await request.json()
+    return web.json_response({
+        "choices": [{"message": {"role": "assistant", "content": "{\"summary\": \"ok\", \"query\": \"SELECT 1\"}"}}]
+    })
+
+async def _start_fake_llm(port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", _fake_completion)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+async def _new_session_per_request(api_url: str, messages) -> str:
+    """旧的实现方式：每次请求创建新的会话"""
+    payload = {"model": "fake", "messages": [{"role": m.role, "content": m.content} for m in messages]}
+    async with aiohttp.ClientSession() as session:
+        async with session.post(api_url, json=payload) as response:
+            data = await response.json()
+            return data["choices"][0]["message"]["content"]
+
+async def _run(label: str, call, total: int, concurrency: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{label:<10} 中位数 {statistics.median(latencies) * 1000:7.2f} ms  "
+        f"p95 {p95 * 1000:7.2f} ms  吞吐 {total / elapsed:8.1f} req/s"
+    )
+
+async def main(total: int, concurrency: int, port: int) -> None:
+    runner = await _start_fake_llm(port)
+    api_url = f"http://127.0.0.1:{port}/v1/chat/completions"
+    messages = [ChatMessage(role="user", content="列出所有客户")]
+
+    client = OpenAIClient(api_key="fake", model="fake")
+    client.api_url = api_url
+
+    try:
+        await _run("每次新建", lambda: _new_session_per_request(api_url, messages), total, concurrency)
+        await _run("共享会话", lambda: client.complete_chat(messages), total, concurrency)
+    finally:
+        await ai_http_sessions.close()
+        await runner.cleanup()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--port", type=int, default=18080)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.port))
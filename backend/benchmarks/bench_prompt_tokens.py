@@ -0,0 +1,116 @@
+"""
+比较DDL格式与紧凑格式两种架构表示下增强SQL生成提示的token数量
+
+在若干示例架构上分别构建两种格式的提示并统计token数。安装了tiktoken时使用
+cl100k_base编码精确计数，否则使用粗略估算。
+
+用法（在 backend 目录下运行）:
+    python -m benchmarks.bench_prompt_tokens --tables 10 50 200
+"""
+
+import argparse
+import random
+from typing import Callable, List, Tuple
+
+from app.config import settings
+from app.models.database import DatabaseSchemaModel
+from app.services.ai.ai_prompt_builder import AIPromptBuilder
+from app.services.ai.schema_retriever import estimate_tokens
+from app.services.db_services.mysql_service import MySQLDatabaseService
+
+_COLUMN_TYPES = ["int", "bigint", "varchar(255)", "decimal(10,2)", "datetime", "tinyint(1)", "text"]
+
+def _token_counter() -> Tuple[str, Callable[[str], int]]:
+    try:
+        import tiktoken
+    except ImportError:
+        return "estimate", estimate_tokens
+
+    encoding = tiktoken.get_encoding("cl100k_base")
+    return "tiktoken", lambda text: len(encoding.encode(text))
+
+def _build_schema(name: str, tables: List[Tuple[str, List[Tuple]]]) -> DatabaseSchemaModel:
+    models = []
+    schema_raw = []
+    for table_name, column_rows in tables:
+        table, raw = MySQLDatabaseService._build_table_schema(table_name, column_rows)
+        models.append(table)
+        schema_raw.append(raw)
+    return DatabaseSchemaModel(name=name, tables=models, schema_raw=schema_raw)
+
+def _shop_schema() -> DatabaseSchemaModel:
+    """小型电商示例架构"""
+    return _build_schema("shop", [
+        ("customers", [
+            ("customer_id", "int", "NO", "PRI"),
+            ("name", "varchar(100)", "NO", ""),
+            ("email", "varchar(255)", "YES", ""),
+            ("created_at", "datetime", "NO", ""),
+        ]),
+        ("products", [
+            ("product_id", "int", "NO", "PRI"),
+            ("name", "varchar(200)", "NO", ""),
+            ("price", "decimal(10,2)", "NO", ""),
+            ("stock", "int", "YES", ""),
+        ]),
+        ("orders", [
+            ("order_id", "int", "NO", "PRI"),
+            ("customer_id", "int", "NO", ""),
+            ("status", "varchar(20)", "NO", ""),
+            ("ordered_at", "datetime", "NO", ""),
+        ]),
+        ("order_items", [
+            ("order_item_id", "int", "NO", "PRI"),
+            ("order_id", "int", "NO", ""),
+            ("product_id", "int", "NO", ""),
+            ("quantity", "int", "NO", ""),
+            ("unit_price", "decimal(10,2)", "NO", ""),
+        ]),
+    ])
+
+def _synthetic_schema(table_count: int, seed: int = 42) -> DatabaseSchemaModel:
+    """生成指定表数量的随机架构，部分表通过 表名_id 列引用前面的表"""
+    rng = random.Random(seed)
+    tables = []
+    for index in range(table_count):
+        columns = [("id", "int", "NO", "PRI")]
+        if index:
+            for target in rng.sample(range(index), min(index, rng.randint(0, 2))):
+                columns.append((f"entity{target}_id", "int", "NO", ""))
+        for column_index in range(rng.randint(4, 12)):
+            columns.append((
+                f"field{column_index}",
+                rng.choice(_COLUMN_TYPES),
+                rng.choice(["YES", "NO"]),
+                ""
+            ))
+        tables.append((f"entity{index}", columns))
+    return _build_schema(f"synthetic_{table_count}", tables)
+
+def _prompt_tokens(schema: DatabaseSchemaModel, schema_format: str, count: Callable[[str], int]) -> int:
+    settings.PROMPT_SCHEMA_FORMAT = schema_format
+    return count(AIPromptBuilder.build_sql_generation_prompt(schema, "MySQL"))
+
+def main(table_counts: List[int]) -> None:
+    counter_name, count = _token_counter()
+    schemas = [_shop_schema()] + [_synthetic_schema(n) for n in table_counts]
+    original_format = settings.PROMPT_SCHEMA_FORMAT
+
+    print(f"计数方式: {counter_name}")
+    print(f"{'架构':<16} {'表数':>6} {'ddl':>10} {'compact':>10} {'减少':>8}")
+    try:
+        for schema in schemas:
+            ddl = _prompt_tokens(schema, "ddl", count)
+            compact = _prompt_tokens(schema, "compact", count)
+            print(
+                f"{schema.name:<16} {len(schema.tables):>6} {ddl:>10} {compact:>10} "
+                f"{(1 - compact / ddl) * 100:>7.1f}%"
+            )
+    finally:
+        settings.PROMPT_SCHEMA_FORMAT = original_format
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tables", type=int, nargs="+", default=[10, 50, 200])
+    args = parser.parse_args()
+    main(args.tables)
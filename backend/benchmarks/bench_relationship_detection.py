@@ -0,0 +1,100 @@
+"""
+比较表关系检测的原始四重循环实现与基于索引的实现的耗时
+
+在不同规模的随机架构上分别运行两种实现，并检查结果是否一致。原始实现的复杂度为
+表数量的平方，默认只在不超过 --legacy-max 个表的架构上运行。
+
+用法（在 backend 目录下运行）:
+    python -m benchmarks.bench_relationship_detection --tables 100 1000 5000
+"""
+
+import argparse
+import random
+import time
+from typing import List
+
+from app.models.database import DatabaseSchemaModel, TableSchemaModel
+from app.services.ai.db_schema_enhancer import (
+    DatabaseSchemaEnhancer,
+    RELATION_TABLE_ID,
+    RELATION_PRIMARY_KEY,
+    RELATION_NAME
+)
+from app.services.db_services.schema_cache import compute_schema_fingerprint
+
+_WORDS = ["customer", "order", "product", "invoice", "payment", "user", "account", "address", "item", "store"]
+
+def _legacy_edges(tables: List[TableSchemaModel]):
+    """优化前的实现，作为对照"""
+    edges = []
+    for table1 in tables:
+        for table2 in tables:
+            if table1.name != table2.name:
+                for col1 in table1.columns:
+                    col1_name = col1["name"].lower()
+                    if col1_name == f"{table2.name.lower()}_id":
+                        edges.append((RELATION_TABLE_ID, table1.name, col1["name"], table2.name, None))
+                    for col2 in table2.columns:
+                        if col2.get("key") == "PRI" and col1_name == col2["name"].lower():
+                            edges.append((RELATION_PRIMARY_KEY, table1.name, col1["name"], table2.name, col2["name"]))
+                    if table2.name.lower() in col1_name and not col1_name.endswith('_id'):
+                        edges.append((RELATION_NAME, table1.name, col1["name"], table2.name, None))
+    return edges
+
+def _synthetic_schema(table_count: int, seed: int = 42) -> DatabaseSchemaModel:
+    """生成随机架构，包含 表名_id 引用、同名主键引用和包含表名的列"""
+    rng = random.Random(seed)
+    names = [f"{rng.choice(_WORDS)}{index}" for index in range(table_count)]
+    tables = []
+    for index, name in enumerate(names):
+        columns = [{"name": f"{name}_key", "type": "int", "nullable": False, "key": "PRI"}]
+        for target in rng.sample(range(table_count), min(table_count, rng.randint(0, 3))):
+            kind = rng.randint(0, 2)
+            if kind == 0:
+                column_name = f"{names[target]}_id"
+            elif kind == 1:
+                column_name = f"{names[target]}_key"
+            else:
+                column_name = f"{names[target]}_name"
+            columns.append({"name": column_name, "type": "int", "nullable": True, "key": ""})
+        for column_index in range(rng.randint(3, 10)):
+            columns.append({"name": f"field{column_index}", "type": "varchar(255)", "nullable": True, "key": ""})
+        tables.append(TableSchemaModel(name=name, columns=columns))
+
+    schema = DatabaseSchemaModel(name=f"synthetic_{table_count}", tables=tables, schema_raw=[""] * table_count)
+    schema.fingerprint = compute_schema_fingerprint(schema)
+    return schema
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def main(table_counts: List[int], legacy_max: int) -> None:
+    print(f"{'表数':>6} {'关系数':>8} {'原始实现':>12} {'索引实现':>12} {'缓存命中':>12} {'结果一致':>8}")
+    for count in table_counts:
+        schema = _synthetic_schema(count)
+
+        edges, indexed = _timed(lambda: DatabaseSchemaEnhancer.detect_relationship_edges(schema.tables))
+        DatabaseSchemaEnhancer.relationship_edges(schema)
+        _, cached = _timed(lambda: DatabaseSchemaEnhancer.relationship_edges(schema))
+
+        if count <= legacy_max:
+            legacy, legacy_time = _timed(lambda: _legacy_edges(schema.tables))
+            legacy_text = f"{legacy_time * 1000:9.1f} ms"
+            same = "是" if set(legacy) == set(edges) else "否"
+        else:
+            legacy_text = f"{'跳过':>9}   "
+            same = "-"
+
+        print(
+            f"{count:>6} {len(edges):>8} {legacy_text:>12} {indexed * 1000:9.1f} ms "
+            f"{cached * 1000:9.3f} ms {same:>8}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tables", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--legacy-max", type=int, default=1000)
+    args = parser.parse_args()
+    main(args.tables, args.legacy_max)
@@ -0,0 +1,71 @@
+"""
+测量应用模块的导入时间和内存占用
+
+在独立的子进程中导入 app.main，记录导入耗时和进程最大常驻内存（RSS）。
+eager 模式额外导入全部三个数据库服务模块，相当于延迟导入驱动之前的启动方式；
+--backend 模式在导入 app.main 后只加载一种数据库服务，对应只连接一种数据库的部署。
+
+用法（在 backend 目录下运行）:
+    python -m benchmarks.bench_startup --runs 5
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+_DB_SERVICE_MODULES = {
+    "mysql": "app.services.db_services.mysql_service",
+    "postgres": "app.services.db_services.postgres_service",
+    "sqlserver": "app.services.db_services.sqlserver_service",
+}
+
+_CHILD = """
+import importlib, json, resource, sys, time
+start = time.perf_counter()
+importlib.import_module("app.main")
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+elapsed = time.perf_counter() - start
+# Linux上ru_maxrss的单位为KB，macOS上为字节
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":
+    rss //= 1024
+drivers = [name for name in ("aiomysql", "asyncpg", "aioodbc", "pyodbc") if name in sys.modules]
+print(json.dumps({"seconds": elapsed, "rss_kb": rss, "drivers": drivers}))
+"""
+
+def _measure(modules, runs: int):
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _CHILD, *modules],
+            capture_output=True, text=True, check=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+def _report(label: str, results) -> None:
+    seconds = statistics.median(result["seconds"] for result in results)
+    rss = statistics.median(result["rss_kb"] for result in results)
+    drivers = ", ".join(results[-1]["drivers"]) or "无"
+    print(f"{label:<12} 导入 {seconds * 1000:8.1f} ms  RSS {rss / 1024:7.1f} MB  已加载驱动: {drivers}")
+
+def main(runs: int) -> None:
+    _report("lazy", _measure([], runs))
+    for backend, module in _DB_SERVICE_MODULES.items():
+        try:
+            _report(f"+{backend}", _measure([module], runs))
+        except subprocess.CalledProcessError as e:
+            print(f"+{backend:<11} 无法导入: {e.stderr.strip().splitlines()[-1]}")
+    try:
+        _report("eager", _measure(list(_DB_SERVICE_MODULES.values()), runs))
+    except subprocess.CalledProcessError as e:
+        print(f"{'eager':<12} 无法导入: {e.stderr.strip().splitlines()[-1]}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    main(args.runs)
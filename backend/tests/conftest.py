@@ -0,0 +1,84 @@
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import pytest
+
+from app.models.database import DatabaseSchemaModel, TableSchemaModel
+from app.services.db_services.db_interface import IDatabaseService
+from app.services.db_services.query_plan import PlanEstimate
+from app.services.db_services.query_result import QueryResult
+
+class FakeDatabaseService(IDatabaseService):
+    """内存中的数据库服务，记录执行过的语句和架构查询，表、执行计划和变更标记由测试指定"""
+
+    def __init__(self, connection_string: str = "fake://db", estimate: Optional[PlanEstimate] = None):
+        self.connection_string = connection_string
+        self.pool = object()
+        self.estimate = estimate
+        # 表名 -> 列名
+        self.tables: Dict[str, List[str]] = {}
+        self.versions: Optional[Dict[str, str]] = None
+        self.counters: Optional[Dict[str, str]] = None
+        self.executed: List[str] = []
+        self.schema_loads = 0
+        self.partial_loads: List[List[str]] = []
+
+    async def connect(self, connection_string: str) -> bool:
+        return True
+
+    async def test_connection(self, connection_string: str) -> bool:
+        return True
+
+    def _schema(self, names: List[str]) -> DatabaseSchemaModel:
+        return DatabaseSchemaModel(
+            name="fake",
+            tables=[
+                TableSchemaModel(name=name, columns=[{"name": column, "type": "int"} for column in self.tables[name]])
+                for name in names
+            ],
+            schema_raw=[f"{name}({', '.join(self.tables[name])})" for name in names],
+        )
+
+    async def get_database_schema(self) -> DatabaseSchemaModel:
+        self.schema_loads += 1
+        return self._schema(list(self.tables))
+
+    async def get_schema_versions(self) -> Optional[Dict[str, str]]:
+        return None if self.versions is None else dict(self.versions)
+
+    async def get_tables_schema(self, table_names: List[str]) -> DatabaseSchemaModel:
+        self.partial_loads.append(sorted(table_names))
+        return self._schema([name for name in self.tables if name in table_names])
+
+    async def execute_query(
+        self, query: str, max_rows: Optional[int] = None, timeout: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        result = await self.execute_query_rows(query, max_rows, timeout)
+        return result.to_records()
+
+    async def execute_query_rows(
+        self, query: str, max_rows: Optional[int] = None, timeout: Optional[float] = None
+    ) -> QueryResult:
+        self.executed.append(query)
+        return QueryResult(columns=["n"], rows=[(len(self.executed),)])
+
+    async def explain_query(self, query: str) -> Optional[PlanEstimate]:
+        return self.estimate
+
+    async def get_table_change_counters(self) -> Optional[Dict[str, str]]:
+        return self.counters
+
+    async def stream_query(
+        self, query: str, batch_size: int = 500, timeout: Optional[float] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        self.executed.append(query)
+        yield [{"n": 1}]
+
+    async def get_database_type(self) -> str:
+        return "Fake"
+
+    async def close(self) -> None:
+        pass
+
+@pytest.fixture
+def fake_service():
+    return FakeDatabaseService()
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from app.services.admission import PRIORITY_BATCH, PRIORITY_INTERACTIVE, AdmissionGate, AdmissionRejected
+
+def _gate(**kwargs):
+    options = dict(max_concurrency=1, max_queue=10, queue_timeout=1.0, batch_limit=1)
+    options.update(kwargs)
+    return AdmissionGate(**options)
+
+async def _hold(gate, priority, order, release):
+    async with gate.slot(priority):
+        order.append(priority)
+        await release.wait()
+
+def test_interactive_waiters_are_admitted_before_batch():
+    gate = _gate()
+    order = []
+
+    async def run():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(_hold(gate, PRIORITY_INTERACTIVE, order, release))
+        await asyncio.sleep(0)
+        batch = asyncio.ensure_future(_hold(gate, PRIORITY_BATCH, order, release))
+        await asyncio.sleep(0)
+        interactive = asyncio.ensure_future(_hold(gate, PRIORITY_INTERACTIVE, order, release))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(holder, batch, interactive)
+
+    asyncio.run(run())
+    assert order == [PRIORITY_INTERACTIVE, PRIORITY_INTERACTIVE, PRIORITY_BATCH]
+
+def test_batch_requests_are_limited_to_their_share():
+    gate = _gate(max_concurrency=3, batch_limit=1)
+
+    async def run():
+        release = asyncio.Event()
+        tasks = [asyncio.ensure_future(_hold(gate, PRIORITY_BATCH, [], release)) for _ in range(2)]
+        tasks.append(asyncio.ensure_future(_hold(gate, PRIORITY_INTERACTIVE, [], release)))
+        await asyncio.sleep(0)
+        stats = gate.stats()
+        release.set()
+        await asyncio.gather(*tasks)
+        return stats
+
+    stats = asyncio.run(run())
+    assert stats["active"] == {PRIORITY_INTERACTIVE: 1, PRIORITY_BATCH: 1}
+    assert stats["waiting"] == {PRIORITY_INTERACTIVE: 0, PRIORITY_BATCH: 1}
+
+def test_full_queue_is_rejected_immediately():
+    gate = _gate(max_queue=1)
+
+    async def run():
+        release = asyncio.Event()
+        tasks = [asyncio.ensure_future(_hold(gate, PRIORITY_INTERACTIVE, [], release)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as excinfo:
+            async with gate.slot():
+                pass
+        release.set()
+        await asyncio.gather(*tasks)
+        return excinfo.value
+
+    rejected = asyncio.run(run())
+    assert rejected.retry_after >= 1
+    assert gate.rejected == 1
+
+def test_queue_timeout_rejects_the_waiter():
+    gate = _gate(queue_timeout=0.05)
+
+    async def run():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(_hold(gate, PRIORITY_INTERACTIVE, [], release))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected):
+            async with gate.slot():
+                pass
+        waiting = gate.waiting
+        release.set()
+        await holder
+        return waiting
+
+    assert asyncio.run(run()) == 0
+    assert gate.active == 0
+
+def test_cancelled_waiter_leaves_the_queue():
+    gate = _gate()
+
+    async def run():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(_hold(gate, PRIORITY_INTERACTIVE, [], release))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(_hold(gate, PRIORITY_INTERACTIVE, [], release))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        waiting = gate.waiting
+        release.set()
+        await holder
+        return waiting
+
+    assert asyncio.run(run()) == 0
+    assert gate.active == 0
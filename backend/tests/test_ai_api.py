@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+from app.api.ai import AIExecuteRequest, generate_and_execute_sql_query_stream
+from app.models.database import DatabaseSchemaModel
+
+class _FakeAIService:
+    def __init__(self, response: str):
+        self.response = response
+
+    async def stream_ai_sql_query(self, **kwargs):
+        # 按小片段返回，模拟模型的流式输出
+        for i in range(0, len(self.response), 8):
+            yield self.response[i:i + 8]
+
+class _FakeDatabaseManager:
+    def __init__(self, service):
+        self.service = service
+        self.timeouts = []
+
+    def get_current_service(self):
+        return self.service
+
+    async def get_database_schema(self):
+        return DatabaseSchemaModel(name="fake", tables=[], schema_raw=[])
+
+    async def execute_query_rows(self, query, max_rows=None, timeout=None):
+        self.timeouts.append(timeout)
+        return await self.service.execute_query_rows(query, max_rows=max_rows, timeout=timeout)
+
+def _events(fake_service, query, query_timeout=None):
+    response = json.dumps({"query": query, "summary": "done"})
+    manager = _FakeDatabaseManager(fake_service)
+    request = AIExecuteRequest(prompt="p", ai_model="m", ai_service="s", query_timeout=query_timeout)
+
+    async def run():
+        streaming = await generate_and_execute_sql_query_stream(
+            request, ai_service=_FakeAIService(response), db_manager=manager
+        )
+        return [event async for event in streaming.body_iterator]
+
+    events = asyncio.run(run())
+    names = [event.split("\n", 1)[0][len("event: "):] for event in events if event.startswith("event: ")]
+    return names, manager
+
+def test_read_only_query_is_executed_with_the_request_timeout(fake_service):
+    names, manager = _events(fake_service, "SELECT * FROM orders", query_timeout=3)
+    assert names == ["query", "rows", "result"]
+    assert fake_service.executed == ["SELECT * FROM orders"]
+    assert manager.timeouts == [3]
+
+def test_write_query_requires_confirmation(fake_service):
+    names, _ = _events(fake_service, "DELETE FROM orders")
+    assert names == ["query", "confirm_required", "result"]
+    assert fake_service.executed == []
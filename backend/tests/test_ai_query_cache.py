@@ -0,0 +1,46 @@
+import asyncio
+
+from app.models.database import AIQueryModel
+from app.services.ai.ai_query_cache import (
+    AIQueryCache,
+    MemoryAIQueryCacheBackend,
+    build_cache_key,
+    normalize_prompt,
+)
+
+def _key(prompt: str, fingerprint: str = "fp") -> str:
+    return build_cache_key(prompt, "OpenAI", "gpt-4o", True, fingerprint)
+
+def test_normalize_prompt_collapses_whitespace():
+    assert normalize_prompt("  查询   所有\n用户 ") == "查询 所有 用户"
+
+def test_prompts_differing_in_literal_case_do_not_share_a_key():
+    assert _key("users where name = 'Bob'") != _key("users where name = 'bob'")
+    assert _key("users where name = 'Bob'") == _key("  users  where name = 'Bob'  ")
+
+def test_cache_key_depends_on_schema_fingerprint():
+    assert _key("count users", "fp1") != _key("count users", "fp2")
+
+def test_schema_change_on_one_connection_keeps_entries_of_unchanged_schemas():
+    async def run():
+        cache = AIQueryCache(MemoryAIQueryCacheBackend(max_entries=10, ttl=0))
+        result = AIQueryModel(summary="s", query="SELECT 1")
+
+        # prod和staging架构相同，共享缓存项；staging迁移后使用新指纹的键
+        await cache.set(_key("count users", "fp1"), "fp1", result)
+        migrated = await cache.get(_key("count users", "fp2"))
+        return migrated, await cache.get(_key("count users", "fp1"))
+
+    assert asyncio.run(run()) == (None, AIQueryModel(summary="s", query="SELECT 1"))
+
+def test_memory_backend_evicts_least_recently_used():
+    async def run():
+        backend = MemoryAIQueryCacheBackend(max_entries=2, ttl=0)
+        result = AIQueryModel(summary="s", query="SELECT 1")
+        await backend.set("a", "fp", result)
+        await backend.set("b", "fp", result)
+        await backend.get("a")
+        await backend.set("c", "fp", result)
+        return [await backend.get(key) is not None for key in ("a", "b", "c")], backend.evictions
+
+    assert asyncio.run(run()) == ([True, False, True], 1)
@@ -0,0 +1,155 @@
+import asyncio
+import time
+
+import pytest
+
+from app.config import settings
+from app.services.ai import ai_clients
+from app.services.ai.ai_rate_limit import (
+    AIRateLimitExceeded,
+    ProviderRateLimiter,
+    RateLimiterRegistry,
+    TokenBucket,
+    parse_reset_duration,
+    retry_after_seconds,
+)
+
+def test_parse_reset_duration():
+    assert parse_reset_duration("6m0s") == 360
+    assert parse_reset_duration("1.5s") == 1.5
+    assert parse_reset_duration("20ms") == pytest.approx(0.02)
+    assert parse_reset_duration("2") == 2
+    assert parse_reset_duration("soon") is None
+
+def test_retry_after_prefers_milliseconds_then_seconds_then_resets():
+    assert retry_after_seconds({"retry-after-ms": "250", "retry-after": "3"}) == 0.25
+    assert retry_after_seconds({"retry-after": "3"}) == 3
+    assert retry_after_seconds({"x-ratelimit-reset-requests": "500ms", "x-ratelimit-reset-tokens": "2s"}) == 2
+    assert retry_after_seconds({}) is None
+
+def test_token_bucket_refills_per_minute():
+    bucket = TokenBucket(per_minute=60)
+    now = time.monotonic()
+    bucket.consume(60, now)
+    assert bucket.wait_time(1, now) == pytest.approx(1)
+    assert bucket.wait_time(1, now + 1) == pytest.approx(0)
+
+def test_token_bucket_without_capacity_never_waits():
+    bucket = TokenBucket()
+    bucket.consume(10 ** 9, time.monotonic())
+    assert bucket.wait_time(10 ** 9, time.monotonic()) == 0
+
+def test_limiter_learns_limits_and_remaining_from_headers():
+    limiter = ProviderRateLimiter()
+    limiter.update_from_headers({
+        "x-ratelimit-limit-requests": "600",
+        "x-ratelimit-limit-tokens": "60000",
+        "x-ratelimit-remaining-tokens": "100",
+    })
+    stats = limiter.stats()
+    assert stats["requests_per_minute"] == 600
+    assert stats["tokens_per_minute"] == 60000
+    assert stats["available_tokens"] == pytest.approx(100, abs=5)
+
+def test_limiter_rejects_waits_longer_than_max_wait():
+    limiter = ProviderRateLimiter(tokens_per_minute=600, max_wait=1)
+
+    async def run():
+        await limiter.acquire(600)
+        await limiter.acquire(600)
+
+    with pytest.raises(AIRateLimitExceeded) as info:
+        asyncio.run(run())
+    assert info.value.retry_after == 60
+
+def test_limiter_times_out_at_the_callers_deadline():
+    limiter = ProviderRateLimiter(tokens_per_minute=600, max_wait=120)
+
+    async def run():
+        await limiter.acquire(600)
+        await limiter.acquire(600, deadline=time.monotonic() + 1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run())
+
+def test_backoff_pauses_the_whole_target():
+    limiter = ProviderRateLimiter(max_wait=5)
+
+    async def run():
+        limiter.backoff(0.1)
+        started = time.monotonic()
+        await limiter.acquire(1)
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.09
+
+class _FakeResponse:
+    def __init__(self, status, headers=None, body=None):
+        self.status = status
+        self.headers = headers or {}
+        self._body = body or {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def json(self):
+        return self._body
+
+    async def text(self):
+        return str(self._body)
+
+class _FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.timeouts = []
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        self.timeouts.append(timeout.total)
+        return self.responses.pop(0)
+
+class _FakeSessionPool:
+    def __init__(self, session):
+        self.session = session
+
+    async def get_session(self, api_url):
+        return self.session
+
+_OK = _FakeResponse(200, body={"choices": [{"message": {"content": "ok"}}], "usage": {"total_tokens": 10}})
+
+@pytest.fixture
+def fake_session(monkeypatch):
+    def install(responses):
+        session = _FakeSession(responses)
+        monkeypatch.setattr(ai_clients, "ai_http_sessions", _FakeSessionPool(session))
+        monkeypatch.setattr(ai_clients, "ai_rate_limiters", RateLimiterRegistry())
+        monkeypatch.setattr(settings, "AI_RATE_LIMIT_ENABLED", True)
+        monkeypatch.setattr(settings, "AI_RATE_LIMIT_MAX_RETRIES", 3)
+        monkeypatch.setattr(settings, "AI_RATE_LIMIT_MAX_WAIT", 60)
+        monkeypatch.setattr(settings, "AI_RATE_LIMIT_JITTER", 0)
+        return session
+    return install
+
+def _chat(timeout=None):
+    client = ai_clients.OpenAIClient(api_key="key", model="gpt-4o")
+    messages = [ai_clients.ChatMessage(role="user", content="hello")]
+    return client.complete_chat(messages, timeout=timeout)
+
+def test_429_is_retried_with_the_remaining_time(fake_session):
+    session = fake_session([_FakeResponse(429, {"retry-after-ms": "100"}), _OK])
+
+    assert asyncio.run(_chat(timeout=5)) == "ok"
+    assert len(session.timeouts) == 2
+    assert session.timeouts[1] < session.timeouts[0] <= 5
+
+def test_retry_that_would_pass_the_deadline_is_not_attempted(fake_session):
+    session = fake_session([_FakeResponse(429, {"retry-after": "5"}), _OK])
+
+    started = time.monotonic()
+    with pytest.raises(AIRateLimitExceeded) as info:
+        asyncio.run(_chat(timeout=1))
+    assert time.monotonic() - started < 0.5
+    assert info.value.retry_after == 5
+    assert len(session.timeouts) == 1
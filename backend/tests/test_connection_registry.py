@@ -0,0 +1,111 @@
+import asyncio
+
+from app.services.db_services.connection_registry import ConnectionRegistry
+
+def _pool_stats(service, idle, size=10):
+    service.pool_stats = lambda: {"size": size, "idle": idle, "min_size": 1, "max_size": 10}
+
+def test_busy_pool_is_not_rebuilt(fake_service):
+    registry = ConnectionRegistry(health_check_timeout=0.01)
+    _pool_stats(fake_service, idle=0)
+    pinged = []
+
+    async def ping():
+        pinged.append(1)
+        await asyncio.sleep(1)
+
+    async def reconnect():
+        raise AssertionError("busy pool must not be rebuilt")
+
+    fake_service.ping = ping
+    fake_service.reconnect = reconnect
+
+    async def run():
+        await registry.register("default", fake_service)
+        await registry.check_health()
+
+    asyncio.run(run())
+    assert pinged == []
+    assert registry.stats()["entries"]["default"]["healthy"] is True
+
+def test_failed_ping_rebuilds_the_pool(fake_service):
+    registry = ConnectionRegistry(health_check_timeout=0.01)
+    _pool_stats(fake_service, idle=1)
+    reconnects = []
+
+    async def ping():
+        await asyncio.sleep(1)
+
+    async def reconnect():
+        reconnects.append(1)
+        return True
+
+    fake_service.ping = ping
+    fake_service.reconnect = reconnect
+
+    async def run():
+        await registry.register("default", fake_service)
+        await registry.check_health()
+
+    asyncio.run(run())
+    assert reconnects == [1]
+    assert registry.stats()["entries"]["default"]["reconnects"] == 1
+
+def test_reconnect_closes_the_old_pool_in_the_background(fake_service):
+    old_pool, new_pool = object(), object()
+    closed = []
+    release = None
+
+    async def connect(connection_string):
+        fake_service.pool = new_pool
+        return True
+
+    async def close_pool(pool):
+        # 旧连接池等待借出的连接归还
+        await release.wait()
+        closed.append(pool)
+
+    fake_service.pool = old_pool
+    fake_service.connect = connect
+    fake_service._close_pool = close_pool
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        assert await fake_service.reconnect()
+        assert fake_service.pool is new_pool
+        assert closed == []
+        release.set()
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert closed == [old_pool]
+
+def test_lru_eviction_skips_services_in_use(fake_service):
+    registry = ConnectionRegistry(max_connections=2)
+    busy, idle, new = (type(fake_service)(f"fake://{name}") for name in ("busy", "idle", "new"))
+    closed = []
+    for service in (busy, idle, new):
+        async def close(service=service):
+            closed.append(service)
+        service.close = close
+    busy.in_use = 1
+
+    async def run():
+        await registry.register("busy", busy)
+        await registry.register("idle", idle)
+        await registry.register("new", new)
+        assert registry.keys() == ["busy", "new"]
+        assert closed == [idle]
+
+        # 全部在使用时暂时超过容量，使用结束后由空闲回收淘汰
+        new.in_use = 1
+        await registry.register("idle", idle)
+        assert len(registry.keys()) == 3
+        busy.in_use = 0
+        new.in_use = 0
+        await registry.evict_idle()
+        assert registry.keys() == ["new", "idle"]
+
+    asyncio.run(run())
+    assert closed == [idle, busy]
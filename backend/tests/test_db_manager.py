@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from app.services.db_services.cost_guard import QueryCostExceededError, QueryCostGuard
+from app.services.db_services.db_manager import DatabaseManagerService
+from app.services.db_services.query_plan import PlanEstimate
+
+def _manager(service, max_rows=1000):
+    manager = DatabaseManagerService(cost_guard=QueryCostGuard(max_rows=max_rows))
+    manager.current_service = service
+    return manager
+
+async def _collect(batches):
+    return [batch async for batch in batches]
+
+def test_stream_query_rejects_plans_over_the_cost_limit(fake_service):
+    fake_service.estimate = PlanEstimate(rows=5000, cost=1.0)
+    manager = _manager(fake_service)
+
+    with pytest.raises(QueryCostExceededError):
+        asyncio.run(_collect(manager.stream_query("SELECT * FROM events", batch_size=10)))
+    assert fake_service.executed == []
+
+def test_stream_query_runs_plans_within_the_limit(fake_service):
+    fake_service.estimate = PlanEstimate(rows=10, cost=1.0)
+    manager = _manager(fake_service)
+
+    assert asyncio.run(_collect(manager.stream_query("SELECT * FROM events", batch_size=10))) == [[{"n": 1}]]
+    assert fake_service.executed == ["SELECT * FROM events"]
+
+def test_execute_query_rows_rejects_plans_over_the_cost_limit(fake_service):
+    fake_service.estimate = PlanEstimate(rows=5000, cost=1.0)
+    manager = _manager(fake_service)
+
+    with pytest.raises(QueryCostExceededError):
+        asyncio.run(manager.execute_query_rows("SELECT * FROM events"))
+    assert fake_service.executed == []
+
+@pytest.mark.parametrize("query", [
+    "/* generated */ SELECT * FROM events",
+    "-- note\nSELECT * FROM events",
+    "(SELECT * FROM events) UNION (SELECT * FROM archive)",
+])
+def test_cost_guard_skips_leading_comments_and_parentheses(fake_service, query):
+    fake_service.estimate = PlanEstimate(rows=5000, cost=1.0)
+    manager = _manager(fake_service)
+
+    with pytest.raises(QueryCostExceededError):
+        asyncio.run(manager.execute_query_rows(query))
+    assert fake_service.executed == []
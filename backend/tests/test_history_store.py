@@ -0,0 +1,87 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.database import HistoryItemModel
+from app.services.history_store import HistoryStore, decode_cursor, encode_cursor
+
+def _item(prompt: str, timestamp: datetime = None) -> HistoryItemModel:
+    return HistoryItemModel(prompt=prompt, query=f"SELECT '{prompt}'", summary=prompt, timestamp=timestamp or datetime.now())
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"), batch_size=100, batch_delay=0.01)
+    yield store
+    store._conn.close()
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor("2024-01-01T00:00:00.000000", 42)) == ("2024-01-01T00:00:00.000000", 42)
+
+def test_invalid_cursor_raises_value_error():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+def test_concurrent_adds_are_written_in_one_batch(store):
+    calls = []
+    insert = store._insert
+
+    def counting_insert(items):
+        calls.append(len(items))
+        return insert(items)
+
+    store._insert = counting_insert
+
+    async def run():
+        return await asyncio.gather(*(store.add(_item(f"p{i}")) for i in range(5)))
+
+    saved = asyncio.run(run())
+    assert calls == [5]
+    assert len({item.id for item in saved}) == 5
+
+def test_add_during_a_running_flush_is_written(store):
+    insert = store._insert
+
+    def slow_insert(items):
+        time.sleep(0.2)
+        return insert(items)
+
+    store._insert = slow_insert
+
+    async def run():
+        first = asyncio.create_task(store.add(_item("first")))
+        # 等待第一批开始写入，再添加第二条记录
+        await asyncio.sleep(0.05)
+        second = await asyncio.wait_for(store.add(_item("second")), timeout=2)
+        return await first, second
+
+    first, second = asyncio.run(run())
+    assert first.id is not None and second.id is not None
+    assert store._pending == []
+
+def test_keyset_pagination_walks_all_items_in_order(store):
+    base = datetime(2024, 1, 1)
+    # 两条记录时间戳相同，按ID区分先后
+    timestamps = [base, base + timedelta(seconds=1), base + timedelta(seconds=1), base + timedelta(seconds=2)]
+
+    async def run():
+        await store.add_many([_item(f"p{i}", ts) for i, ts in enumerate(timestamps)])
+        pages = []
+        cursor = None
+        while True:
+            items, cursor = await store.list_items(limit=3, cursor=cursor)
+            pages.append([item.prompt for item in items])
+            if cursor is None:
+                return pages
+
+    assert asyncio.run(run()) == [["p3", "p2", "p1"], ["p0"]]
+
+def test_search_matches_prompt_query_and_summary(store):
+    async def run():
+        await store.add_many([_item("客户订单统计"), _item("库存")])
+        items, _ = await store.list_items(limit=10, search="订单统")
+        short, _ = await store.list_items(limit=10, search="库存")
+        return [item.prompt for item in items], [item.prompt for item in short]
+
+    assert asyncio.run(run()) == (["客户订单统计"], ["库存"])
@@ -0,0 +1,110 @@
+import json
+
+from app.services.db_services.query_plan import parse_mysql_plan, parse_postgres_plan, parse_showplan_xml
+
+def _pg(plan):
+    return json.dumps([{"Plan": plan}])
+
+def _pg_scan(rows, cost=100000.0):
+    return {"Node Type": "Seq Scan", "Relation Name": "events", "Plan Rows": rows, "Total Cost": cost}
+
+def test_postgres_full_scan_reports_table_rows():
+    estimate = parse_postgres_plan(_pg(_pg_scan(20000000)))
+    assert estimate.rows == 20000000
+    assert estimate.cost == 100000.0
+
+def test_postgres_limit_caps_the_scan_below_it():
+    plan = {
+        "Node Type": "Limit", "Plan Rows": 100, "Total Cost": 0.5,
+        "Plans": [dict(_pg_scan(20000000), **{"Parent Relationship": "Outer"})],
+    }
+    estimate = parse_postgres_plan(_pg(plan))
+    assert estimate.rows == 100
+    assert estimate.cost == 0.5
+
+def test_postgres_limit_over_sort_still_reads_the_whole_table():
+    plan = {
+        "Node Type": "Limit", "Plan Rows": 100, "Total Cost": 900000.0,
+        "Plans": [{
+            "Node Type": "Sort", "Parent Relationship": "Outer", "Plan Rows": 20000000,
+            "Plans": [dict(_pg_scan(20000000), **{"Parent Relationship": "Outer"})],
+        }],
+    }
+    assert parse_postgres_plan(_pg(plan)).rows == 20000000
+
+def test_postgres_limit_does_not_cap_init_plans():
+    plan = {
+        "Node Type": "Limit", "Plan Rows": 10, "Total Cost": 5.0,
+        "Plans": [
+            {"Node Type": "Aggregate", "Strategy": "Plain", "Parent Relationship": "InitPlan", "Plan Rows": 1,
+             "Plans": [dict(_pg_scan(8000000), **{"Parent Relationship": "Outer"})]},
+            dict(_pg_scan(20000000), **{"Parent Relationship": "Outer"}),
+        ],
+    }
+    assert parse_postgres_plan(_pg(plan)).rows == 8000000
+
+def test_postgres_sorted_group_aggregate_keeps_the_cap():
+    plan = {
+        "Node Type": "Limit", "Plan Rows": 50, "Total Cost": 10.0,
+        "Plans": [{
+            "Node Type": "Aggregate", "Strategy": "Sorted", "Parent Relationship": "Outer", "Plan Rows": 1000,
+            "Plans": [{"Node Type": "Index Scan", "Parent Relationship": "Outer", "Plan Rows": 20000000}],
+        }],
+    }
+    assert parse_postgres_plan(_pg(plan)).rows == 50
+
+def _mysql(table, **query_block):
+    return json.dumps({"query_block": dict({"select_id": 1, "cost_info": {"query_cost": "2014000.50"}, "table": table}, **query_block)})
+
+_MYSQL_SCAN = {"table_name": "events", "access_type": "ALL", "rows_examined_per_scan": 20000000, "rows_produced_per_join": 20000000}
+
+def test_mysql_without_limit_reports_table_rows():
+    estimate = parse_mysql_plan(_mysql(_MYSQL_SCAN))
+    assert estimate.rows == 20000000
+    assert estimate.cost == 2014000.5
+
+def test_mysql_limit_caps_a_streaming_scan():
+    assert parse_mysql_plan(_mysql(_MYSQL_SCAN), row_limit=100).rows == 100
+
+def test_mysql_limit_with_filesort_is_not_capped():
+    plan = json.dumps({"query_block": {
+        "select_id": 1,
+        "cost_info": {"query_cost": "2014000.50"},
+        "ordering_operation": {"using_filesort": True, "table": _MYSQL_SCAN},
+    }})
+    assert parse_mysql_plan(plan, row_limit=100).rows == 20000000
+
+def test_mysql_limit_does_not_cap_materialized_subqueries():
+    derived = {
+        "table_name": "t", "access_type": "ALL", "rows_examined_per_scan": 10,
+        "materialized_from_subquery": {"query_block": {"select_id": 2, "table": _MYSQL_SCAN}},
+    }
+    assert parse_mysql_plan(_mysql(derived), row_limit=5).rows == 20000000
+
+_NS = "http://schemas.microsoft.com/sqlserver/2004/07/showplan"
+
+def _showplan(rel_op, cost="150.5"):
+    return (
+        f'<ShowPlanXML xmlns="{_NS}"><BatchSequence><Batch><Statements>'
+        f'<StmtSimple StatementSubTreeCost="{cost}"><QueryPlan>{rel_op}</QueryPlan></StmtSimple>'
+        f'</Statements></Batch></BatchSequence></ShowPlanXML>'
+    )
+
+_SQLSERVER_SCAN = '<RelOp PhysicalOp="Clustered Index Scan" EstimateRows="20000000" EstimatedRowsRead="20000000"/>'
+
+def test_sqlserver_full_scan_reports_table_rows():
+    estimate = parse_showplan_xml(_showplan(_SQLSERVER_SCAN))
+    assert estimate.rows == 20000000
+    assert estimate.cost == 150.5
+
+def test_sqlserver_top_caps_the_scan_below_it():
+    plan = f'<RelOp PhysicalOp="Top" EstimateRows="100"><Top>{_SQLSERVER_SCAN}</Top></RelOp>'
+    assert parse_showplan_xml(_showplan(plan)).rows == 100
+
+def test_sqlserver_top_n_sort_reads_the_whole_table():
+    plan = (
+        f'<RelOp PhysicalOp="Top" EstimateRows="100"><Top>'
+        f'<RelOp PhysicalOp="Sort" LogicalOp="TopN Sort" EstimateRows="100"><Sort>{_SQLSERVER_SCAN}</Sort></RelOp>'
+        f'</Top></RelOp>'
+    )
+    assert parse_showplan_xml(_showplan(plan)).rows == 20000000
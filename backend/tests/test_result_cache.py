@@ -0,0 +1,84 @@
+import asyncio
+
+from app.services.db_services.query_result import QueryResult
+from app.services.db_services.result_cache import QueryResultCache
+
+def _run(cache, service, query, max_rows=None):
+    return cache.run(service, query, max_rows, lambda: service.execute_query_rows(query, max_rows=max_rows))
+
+def test_read_only_query_is_served_from_cache(fake_service):
+    cache = QueryResultCache(check_interval=60)
+
+    async def run():
+        first = await _run(cache, fake_service, "SELECT * FROM orders")
+        second = await _run(cache, fake_service, "SELECT *\n  FROM orders;")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first is second
+    assert len(fake_service.executed) == 1
+    assert cache.stats()["hits"] == 1
+
+def test_write_invalidates_only_the_written_tables(fake_service):
+    cache = QueryResultCache(check_interval=60)
+
+    async def run():
+        await _run(cache, fake_service, "SELECT * FROM orders")
+        await _run(cache, fake_service, "SELECT * FROM customers")
+        await _run(cache, fake_service, "UPDATE orders SET total = 0")
+        await _run(cache, fake_service, "SELECT * FROM orders")
+        await _run(cache, fake_service, "SELECT * FROM customers")
+
+    asyncio.run(run())
+    assert fake_service.executed == [
+        "SELECT * FROM orders", "SELECT * FROM customers", "UPDATE orders SET total = 0", "SELECT * FROM orders",
+    ]
+    assert cache.stats()["invalidations"] == 1
+
+def test_changed_counters_invalidate_tables(fake_service):
+    cache = QueryResultCache(check_interval=0)
+    fake_service.counters = {"orders": "1", "customers": "1"}
+
+    async def run():
+        await _run(cache, fake_service, "SELECT * FROM orders")
+        await _run(cache, fake_service, "SELECT * FROM customers")
+        # 其他客户端写入了orders
+        fake_service.counters = {"orders": "2", "customers": "1"}
+        await _run(cache, fake_service, "SELECT * FROM orders")
+        await _run(cache, fake_service, "SELECT * FROM customers")
+
+    asyncio.run(run())
+    assert fake_service.executed.count("SELECT * FROM orders") == 2
+    assert fake_service.executed.count("SELECT * FROM customers") == 1
+
+def test_queries_without_tables_are_not_cached(fake_service):
+    cache = QueryResultCache(check_interval=60)
+
+    async def run():
+        await _run(cache, fake_service, "SELECT 1")
+        await _run(cache, fake_service, "SELECT 1")
+
+    asyncio.run(run())
+    assert len(fake_service.executed) == 2
+    assert cache.stats()["entries"] == 0
+
+def test_result_is_not_stored_when_invalidated_during_execution(fake_service):
+    cache = QueryResultCache(check_interval=60)
+
+    async def execute_with_write():
+        cache.invalidate_tables(cache._scope(fake_service), {"orders"})
+        return QueryResult(columns=["n"], rows=[(1,)])
+
+    asyncio.run(cache.run(fake_service, "SELECT * FROM orders", None, execute_with_write))
+    assert cache.stats()["entries"] == 0
+
+def test_entries_are_evicted_by_size(fake_service):
+    cache = QueryResultCache(check_interval=60, max_bytes=40)
+
+    async def run():
+        for table in ("a", "b", "c"):
+            await _run(cache, fake_service, f"SELECT * FROM {table}")
+
+    asyncio.run(run())
+    assert cache.bytes <= 40
+    assert cache.stats()["evictions"] >= 1
@@ -0,0 +1,75 @@
+import asyncio
+
+from app.services.db_services.schema_cache import SchemaCache, compute_schema_fingerprint
+
+def _setup(service):
+    service.tables = {"orders": ["id", "customer_id"], "customers": ["id", "name"]}
+    service.versions = {"orders": "1", "customers": "1"}
+
+def test_schema_is_served_from_cache_within_the_check_interval(fake_service):
+    _setup(fake_service)
+    cache = SchemaCache(check_interval=60)
+
+    async def run():
+        first = await cache.get_schema("default", fake_service)
+        second = await cache.get_schema("default", fake_service)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first is second
+    assert fake_service.schema_loads == 1
+    assert cache.stats()["hits"] == 1
+
+def test_only_changed_tables_are_refetched(fake_service):
+    _setup(fake_service)
+    cache = SchemaCache(check_interval=0)
+
+    async def run():
+        before = await cache.get_schema("default", fake_service)
+        fake_service.tables["orders"].append("total")
+        fake_service.versions["orders"] = "2"
+        after = await cache.get_schema("default", fake_service)
+        return before, after
+
+    before, after = asyncio.run(run())
+    assert fake_service.schema_loads == 1
+    assert fake_service.partial_loads == [["orders"]]
+    assert [column["name"] for column in after.tables[0].columns] == ["id", "customer_id", "total"]
+    assert before.fingerprint != after.fingerprint
+    assert after.fingerprint == compute_schema_fingerprint(after)
+
+def test_dropped_tables_are_removed(fake_service):
+    _setup(fake_service)
+    cache = SchemaCache(check_interval=0)
+
+    async def run():
+        await cache.get_schema("default", fake_service)
+        del fake_service.tables["customers"]
+        del fake_service.versions["customers"]
+        return await cache.get_schema("default", fake_service)
+
+    assert [table.name for table in asyncio.run(run()).tables] == ["orders"]
+    assert fake_service.partial_loads == []
+
+def test_concurrent_loads_share_one_query(fake_service):
+    _setup(fake_service)
+    cache = SchemaCache(check_interval=60)
+
+    async def run():
+        return await asyncio.gather(*(cache.get_schema("default", fake_service) for _ in range(5)))
+
+    schemas = asyncio.run(run())
+    assert fake_service.schema_loads == 1
+    assert all(schema is schemas[0] for schema in schemas)
+
+def test_invalidate_forces_a_full_reload(fake_service):
+    _setup(fake_service)
+    cache = SchemaCache(check_interval=60)
+
+    async def run():
+        await cache.get_schema("default", fake_service)
+        assert cache.invalidate("default") == 1
+        await cache.get_schema("default", fake_service)
+
+    asyncio.run(run())
+    assert fake_service.schema_loads == 2
@@ -0,0 +1,40 @@
+from app.models.database import DatabaseSchemaModel, TableSchemaModel
+from app.services.ai.schema_retriever import SchemaRetriever, tokenize
+
+def _schema(tables):
+    return DatabaseSchemaModel(
+        name="shop",
+        tables=[
+            TableSchemaModel(name=name, columns=[{"name": column, "type": "int"} for column in columns])
+            for name, columns in tables
+        ],
+        schema_raw=[f"{name}({', '.join(columns)})" for name, columns in tables],
+    )
+
+def _filler(count):
+    return [(f"misc_table_{i}", [f"value_{i}"]) for i in range(count)]
+
+def test_tokenize_splits_identifiers_and_plurals():
+    assert tokenize("OrderItems") == ["order", "item"]
+    assert tokenize("customer_categories") == ["customer", "category"]
+
+def test_tokenize_splits_chinese_into_bigrams():
+    assert tokenize("订单明细") == ["订单", "单明", "明细"]
+    assert tokenize("查 orders 的数量") == ["order", "查", "的数", "数量"]
+
+def test_prune_matches_chinese_table_names():
+    schema = _schema([("订单", ["编号", "客户编号"]), ("客户", ["编号", "姓名"])] + _filler(40))
+    pruned = SchemaRetriever().prune(schema, "查询每个客户的订单数量", top_k=5, token_budget=1000)
+    assert {"订单", "客户"} <= {table.name for table in pruned.tables}
+    assert len(pruned.tables) <= 5
+
+def test_prune_keeps_full_schema_when_prompt_has_no_tokens():
+    schema = _schema(_filler(40))
+    assert SchemaRetriever().prune(schema, "？！") is schema
+
+def test_prune_keeps_related_tables():
+    schema = _schema(
+        [("orders", ["id", "customer_id"]), ("customer", ["id", "name"])] + _filler(40)
+    )
+    pruned = SchemaRetriever().prune(schema, "total orders", top_k=5, token_budget=1000)
+    assert {"orders", "customer"} <= {table.name for table in pruned.tables}
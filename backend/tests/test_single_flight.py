@@ -0,0 +1,115 @@
+import asyncio
+
+from app.services.single_flight import SingleFlight
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "schema"
+
+    async def run():
+        results = await asyncio.gather(*(flight.do("key", load) for _ in range(5)))
+        return results, flight.in_flight()
+
+    results, in_flight = asyncio.run(run())
+    assert results == ["schema"] * 5
+    assert len(calls) == 1
+    assert in_flight == 0
+
+def test_exception_reaches_every_waiter():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def run():
+        return await asyncio.gather(*(flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+
+def test_cancelling_one_waiter_keeps_the_shared_call():
+    flight = SingleFlight()
+
+    async def load():
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("key", load))
+        second = asyncio.ensure_future(flight.do("key", load))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(run()) == (42, True)
+
+def test_cancelling_all_waiters_cancels_the_call():
+    flight = SingleFlight()
+    started = []
+
+    async def load():
+        started.append(1)
+        await asyncio.sleep(1)
+
+    async def run():
+        waiters = [asyncio.ensure_future(flight.do("key", load)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        return flight.in_flight()
+
+    assert asyncio.run(run()) == 0
+    assert len(started) == 1
+
+def test_key_is_released_after_completion():
+    flight = SingleFlight()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        return len(calls)
+
+    async def run():
+        return await flight.do("key", load), await flight.do("key", load)
+
+    assert asyncio.run(run()) == (1, 2)
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+
+    async def run():
+        async def value(v):
+            await asyncio.sleep(0.01)
+            return v
+        return await asyncio.gather(flight.do("a", lambda: value("a")), flight.do("b", lambda: value("b")))
+
+    assert asyncio.run(run()) == ["a", "b"]
+
+def test_call_after_all_waiters_cancelled_starts_fresh():
+    flight = SingleFlight()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def run():
+        waiter = asyncio.ensure_future(flight.do("key", load))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        # 等待者已离开，但取消还没有传递到共享任务时加入
+        await asyncio.sleep(0)
+        assert waiter.done()
+        return await flight.do("key", load)
+
+    assert asyncio.run(run()) == 2
+    assert len(calls) == 2
@@ -0,0 +1,39 @@
+from app.services.db_services.sql_text import (
+    is_read_only, leading_keyword, normalize_sql, referenced_tables, trailing_limit
+)
+
+def test_trailing_limit_forms():
+    assert trailing_limit("SELECT * FROM events LIMIT 100") == 100
+    assert trailing_limit("SELECT * FROM events LIMIT 100 OFFSET 20;") == 120
+    assert trailing_limit("SELECT * FROM events LIMIT 20, 100") == 120
+    assert trailing_limit("select * from events limit 10 for update") == 10
+
+def test_trailing_limit_ignores_subqueries_and_literals():
+    assert trailing_limit("SELECT * FROM events") is None
+    assert trailing_limit("SELECT * FROM a WHERE id IN (SELECT id FROM b LIMIT 5)") is None
+    assert trailing_limit("SELECT * FROM a WHERE note = 'limit 5'") is None
+
+def test_normalize_sql_keeps_quoted_text():
+    assert normalize_sql("SELECT  *\n FROM t WHERE name = 'a  b' ;") == "SELECT * FROM t WHERE name = 'a  b'"
+
+def test_referenced_tables():
+    assert referenced_tables("SELECT * FROM public.Orders o JOIN customers c ON o.cid = c.id") == {"orders", "customers"}
+    assert referenced_tables("SELECT * FROM a, [dbo].[B] WHERE x IN (SELECT y FROM c)") == {"a", "b", "c"}
+    assert referenced_tables("UPDATE orders SET total = 1") == {"orders"}
+    assert referenced_tables("INSERT INTO `logs` (msg) VALUES ('from users')") == {"logs"}
+    assert referenced_tables("SELECT 1") == set()
+
+def test_is_read_only():
+    assert is_read_only("SELECT * FROM orders")
+    assert is_read_only("  -- comment\nWITH t AS (SELECT 1) SELECT * FROM t")
+    assert is_read_only("SELECT * FROM orders WHERE note = 'delete me'")
+    assert is_read_only("/* report */ (SELECT 1 FROM a) UNION (SELECT 1 FROM b)")
+    assert not is_read_only("DELETE FROM orders")
+    assert not is_read_only("WITH t AS (SELECT 1) INSERT INTO orders SELECT * FROM t")
+    assert not is_read_only("SELECT * INTO backup FROM orders")
+    assert not is_read_only("EXEC sp_refresh")
+
+def test_leading_keyword_skips_comments_and_parentheses():
+    assert leading_keyword("  /* x */ -- y\n ((select 1))") == "select"
+    assert leading_keyword("WITH t AS (SELECT 1) SELECT * FROM t") == "with"
+    assert leading_keyword("/* only a comment */") == ""
@@ -26,9 +26,9 @@ export const databaseApi = {
     return api.get('/database/schema');
   },
   
-  // 执行SQL查询
-  executeQuery: (query) => {
-    return api.post('/database/execute', null, { params: { query } });
+  // 执行SQL查询，format可选 records（默认）、rows、columns
+  executeQuery: (query, format) => {
+    return api.post('/database/execute', null, { params: { query, format } });
   }
 };
 
@@ -60,9 +60,9 @@ export const aiApi = {
 
 // 历史记录相关API
 export const historyApi = {
-  // 获取历史记录
-  getHistoryItems: () => {
-    return api.get('/history');
+  // 获取历史记录，params可包含limit、cursor和q（搜索文本）
+  getHistoryItems: (params = {}) => {
+    return api.get('/history', { params });
   },
   
   // 添加历史记录